@@ -0,0 +1,106 @@
+# times loading a large, multi-include services tree with each available yaml loader
+#
+#   python benchmark/bench_config_loader.py --services=300 --repeat=3
+#
+# "parse" times parsing every file of the tree once, "load_config" times a full ConfigLoader.load_config()
+# (extends, includes and defaults), and "warm" reloads the tree from a persisted --config_cache
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+
+from ruamel import yaml
+
+import servicer
+from servicer.config_loader import ConfigLoader
+from servicer.yaml_cache import CSafeLoader, yaml_loader
+
+class NullLogger():
+    def log(self, *args, **kwargs):
+        pass
+
+def write_tree(root, services):
+    with open(os.path.join(root, 'docker_image.yaml'), 'w') as fp:
+        fp.write('service_type: docker_image\n')
+        fp.write('git:\n  watch_paths:\n    - ${SERVICE_PATH}/*\n')
+        fp.write('steps:\n')
+        for step in ['build', 'test', 'deploy']:
+            fp.write('  %s:\n    commands:\n' % step)
+            for i in range(20):
+                fp.write('      - echo %s ${SERVICE_NAME} %s\n' % (step, i))
+            fp.write('    config:\n      image: ${SERVICE_NAME}\n      tags:\n')
+            for i in range(20):
+                fp.write('        - tag-%s\n' % i)
+
+    with open(os.path.join(root, 'base.yaml'), 'w') as fp:
+        fp.write('ci:\n  providers: []\n')
+
+    with open(os.path.join(root, 'services.yaml'), 'w') as fp:
+        fp.write('extends: base.yaml\nservices:\n')
+        for i in range(services):
+            fp.write('  service_%s:\n' % i)
+            fp.write('    includes:\n      - path: docker_image.yaml\n        params:\n')
+            fp.write('          SERVICE_NAME: service_%s\n          SERVICE_PATH: services/service_%s\n' % (i, i))
+
+def best_of(repeat, fn):
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - started)
+    return min(durations)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark config loading.')
+    parser.add_argument('--services', type=int, default=300, help='number of services including the shared docker_image.yaml')
+    parser.add_argument('--repeat', type=int, default=3, help='number of runs, the fastest is reported')
+    args = parser.parse_args()
+
+    loaders = ['python', 'unsafe']
+    if CSafeLoader:
+        loaders.insert(0, 'c')
+    else:
+        print('ruamel.yaml C extension not installed, skipping the c loader')
+
+    with tempfile.TemporaryDirectory() as root:
+        write_tree(root, args.services)
+        files = [os.path.join(root, f) for f in os.listdir(root)]
+        files.append(os.path.join(os.path.dirname(servicer.__file__), 'builtin', 'defaults.yaml'))
+
+        print('%s services, %s files' % (args.services, len(files)))
+        print('%-8s %10s %12s %10s' % ('loader', 'parse', 'load_config', 'warm'))
+
+        for name in loaders:
+            loader = yaml_loader(name)
+
+            def parse():
+                for f in files:
+                    with open(f) as fp:
+                        yaml.load(fp, Loader=loader)
+
+            def load_config(config_cache=False):
+                config_loader = ConfigLoader({
+                    'servicer_config_path': root,
+                    'services_file': 'services.yaml',
+                    'config_loader': name,
+                    'config_cache': config_cache,
+                }, logger=NullLogger())
+                config_loader.load_config()
+
+            cache_path = os.path.join(root, '.cache', 'config.pickle')
+            if os.path.exists(cache_path):
+                os.remove(cache_path)
+            load_config(config_cache=True)
+
+            print('%-8s %9.3fs %11.3fs %9.3fs' % (
+                name,
+                best_of(args.repeat, parse),
+                best_of(args.repeat, load_config),
+                best_of(args.repeat, lambda: load_config(config_cache=True)),
+            ))
+
+if __name__ == '__main__':
+    main()
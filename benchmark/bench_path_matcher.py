@@ -0,0 +1,86 @@
+# times assigning changed files to the services watching them, against the previous per-service, per-pattern matching
+#
+#   python benchmark/bench_path_matcher.py --files=20000 --services=500
+#
+# every service watches its own directory and a shared library directory, and ignores markdown files
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+
+from servicer.path_matcher import PathMatcher, sanitize_regex
+
+def build_services(services):
+    return {
+        'service_%s' % i: {
+            'git': {
+                'watch_paths': ['services/service_%s/*' % i, 'lib/shared_%s/*' % (i % 10)],
+                'ignore_paths': ['*.md'],
+            },
+        }
+        for i in range(services)
+    }
+
+def build_files(files, services, seed=0):
+    rng = random.Random(seed)
+    paths = []
+    for i in range(files):
+        directory = rng.choice(['services/service_%s' % rng.randrange(services * 2), 'lib/shared_%s' % rng.randrange(20)])
+        paths.append('%s/src/file_%s.%s' % (directory, i, rng.choice(['py', 'js', 'md'])))
+    return paths
+
+# the matching ignore_unchanged_services did before PathMatcher, without its per-comparison logging
+def previous_assign(services, files):
+    def match_regexes(strings, regexes):
+        matches = []
+        unmatches = []
+        for s in strings:
+            if any(re.match(regex, s) for regex in regexes):
+                matches.append(s)
+            else:
+                unmatches.append(s)
+        return matches, unmatches
+
+    assigned = {}
+    for name, service in services.items():
+        changed, _ = match_regexes(files, [sanitize_regex(m) for m in service['git']['watch_paths']])
+        _, changed = match_regexes(changed, [sanitize_regex(m) for m in service['git']['ignore_paths']])
+        assigned[name] = changed
+    return assigned
+
+def assign(services, files):
+    path_matcher = PathMatcher()
+    for name, service in services.items():
+        path_matcher.add(name, service['git']['watch_paths'], service['git']['ignore_paths'])
+    return path_matcher.assign(files)
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, result
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark matching changed files to services.')
+    parser.add_argument('--files', type=int, default=20000, help='number of changed files')
+    parser.add_argument('--services', type=int, default=500, help='number of services')
+    parser.add_argument('--skip_previous', action='store_true', help='only time PathMatcher')
+    args = parser.parse_args()
+
+    services = build_services(args.services)
+    files = build_files(args.files, args.services)
+
+    duration, result = timed(assign, services, files)
+    print('%s files, %s services, %s assignments' % (len(files), len(services), sum(len(f) for f in result.values())))
+    print('%-12s %9.3fs' % ('PathMatcher', duration))
+
+    if not args.skip_previous:
+        previous_duration, previous_result = timed(previous_assign, services, files)
+        assert previous_result == result, 'assignments differ from the previous matching'
+        print('%-12s %9.3fs' % ('previous', previous_duration))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+# times cold starts of the servicer cli, so that startup time does not regress
+#
+#   python benchmark/bench_startup.py --repeat=10
+#   python benchmark/bench_startup.py --max_import=0.2
+#
+# "import" runs python -c 'import servicer.servicer', "version" runs servicer --version (import, argument parsing
+# and version lookup), each in a fresh interpreter; the median of each is reported
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')
+
+COMMANDS = {
+    'import': [sys.executable, '-c', 'import servicer.servicer'],
+    'version': [sys.executable, '-c', 'import sys; sys.argv = ["servicer", "--version"]; from servicer.servicer import main; main()'],
+}
+
+def time_command(command, repeat):
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, stdout=subprocess.DEVNULL, check=True)
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark servicer startup.')
+    parser.add_argument('--repeat', type=int, default=10, help='number of cold starts of each command')
+    parser.add_argument('--max_import', type=float, help='exit with an error when the median import time exceeds this many seconds')
+    args = parser.parse_args()
+
+    baseline = time_command([sys.executable, '-c', 'pass'], args.repeat)
+    print('%-10s %10s %10s' % ('command', 'median', 'servicer'))
+    print('%-10s %9.3fs %10s' % ('python', baseline, '-'))
+
+    results = {}
+    for name, command in COMMANDS.items():
+        results[name] = time_command(command, args.repeat)
+        # the servicer column excludes the cost of starting the interpreter itself
+        print('%-10s %9.3fs %9.3fs' % (name, results[name], results[name] - baseline))
+
+    if args.max_import is not None and results['import'] - baseline > args.max_import:
+        print('import time regressed: %.3fs > %.3fs' % (results['import'] - baseline, args.max_import))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
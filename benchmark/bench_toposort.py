@@ -0,0 +1,84 @@
+# times toposort2 on synthetic service-step graphs, against the previous set-difference implementation
+#
+#   python benchmark/bench_toposort.py --service_steps=10000 --repeat=3
+#
+# each service has a build, test and deploy step chained together, and every step also depends on
+# a few random steps of earlier services, so the graph has roughly service_steps / 3 layers
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+
+from servicer.topological_order import toposort2
+
+STEPS = ['build', 'test', 'deploy']
+
+# the set-difference implementation toposort2 replaced, kept for comparison
+def previous_toposort2(data):
+    result = []
+    for k, v in data.items():
+        v.discard(k)
+
+    extra_items_in_dependencies = set().union(*data.values()) - set(data.keys())
+    data.update({item: set() for item in extra_items_in_dependencies})
+
+    while True:
+        ordered = set(item for item, dependency in data.items() if not dependency)
+        if not ordered:
+            break
+        result.append(sorted(ordered))
+        data = {item: (dep - ordered) for item, dep in data.items() if item not in ordered}
+
+    assert not data, 'A cyclic dependency exists amongst %r' % data
+    return result
+
+def build_graph(service_steps, fan_in, seed=0):
+    rng = random.Random(seed)
+    services = max(1, service_steps // len(STEPS))
+    graph = {}
+
+    for i in range(services):
+        for j, step in enumerate(STEPS):
+            dependencies = set()
+            if j:
+                dependencies.add('service_%s:%s' % (i, STEPS[j - 1]))
+            for _ in range(fan_in if i else 0):
+                dependencies.add('service_%s:%s' % (rng.randrange(max(0, i - 20), i), rng.choice(STEPS)))
+            graph['service_%s:%s' % (i, step)] = dependencies
+
+    return graph
+
+def best_of(repeat, fn, graph):
+    durations = []
+    for _ in range(repeat):
+        data = {item: set(dependencies) for item, dependencies in graph.items()}
+        started = time.perf_counter()
+        result = fn(data)
+        durations.append(time.perf_counter() - started)
+    return min(durations), result
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark topological sorting of service-steps.')
+    parser.add_argument('--service_steps', type=int, default=10000, help='number of service-steps in the graph')
+    parser.add_argument('--fan_in', type=int, default=3, help='random cross-service dependencies per service-step')
+    parser.add_argument('--repeat', type=int, default=3, help='number of runs, the fastest is reported')
+    parser.add_argument('--skip_previous', action='store_true', help='only time the current implementation')
+    args = parser.parse_args()
+
+    graph = build_graph(args.service_steps, args.fan_in)
+    edges = sum(len(dependencies) for dependencies in graph.values())
+
+    duration, result = best_of(args.repeat, toposort2, graph)
+    print('%s service-steps, %s dependencies, %s layers' % (len(graph), edges, len(result)))
+    print('%-10s %9.3fs' % ('toposort2', duration))
+
+    if not args.skip_previous:
+        previous_duration, previous_result = best_of(args.repeat, previous_toposort2, graph)
+        assert previous_result == result, 'layers differ from the previous implementation'
+        print('%-10s %9.3fs' % ('previous', previous_duration))
+
+if __name__ == '__main__':
+    main()
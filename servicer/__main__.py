@@ -1,14 +1,4 @@
-import os
-import sys
+from .servicer import main
 
-PACKAGE_PARENT = '..'
-SCRIPT_DIR = os.path.dirname(os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__))))
-print(SCRIPT_DIR)
-sys.path.append(os.path.normpath(os.path.join(SCRIPT_DIR, PACKAGE_PARENT)))
-print(sys.path)
-
-from .servicer import Servicer
-
-def main():
-    servicer = Servicer()
-    servicer.run_steps()
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,12 @@
+class BaseCacheBackend():
+
+    def __init__(self, config, logger=None):
+        self.logger = logger
+        self.config = config
+
+    # returns the cached entry dict for the key, or None if it is not cached
+    def get(self, key):
+        pass
+
+    def put(self, key, entry):
+        pass
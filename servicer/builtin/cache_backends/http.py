@@ -0,0 +1,54 @@
+import json
+import requests
+
+from .base_cache_backend import BaseCacheBackend
+
+# shares entries between machines through a remote cache server, using GET and PUT on {url}/ac/{key}
+# (the action cache layout of Bazel's HTTP remote cache protocol)
+# an unreachable cache is treated as a miss, so it can never fail a build
+class CacheBackend(BaseCacheBackend):
+    def __init__(self, config, logger=None):
+        super().__init__(config, logger=logger)
+
+        if not config.get('url'):
+            raise ValueError('The http cache backend requires a url, set cache.url in services.yaml')
+
+        self.url = config['url'].rstrip('/')
+        self.timeout = config.get('timeout', 10)
+        self.headers = config.get('headers') or {}
+
+    def entry_url(self, key):
+        return '%s/ac/%s' % (self.url, key)
+
+    def get(self, key):
+        try:
+            response = requests.get(self.entry_url(key), headers=self.headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            self.logger.log('remote cache unavailable: %s' % e, level='warn')
+            return None
+
+        if response.status_code == 404:
+            return None
+
+        if response.status_code != 200:
+            self.logger.log('remote cache read failed (%s): %s' % (response.status_code, self.entry_url(key)), level='warn')
+            return None
+
+        try:
+            return response.json()
+        except ValueError:
+            self.logger.log('ignoring unreadable remote cache entry: %s' % self.entry_url(key), level='warn')
+            return None
+
+    def put(self, key, entry):
+        headers = {**self.headers, 'Content-Type': 'application/json'}
+        data = json.dumps(entry, sort_keys=True, default=str)
+
+        try:
+            response = requests.put(self.entry_url(key), data=data, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            self.logger.log('remote cache unavailable: %s' % e, level='warn')
+            return
+
+        if response.status_code >= 300:
+            self.logger.log('remote cache write failed (%s): %s' % (response.status_code, self.entry_url(key)), level='warn')
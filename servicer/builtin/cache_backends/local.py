@@ -0,0 +1,59 @@
+import os
+import json
+import threading
+
+from servicer.files import atomic_write
+from .base_cache_backend import BaseCacheBackend
+
+# stores entries as json files in a local directory
+# the least recently used entries are evicted once more than max_entries are stored
+class CacheBackend(BaseCacheBackend):
+    def __init__(self, config, logger=None):
+        super().__init__(config, logger=logger)
+
+        self.path = config['path']
+        self.max_entries = config.get('max_entries', 500)
+        self.lock = threading.Lock()
+
+    def entry_path(self, key):
+        return os.path.join(self.path, '%s.json' % key)
+
+    def get(self, key):
+        entry_path = self.entry_path(key)
+
+        try:
+            with open(entry_path) as fp:
+                entry = json.load(fp)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        # mark the entry as recently used
+        os.utime(entry_path)
+        return entry
+
+    def put(self, key, entry):
+        atomic_write(self.entry_path(key), json.dumps(entry, indent=2, sort_keys=True, default=str))
+
+        self.evict()
+
+    def evict(self):
+        with self.lock:
+            entries = []
+            for name in os.listdir(self.path):
+                if name.endswith('.json'):
+                    entry_path = os.path.join(self.path, name)
+                    try:
+                        entries.append((os.path.getmtime(entry_path), entry_path))
+                    except FileNotFoundError:
+                        pass
+
+            if len(entries) <= self.max_entries:
+                return
+
+            entries.sort()
+            for _, entry_path in entries[:len(entries) - self.max_entries]:
+                self.logger.log('evicting cached service-step: %s' % entry_path, level='debug')
+                try:
+                    os.remove(entry_path)
+                except FileNotFoundError:
+                    pass
@@ -1,4 +1,6 @@
 import os
+
+from servicer.run import run_until_complete, stream_output_enabled
 from .task_service import Service as BaseService
 
 class Service(BaseService):
@@ -10,12 +12,19 @@ class Service(BaseService):
         super().up()
 
         if 'steps' in self.config:
-            self.run_steps(self.config['steps'])
+            if self.concurrency():
+                run_until_complete(self.run_steps_async(self.config['steps']))
+            else:
+                self.run_steps(self.config['steps'])
 
     def run_steps(self, steps):
         for step in steps:
             getattr(self, step['type'])(**step.get('args', {}))
 
+    async def run_steps_async(self, steps):
+        for step in steps:
+            await self.run_task_async(step['type'], step.get('args', {}))
+
     def pull(self, image_name):
         self.run('docker pull %s' % image_name)
 
@@ -31,19 +40,32 @@ class Service(BaseService):
 
         build_command = '%s %s' % (build_command, path)
 
-        self.run(build_command)
+        self.run(build_command, stream=stream_output_enabled())
 
     def push(self, image=None, tags=[]):
-        if 'latest' not in tags:
-            tags.insert(0, 'latest')
-
-        tags = [t.replace('/', '.') for t in tags]
+        tags = self.push_tags(tags)
 
         self.tag(image=image, tags=tags)
 
         for tag in tags:
             full_path = self.full_image_path(self.config['registry_path'], tag)
-            self.run('docker push %s' % full_path)
+            self.run('docker push %s' % full_path, stream=stream_output_enabled())
+
+    async def push_async(self, image=None, tags=[]):
+        tags = self.push_tags(tags)
+
+        self.tag(image=image, tags=tags)
+
+        await self.run_commands_async([
+            'docker push %s' % self.full_image_path(self.config['registry_path'], tag)
+            for tag in tags
+        ])
+
+    def push_tags(self, tags):
+        if 'latest' not in tags:
+            tags.insert(0, 'latest')
+
+        return [t.replace('/', '.') for t in tags]
 
     def tag(self, image=None, tags=[]):
         for tag in tags:
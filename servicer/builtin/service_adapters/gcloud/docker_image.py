@@ -7,6 +7,21 @@ class Service(DockerImageService):
         self.registry = 'us.gcr.io'
 
     def prune_images(self, older_than='', n_to_keep=0):
+        full_path, digests = self.digests_to_prune(older_than=older_than, n_to_keep=n_to_keep)
+
+        for digest in digests:
+            delete_command = 'gcloud container images delete -q --force-delete-tags "%s@%s"' % (full_path, digest)
+            result = self.run(delete_command)
+
+    async def prune_images_async(self, older_than='', n_to_keep=0):
+        full_path, digests = self.digests_to_prune(older_than=older_than, n_to_keep=n_to_keep)
+
+        await self.run_commands_async([
+            'gcloud container images delete -q --force-delete-tags "%s@%s"' % (full_path, digest)
+            for digest in digests
+        ])
+
+    def digests_to_prune(self, older_than='', n_to_keep=0):
         full_path = self.full_image_path(self.config['registry_path'])
 
         command = "gcloud container images list-tags %s --limit=999999 --sort-by=TIMESTAMP --format='get(digest)'" % full_path
@@ -25,6 +40,6 @@ class Service(DockerImageService):
 
         if n_to_delete > 0:
             self.logger.log('pruning %s image digests from %s' % (n_to_delete, full_path))
-            for digest in shas[:n_to_delete]:
-                delete_command = 'gcloud container images delete -q --force-delete-tags "%s@%s"' % (full_path, digest)
-                result = self.run(delete_command)
+            return full_path, shas[:n_to_delete]
+
+        return full_path, []
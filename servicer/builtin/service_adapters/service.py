@@ -1,12 +1,13 @@
 import os
 
-from servicer.run import run
+from servicer.run import run, run_async
 from servicer.token_interpolator import TokenInterpolator
 
 class Service:
     def __init__(self, config=None, logger=None):
         self.logger = logger
         self.run = run
+        self.run_async = run_async
 
         if config == None:
             return
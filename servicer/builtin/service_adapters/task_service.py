@@ -3,6 +3,8 @@ import os
 import json
 from ruamel import yaml
 
+from servicer.parameter_scope import ParameterScope
+from servicer.run import run_all_async, run_until_complete
 from .service import Service as BaseService
 
 class Service(BaseService):
@@ -10,13 +12,36 @@ class Service(BaseService):
         super().up()
 
         if 'tasks' in self.config:
-            self.run_tasks(self.config['tasks'])
+            if self.concurrency():
+                run_until_complete(self.run_tasks_async(self.config['tasks']))
+            else:
+                self.run_tasks(self.config['tasks'])
 
     def run_tasks(self, tasks):
         for task in tasks:
             args = task.get('args', {})
             getattr(self, task['type'])(**args)
 
+    # opt-in with 'concurrency: N' in the service-step config, tasks still run in order,
+    # but tasks with an async variant run up to N of their shell commands at once
+    def concurrency(self):
+        return self.config.get('concurrency')
+
+    async def run_tasks_async(self, tasks):
+        for task in tasks:
+            await self.run_task_async(task['type'], task.get('args', {}))
+
+    async def run_task_async(self, task_type, args):
+        method = getattr(self, '%s_async' % task_type, None)
+        if method:
+            return await method(**args)
+
+        return getattr(self, task_type)(**args)
+
+    # runs the commands concurrently, cancelling (and killing) the rest if one fails
+    async def run_commands_async(self, commands, **kwargs):
+        return await run_all_async(commands, concurrency=self.concurrency() or 1, **kwargs)
+
     def dig(self, data, path):
         keys = path.split('.')
         while keys:
@@ -57,6 +82,8 @@ class Service(BaseService):
         if not isinstance(files, list):
             files = [files]
 
+        params = ParameterScope(params, self.full_config, os.environ)
+
         for f in files:
             if 'output' not in f:
                 f['output'] = f['input']
@@ -82,6 +109,5 @@ class Service(BaseService):
 
                     os.makedirs(os.path.dirname(output_path), exist_ok=True)
                     with open(output_path, 'w') as out_file:
-                        params = {**os.environ, **self.full_config, **params}
                         data = self.token_interpolator.replace_tokens(data, params=params, ignore_missing_key=ignore_missing_key)
                         out_file.write(data)
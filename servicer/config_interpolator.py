@@ -0,0 +1,169 @@
+import threading
+
+from .parameter_scope import PathIndex
+from .token_interpolator import TokenInterpolator, compile_template
+
+# interpolates a config tree in place, remembering the original template of every string containing tokens
+# and the config paths each template references, so that a subtree can later be resolved in dependency order
+# and only the strings that depend on a changed path (e.g. service-step results) are rendered again
+class ConfigInterpolator():
+    def __init__(self, config, token_interpolator=None, logger=None):
+        self.config = config
+        self.logger = logger
+        self.token_interpolator = token_interpolator or TokenInterpolator(logger=logger)
+        self.lock = threading.RLock()
+
+        # cached lookups of config paths, kept in step with the templates rendered into the tree
+        self.path_index = PathIndex(config)
+
+        # path -> (container, key, template)
+        self.templates = {}
+        # paths whose rendered value still contains tokens
+        self.pending = set()
+        # id(container) -> (container, path)
+        self.containers = {}
+        # path prefix -> template paths below it, in config order
+        self.templates_under = {}
+        # template path -> the paths its tokens reference
+        self.references = {}
+        # referenced path -> template paths referencing it
+        self.referenced_by = {}
+        # prefix of a referenced path -> template paths referencing it or anything below it
+        self.referenced_under = {}
+
+    # indexes the whole tree and renders every template once
+    def interpolate(self, params, ignore_missing_key=False, ignore_default=False):
+        with self.lock:
+            self.index(self.config, (), params, ignore_missing_key, ignore_default)
+
+            for path in self.templates:
+                self.render(path, params, ignore_missing_key, ignore_default)
+
+    def index(self, config, path, params, ignore_missing_key=False, ignore_default=False):
+        if isinstance(config, dict):
+            self.containers[id(config)] = (config, path)
+
+            # keys are only interpolated once, up front
+            keys_to_change = []
+            for key in config.keys():
+                if isinstance(key, str) and compile_template(key).tokens:
+                    new_key = self.token_interpolator.replace_tokens(key, params, ignore_missing_key, ignore_default)
+                    if new_key is not None and new_key not in config.keys():
+                        keys_to_change.append((key, new_key))
+
+            for k in keys_to_change:
+                config[k[1]] = config.pop(k[0])
+
+            items = list(config.items())
+
+        elif isinstance(config, list):
+            self.containers[id(config)] = (config, path)
+            items = list(enumerate(config))
+
+        else:
+            return
+
+        for key, value in items:
+            if isinstance(value, str):
+                if compile_template(value).tokens:
+                    self.add_template(config, key, path + (key,), value)
+            else:
+                self.index(value, path + (key,), params, ignore_missing_key, ignore_default)
+
+    def add_template(self, container, key, path, template):
+        self.templates[path] = (container, key, template)
+        self.references[path] = template_references(template)
+
+        for i in range(len(path)):
+            self.templates_under.setdefault(path[:i], {})[path] = True
+
+        for reference in self.references[path]:
+            self.referenced_by.setdefault(reference, set()).add(path)
+            for i in range(1, len(reference) + 1):
+                self.referenced_under.setdefault(reference[:i], set()).add(path)
+
+    def render(self, path, params, ignore_missing_key=False, ignore_default=False):
+        container, key, template = self.templates[path]
+        value = self.token_interpolator.replace_tokens(template, params, ignore_missing_key, ignore_default)
+        container[key] = value
+        self.path_index.invalidate(path)
+
+        if isinstance(value, str) and compile_template(value).tokens:
+            self.pending.add(path)
+        else:
+            self.pending.discard(path)
+
+    # renders the unresolved templates below an indexed container, after the templates they reference
+    # containers outside of the indexed tree are interpolated directly
+    def resolve(self, config, params):
+        with self.lock:
+            path = self.path_of(config)
+            if path is None:
+                self.token_interpolator.interpolate_tokens(config, params)
+                return
+
+            for template_path in list(self.templates_under.get(path, {})):
+                self.resolve_path(template_path, params, set())
+
+    def resolve_path(self, path, params, visiting):
+        if path not in self.pending or path in visiting:
+            return
+
+        visiting.add(path)
+        for dependency in self.dependencies(path):
+            self.resolve_path(dependency, params, visiting)
+
+        self.render(path, params)
+
+    # templates found at, below or above the paths referenced by a template
+    def dependencies(self, path):
+        dependencies = []
+        for reference in self.references[path]:
+            dependencies.extend(self.templates_under.get(reference, {}))
+            for i in range(1, len(reference) + 1):
+                if reference[:i] in self.templates:
+                    dependencies.append(reference[:i])
+        return dependencies
+
+    # marks every template depending on config[key], directly or through other templates, to be rendered again
+    def invalidate(self, config, key):
+        with self.lock:
+            path = self.path_of(config)
+            if path is None:
+                return
+
+            self.path_index.invalidate(path + (key,))
+
+            stale = self.dependents(path + (key,))
+            seen = set()
+            while stale:
+                template_path = stale.pop()
+                if template_path in seen:
+                    continue
+
+                seen.add(template_path)
+                self.pending.add(template_path)
+                stale.extend(self.dependents(template_path))
+
+    def dependents(self, path):
+        dependents = list(self.referenced_under.get(path, ()))
+        for i in range(1, len(path)):
+            dependents.extend(self.referenced_by.get(path[:i], ()))
+        return dependents
+
+    def path_of(self, config):
+        entry = self.containers.get(id(config))
+        if entry is None or entry[0] is not config:
+            return None
+
+        return entry[1]
+
+# the dotted paths referenced by the tokens of a template, ignoring quoted literals and nested tokens
+def template_references(template):
+    references = set()
+    for token in compile_template(template).tokens:
+        for piece in token[2:-1].split(':', 1):
+            if '${' in piece or piece[:1] in ['"', "'"]:
+                continue
+            references.add(tuple(piece.split('.')))
+    return references
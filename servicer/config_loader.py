@@ -1,8 +1,19 @@
 import os
 import json
-from ruamel import yaml
+import pickle
+import hashlib
 
 from .token_interpolator import TokenInterpolator
+from .config_interpolator import ConfigInterpolator
+from .yaml_cache import YamlCache
+from .files import atomic_write
+
+# bumped whenever the layout of compiled config snapshots changes
+SNAPSHOT_FORMAT = 2
+# args that change the merged config tree, a snapshot is only used by runs with the same values
+SNAPSHOT_ARGS = ['config_loader']
+# upper bound on the size of a snapshot's json header
+SNAPSHOT_HEADER_LIMIT = 1024 * 1024
 
 class ConfigLoader():
     def __init__(self, args={}, logger=None):
@@ -13,14 +24,39 @@ class ConfigLoader():
         self.servicer_config_path = args.get('servicer_config_path')
         self.servicer_config_file_path = '%s/%s' % (self.servicer_config_path, args.get('services_file'))
 
+        persist_path = None
+        self.graph_index_path = None
+        if args.get('config_cache') and self.servicer_config_path:
+            persist_path = '%s/.cache/config.pickle' % self.servicer_config_path
+            self.graph_index_path = '%s/.cache/graph.pickle' % self.servicer_config_path
+        self.yaml_cache = YamlCache(persist_path=persist_path, loader=args.get('config_loader'), logger=logger)
+
+        self.snapshot_path = args.get('snapshot_path')
+        if not self.snapshot_path and self.servicer_config_path:
+            self.snapshot_path = '%s/.cache/compiled.pickle' % self.servicer_config_path
+        # snapshots are unpickled, so they are only loaded when asked for
+        self.use_snapshot = bool(args.get('compiled') or args.get('snapshot_path'))
+        self.compiled_graph = None
+
     def load_config(self):
         services_config = {}
 
         if self.servicer_config_path and self.servicer_config_file_path:
-            self.logger.log('loading services config from (%s)' % self.servicer_config_file_path)
-            self.load_extended_config(config_path=self.servicer_config_file_path, config=services_config)
-            services_config = self.merge_defaults(config=services_config)
-            self.merge_included_configs(config_path=self.servicer_config_file_path, config=services_config)
+            snapshot = None
+            if self.use_snapshot and self.args.get('command') != 'compile':
+                snapshot = self.load_snapshot()
+
+            if snapshot:
+                self.logger.log('loading compiled services config from (%s)' % self.snapshot_path)
+                services_config = snapshot['config']
+                self.compiled_graph = snapshot['graph']
+            else:
+                self.logger.log('loading services config from (%s)' % self.servicer_config_file_path)
+                self.load_extended_config(config_path=self.servicer_config_file_path, config=services_config)
+                services_config = self.merge_defaults(config=services_config)
+                self.merge_included_configs(config_path=self.servicer_config_file_path, config=services_config)
+
+                self.yaml_cache.save()
 
             services_config['config_path'] = self.servicer_config_path
 
@@ -34,7 +70,7 @@ class ConfigLoader():
 
     # recursively load configs, overwriting base config values
     def load_extended_config(self, config_path=None, config=None):
-        merge_config = yaml.load(open(config_path), Loader=yaml.Loader)
+        merge_config = self.yaml_cache.load(config_path)
 
         if 'extends' in merge_config:
             config_path_pieces = config_path.split('/')
@@ -97,7 +133,7 @@ class ConfigLoader():
 
     def merge_defaults(self, config={}):
         default_config_path = '%s/builtin/defaults.yaml' % self.module_path
-        default_config = yaml.load(open(default_config_path), Loader=yaml.Loader)
+        default_config = self.yaml_cache.load(default_config_path)
         self.merge_config(default_config, config)
 
         return default_config
@@ -115,7 +151,77 @@ class ConfigLoader():
 
     def interpolate_config(self, config):
         self.logger.log('Interpolating Tokens...')
-        self.token_interpolator.interpolate_tokens(config, os.environ, ignore_missing_key=True, ignore_default=True)
+        config_interpolator = ConfigInterpolator(config, token_interpolator=self.token_interpolator, logger=self.logger)
+        config_interpolator.interpolate(os.environ, ignore_missing_key=True, ignore_default=True)
+
+        return config_interpolator
+
+    # a snapshot holds the merged, uninterpolated config and the direct dependencies of each service-step
+    # it starts with a json header line, checked before the pickled payload is read: the snapshot is only used
+    # for the same services file and SNAPSHOT_ARGS, while the digest of the config files it was compiled from is unchanged
+    def load_snapshot(self):
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return None
+
+        try:
+            with open(self.snapshot_path, 'rb') as fp:
+                header = json.loads(fp.readline(SNAPSHOT_HEADER_LIMIT).decode('utf-8'))
+
+                if not isinstance(header, dict) or header.get('format') != SNAPSHOT_FORMAT:
+                    self.logger.log('ignoring compiled config in an unknown format, run "servicer compile" to update it: %s' % self.snapshot_path, level='warn')
+                    return None
+
+                if header.get('services_file') != self.snapshot_services_file() or header.get('args') != self.snapshot_args():
+                    self.logger.log('ignoring compiled config for a different services file or config loader: %s' % self.snapshot_path, level='warn')
+                    return None
+
+                if header.get('digest') != self.source_digest(header.get('sources') or []):
+                    self.logger.log('compiled config is out of date, run "servicer compile" to update it: %s' % self.snapshot_path, level='warn')
+                    return None
+
+                payload = pickle.load(fp)
+        except Exception as e:
+            self.logger.log('ignoring unreadable compiled config (%s): %s' % (self.snapshot_path, e), level='warn')
+            return None
+
+        return payload
+
+    def write_snapshot(self, config, graph=None):
+        sources = sorted(self.yaml_cache.used)
+        header = {
+            'format': SNAPSHOT_FORMAT,
+            'services_file': self.snapshot_services_file(),
+            'args': self.snapshot_args(),
+            'digest': self.source_digest(sources),
+            'sources': sources,
+        }
+        payload = {
+            'config': {key: value for key, value in config.items() if key not in ['args', 'module_path', 'config_path']},
+            'graph': graph,
+        }
+
+        data = ('%s\n' % json.dumps(header, sort_keys=True)).encode('utf-8') + pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+        atomic_write(self.snapshot_path, data, mode='wb')
+
+        self.logger.log('compiled services config from %s files: %s' % (len(sources), self.snapshot_path))
+
+    def snapshot_services_file(self):
+        return os.path.realpath(self.servicer_config_file_path)
+
+    def snapshot_args(self):
+        return {key: self.args.get(key) for key in SNAPSHOT_ARGS}
+
+    def source_digest(self, sources):
+        digest = hashlib.sha256()
+        for path in sources:
+            try:
+                with open(path, 'rb') as fp:
+                    digest.update(('\0%s\0' % path).encode('utf-8'))
+                    digest.update(fp.read())
+            except FileNotFoundError:
+                return None
+
+        return digest.hexdigest()
 
     def load_environment_variables(self, variables={}):
         for key, value in variables.items():
@@ -4,7 +4,7 @@ import os
 from .topological_order import toposort2
 
 class DependencyGrapher():
-    def __init__(self, config, active_services, steps, step_order, active_steps, logger=None):
+    def __init__(self, config, active_services, steps, step_order, active_steps, depends_on=None, graph_index=None, logger=None):
         self.toposort2 = toposort2
         self.logger = logger
         self.config = config
@@ -12,39 +12,93 @@ class DependencyGrapher():
         self.steps = steps
         self.step_order = step_order
         self.active_steps = active_steps
-
+        # direct dependencies of each (service, step) from a compiled config snapshot, if any
+        self.compiled_depends_on = {parse_service_step(k): v for k, v in (depends_on or {}).items()}
+        # a persistent index of the direct dependencies of unchanged services, if any
+        self.graph_index = graph_index
+
+        # step name -> position in the step order
+        self.step_index = {step_name: i for i, step_name in enumerate(step_order)}
+        # service name -> {step name: the service's previous step in the step order}, built on first use
+        self.previous_steps = {}
+        # step name -> services having that step, in config order, built on first use
+        self.step_services = None
+        # services with a service-step in the graph being built, kept current by add_dependencies
+        self.graph_services = set()
+
+    # service-steps are (service, step) tuples while the graph is built, and 'service:step' strings in its result
     def order_service_steps(self, services):
         follow_dependencies = True
         if self.config['args']['ignore_dependencies']:
             follow_dependencies = False
 
-        dependencies = {}
+        graph = {}
 
         for service_name in services:
             service = self.config['services'][service_name]
 
             for step_name in self.active_steps:
                 if step_name in service['steps']:
-                    service_step_name = '%s:%s' % (service_name, step_name)
-                    self.add_dependencies(dependencies, service_step_name, follow_dependencies)
+                    self.add_dependencies(graph, (service_name, step_name), follow_dependencies)
 
-        self.add_wildcard_dependencies(dependencies, follow_dependencies)
+        self.add_wildcard_dependencies(graph, follow_dependencies)
 
         # remove orphaned build dependencies
         if self.config['args']['ignore_dependencies']:
-            dep_keys = dependencies.keys()
-            for key, value in dependencies.items():
-                dependencies[key] = set([v for v in value if v in dep_keys])
+            for key, value in graph.items():
+                graph[key] = set([v for v in value if v in graph])
+
+        dependencies = {format_service_step(k): set(format_service_step(v) for v in value) for k, value in graph.items()}
 
         self.logger.log('Dependency Graph:')
         self.logger.log(json.dumps(dependencies, indent=4, sort_keys=True, default=str))
-        return self.toposort2(dependencies)
+        service_step_order = self.toposort2(dependencies)
+
+        # keep the unflattened graph for schedulers that do not wait on whole layers
+        self.dependencies = dependencies
+
+        if self.graph_index:
+            self.graph_index.save(self.config['services'])
+
+        return service_step_order
+
+    # services depending on any of the given services in the last ordered graph, directly or transitively
+    def dependent_services(self, services):
+        dependents = {}
+        for service_step_name, depends_on in self.dependencies.items():
+            service_name = parse_service_step(service_step_name)[0]
+            for dep in depends_on:
+                dependents.setdefault(parse_service_step(dep)[0], set()).add(service_name)
+
+        found = set()
+        stack = list(services)
+        while stack:
+            for dependent in dependents.get(stack.pop(), ()):
+                if dependent not in found and dependent not in services:
+                    found.add(dependent)
+                    stack.append(dependent)
+
+        return found
 
     def service_step_depends_on(self, service_step_name):
-        name_pieces = service_step_name.split(':')
-        service_name = name_pieces[0]
+        return self.step_depends_on(*parse_service_step(service_step_name))
+
+    def step_depends_on(self, service_name, step_name):
+        compiled = self.compiled_depends_on.get((service_name, step_name))
+        if compiled is not None:
+            return list(compiled)
+
+        if self.graph_index:
+            depends_on = self.graph_index.depends_on(service_name, step_name, self.config['services'][service_name], self.direct_depends_on)
+        else:
+            depends_on = self.direct_depends_on(service_name, step_name)
+
+        # append implied step dependencies
+        return self.fill_implied_step_dependencies(depends_on, step_name)
+
+    # dependencies derived from the service's own config, before implied steps are filled in
+    def direct_depends_on(self, service_name, step_name):
         service = self.config['services'][service_name]
-        step_name = name_pieces[1]
 
         depends_on = []
 
@@ -55,20 +109,20 @@ class DependencyGrapher():
         depends_on.extend(self.get_depends_on(service['steps'][step_name]))
 
         # default step based dependencies
-        if self.config['graph']['implicit-step-dependencies'] and step_name in self.step_order:
-            step_index = self.step_order.index(step_name)
-            while step_index > 0:
-                step_index -= 1
-                dep_step_name = self.step_order[step_index]
+        if self.config['graph']['implicit-step-dependencies']:
+            previous_step = self.previous_step(service_name, step_name)
+            if previous_step:
+                depends_on.append('%s:%s' % (service_name, previous_step))
 
-                if dep_step_name in service['steps']:
-                    depends_on.append('%s:%s' % (service_name, dep_step_name))
-                    break
+        return depends_on
 
-        # append implied step dependencies
-        depends_on = self.fill_implied_step_dependencies(depends_on, step_name)
+    # the closest step before step_name in the step order that the service also has, if any
+    def previous_step(self, service_name, step_name):
+        if service_name not in self.previous_steps:
+            service_steps = sorted((s for s in self.config['services'][service_name]['steps'] if s in self.step_index), key=self.step_index.get)
+            self.previous_steps[service_name] = dict(zip(service_steps[1:], service_steps))
 
-        return depends_on
+        return self.previous_steps[service_name].get(step_name)
 
     def fill_implied_step_dependencies(self, depends_on, step_name):
         deps = []
@@ -88,63 +142,72 @@ class DependencyGrapher():
                 depends_on.append(config['depends_on'])
         return depends_on
 
-    def add_dependencies(self, dependencies, service_step_name, follow_dependencies=True):
-        if service_step_name in dependencies:
+    def add_dependencies(self, dependencies, service_step, follow_dependencies=True):
+        if service_step in dependencies:
             return  # only calculate dependencies for each service-step once
         else:
-            dependencies[service_step_name] = set()
-
-        depends_on = self.service_step_depends_on(service_step_name)
+            dependencies[service_step] = set()
+            self.graph_services.add(service_step[0])
 
-        service_step_name_pieces = service_step_name
+        depends_on = self.step_depends_on(*service_step)
 
         for dep in depends_on:
-            dep_pieces = dep.split(':')
-            service_dependency = dep_pieces[0]
-            step_dependency = dep_pieces[1]
+            service_dependency, step_dependency = parse_service_step(dep)
 
             if service_dependency == '*':
-                # self.delayed_dependencies.append(service_step_name)
-                self.add_dependency(dependencies, service_step_name, service_dependency, step_dependency, False)
+                # self.delayed_dependencies.append(service_step)
+                self.add_dependency(dependencies, service_step, service_dependency, step_dependency, False)
                 continue
             elif service_dependency not in self.config['services']:
                 msg = 'Invalid service dependency specified: %s, "%s" must be included in services: [%s]' % (dep, service_dependency, ','.join(self.config['services'].keys()))
                 raise ValueError(msg)
 
             if step_dependency in self.steps:
-                self.add_dependency(dependencies, service_step_name, service_dependency, step_dependency, follow_dependencies)
+                self.add_dependency(dependencies, service_step, service_dependency, step_dependency, follow_dependencies)
             else:
                 msg = 'Invalid step dependency specified: %s, "%s" must be included in steps: [%s]' % (dep, step_dependency, ','.join(self.steps.keys()))
                 raise ValueError(msg)
 
-    def add_dependency(self, dependencies, service_step_name, service_name, step_name, follow_dependencies):
-        dep_service_step_name = '%s:%s' % (service_name, step_name)
-        dependencies[service_step_name].add(dep_service_step_name)
+    def add_dependency(self, dependencies, service_step, service_name, step_name, follow_dependencies):
+        dep_service_step = (service_name, step_name)
+        dependencies[service_step].add(dep_service_step)
         if follow_dependencies:
-            self.add_dependencies(dependencies, dep_service_step_name, follow_dependencies)
+            self.add_dependencies(dependencies, dep_service_step, follow_dependencies)
 
+    # expands '*:step' dependencies to the services with that step already in the graph,
+    # and '*:step!' dependencies to every service with that step
     def add_wildcard_dependencies(self, dependencies, follow_dependencies=True):
+        self.graph_services = set(service_name for service_name, _ in dependencies)
+
         dependency_list = list(dependencies)
-        for service_step_name in reversed(dependency_list):
-            depends_on = dependencies[service_step_name].copy()
-            for dep in depends_on:
-                if dep.startswith('*'):
-                    dependencies[service_step_name].remove(dep)
-                    hard_dependency = False
-
-                    if dep.endswith('!'):
-                        dep = dep[0:-1]
-                        hard_dependency = True
-
-                    step_dependency = dep.split(':')[1]
-
-                    all_services = []
-                    if hard_dependency:
-                        all_services = self.config['services'].keys()
-                    else:
-                        service_names = [d.split(':')[0] for d in dependencies.keys()]
-                        all_services = list(set(service_names))
-
-                    for _service_name in all_services:
-                        if step_dependency in self.config['services'][_service_name]['steps']:
-                            self.add_dependency(dependencies, service_step_name, _service_name, step_dependency, follow_dependencies)
+        for service_step in reversed(dependency_list):
+            wildcards = [dep for dep in dependencies[service_step] if dep[0] == '*']
+            for dep in wildcards:
+                dependencies[service_step].remove(dep)
+
+                step_dependency = dep[1]
+                if step_dependency.endswith('!'):
+                    step_dependency = step_dependency[0:-1]
+                    all_services = self.services_with_step(step_dependency)
+                else:
+                    all_services = [s for s in self.services_with_step(step_dependency) if s in self.graph_services]
+
+                for _service_name in all_services:
+                    self.add_dependency(dependencies, service_step, _service_name, step_dependency, follow_dependencies)
+
+    def services_with_step(self, step_name):
+        if self.step_services is None:
+            self.step_services = {}
+            for service_name, service in self.config['services'].items():
+                for _step_name in service.get('steps', {}):
+                    self.step_services.setdefault(_step_name, []).append(service_name)
+
+        return self.step_services.get(step_name, [])
+
+# 'service:step' -> (service, step)
+def parse_service_step(service_step_name):
+    name_pieces = service_step_name.split(':')
+    return (name_pieces[0], name_pieces[1])
+
+def format_service_step(service_step):
+    return '%s:%s' % service_step
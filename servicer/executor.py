@@ -0,0 +1,183 @@
+import sys
+import heapq
+import threading
+from io import StringIO
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, FIRST_EXCEPTION, wait
+
+# proxies a stream (sys.stdout), giving each capturing worker thread its own buffer
+# so output from concurrently running service-steps is not interleaved
+class OutputBuffer():
+    def __init__(self, stream):
+        self.stream = stream
+        self.buffers = {}
+        self.lock = threading.Lock()
+
+    def capture(self):
+        self.buffers[threading.get_ident()] = StringIO()
+
+    def release(self):
+        buffer = self.buffers.pop(threading.get_ident(), None)
+        if buffer:
+            with self.lock:
+                self.stream.write(buffer.getvalue())
+                self.stream.flush()
+
+    def write(self, data):
+        buffer = self.buffers.get(threading.get_ident())
+        if buffer:
+            return buffer.write(data)
+
+        with self.lock:
+            return self.stream.write(data)
+
+    def flush(self):
+        if threading.get_ident() not in self.buffers:
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+class ParallelExecutor():
+    def __init__(self, workers=1, logger=None):
+        self.workers = workers
+        self.logger = logger
+
+    # runs each layer on a bounded worker pool, a layer must finish before the next starts
+    def run_layers(self, layers, fn):
+        for layer in layers:
+            self.run_layer(layer, fn)
+
+    def run_layer(self, items, fn):
+        if not items:
+            return
+
+        output = OutputBuffer(sys.stdout)
+        sys.stdout = output
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                futures = [pool.submit(self.run_buffered, output, fn, item) for item in items]
+                done, pending = wait(futures, return_when=FIRST_EXCEPTION)
+
+                # fail fast, nothing that has not started yet will run after the first error
+                for f in pending:
+                    f.cancel()
+
+                for f in futures:
+                    if f in done and f.exception():
+                        raise f.exception()
+        finally:
+            sys.stdout = output.stream
+
+    # runs each item as soon as all of its own dependencies have finished
+    # when more items are ready than there are workers, the longest remaining path goes first
+    def run_graph(self, dependencies, fn, weights=None):
+        waiting_on, dependents = self.build_graph(dependencies)
+
+        if not waiting_on:
+            return
+
+        priorities = self.critical_path_lengths(waiting_on, dependents, weights or {})
+        ready = [(-priorities[item], item) for item, deps in waiting_on.items() if not deps]
+        heapq.heapify(ready)
+        remaining = len(waiting_on)
+
+        output = OutputBuffer(sys.stdout)
+        sys.stdout = output
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                running = {}
+
+                while ready or running:
+                    while ready and len(running) < self.workers:
+                        _, item = heapq.heappop(ready)
+                        running[pool.submit(self.run_buffered, output, fn, item)] = item
+
+                    if not running:
+                        break
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for f in sorted(done, key=lambda f: running[f]):
+                        item = running.pop(f)
+                        remaining -= 1
+
+                        # fail fast, let running items finish but dispatch nothing else
+                        if f.exception():
+                            wait(running)
+                            raise f.exception()
+
+                        for dependent in dependents[item]:
+                            waiting_on[dependent].discard(item)
+                            if not waiting_on[dependent]:
+                                heapq.heappush(ready, (-priorities[dependent], dependent))
+        finally:
+            sys.stdout = output.stream
+
+        if remaining:
+            blocked = sorted(item for item, deps in waiting_on.items() if deps)
+            raise ValueError('A cyclic dependency exists amongst %s' % blocked)
+
+    # simulates run_graph with the given item durations, returning the estimated total duration
+    def estimate_duration(self, dependencies, weights):
+        waiting_on, dependents = self.build_graph(dependencies)
+        priorities = self.critical_path_lengths(waiting_on, dependents, weights)
+
+        ready = [(-priorities[item], item) for item, deps in waiting_on.items() if not deps]
+        heapq.heapify(ready)
+        running = []
+        now = 0
+
+        while ready or running:
+            while ready and len(running) < self.workers:
+                _, item = heapq.heappop(ready)
+                heapq.heappush(running, (now + weights.get(item, 0), item))
+
+            now, item = heapq.heappop(running)
+            for dependent in dependents[item]:
+                waiting_on[dependent].discard(item)
+                if not waiting_on[dependent]:
+                    heapq.heappush(ready, (-priorities[dependent], dependent))
+
+        return now
+
+    # returns the dependencies of each item (ignoring self dependencies) and the items that depend on each item
+    def build_graph(self, dependencies):
+        dependents = {}
+        waiting_on = {}
+        for item, deps in dependencies.items():
+            waiting_on[item] = set(d for d in deps if d != item)
+            dependents.setdefault(item, set())
+            for d in waiting_on[item]:
+                dependents.setdefault(d, set()).add(item)
+                waiting_on.setdefault(d, set())
+
+        return waiting_on, dependents
+
+    # longest weighted path from each item to the end of the graph, including the item itself
+    def critical_path_lengths(self, waiting_on, dependents, weights):
+        lengths = {}
+        in_degree = {item: len(deps) for item, deps in waiting_on.items()}
+        order = [item for item, degree in in_degree.items() if degree == 0]
+
+        for item in order:
+            for dependent in dependents[item]:
+                in_degree[dependent] -= 1
+                if in_degree[dependent] == 0:
+                    order.append(dependent)
+
+        for item in reversed(order):
+            downstream = [lengths[d] for d in dependents[item] if d in lengths]
+            lengths[item] = weights.get(item, 1) + max(downstream, default=0)
+
+        for item in waiting_on:
+            lengths.setdefault(item, weights.get(item, 1))
+
+        return lengths
+
+    def run_buffered(self, output, fn, item):
+        output.capture()
+        try:
+            return fn(item)
+        finally:
+            output.release()
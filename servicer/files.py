@@ -0,0 +1,35 @@
+import os
+import tempfile
+
+# replaces the file at path with data in one step, so readers (including other servicer processes
+# in the same workspace) see either the old or the new contents, never a partial write
+def atomic_write(path, data, mode='w'):
+    directory = os.path.dirname(path) or '.'
+    make_ignored_directory(directory)
+
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.%s.' % os.path.basename(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode) as fp:
+            fp.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+# creates directory (and its missing parents) for servicer's own state, the outermost directory created gets a
+# .gitignore ignoring everything in it, so adapters committing the working tree never commit caches or timings
+def make_ignored_directory(directory):
+    created = None
+    path = os.path.abspath(directory)
+    while not os.path.exists(path):
+        created = path
+        path = os.path.dirname(path)
+
+    os.makedirs(directory, exist_ok=True)
+
+    if created:
+        with open(os.path.join(created, '.gitignore'), 'w') as fp:
+            fp.write('*\n')
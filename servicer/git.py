@@ -10,13 +10,22 @@ class Git():
         self.logger = logger
         self.hide_output = hide_output
         self.protocol = os.getenv('GIT_PROTOCOL', protocol)
+        # command -> output of read-only git queries made during this run, cleared by anything changing refs
+        self.memo = {}
 
+    def query(self, command, hide_output=None):
+        if command not in self.memo:
+            self.memo[command] = self.run(command, hide_output=hide_output or self.hide_output)['stdout']
+        return self.memo[command]
+
+    def clear_memo(self):
+        self.memo = {}
+
+    # authors of the commits on HEAD that are not on ref, leaving out commits whose changes were cherry-picked to ref
+    # (the commits "git cherry ref" marks with +) in a single git log
     def authors_for_changes_ahead_of_ref(self, ref):
-        forward_commits = self.commits_against_ref(ref, commit_type='+')
-        authors = set()
-        for c in forward_commits:
-            authors.add(self.author_for_ref(c))
-        return sorted(list(authors))
+        output = self.query('git log --right-only --cherry-pick --no-merges --format=%%an %s...HEAD' % ref)
+        return sorted(set(a for a in output.strip().split('\n') if a))
 
     def commits_against_ref(self, ref, commit_type='', hide_output=None):
         result = self.run('git cherry %s' % ref, hide_output=hide_output or self.hide_output)
@@ -48,25 +57,42 @@ class Git():
             command = '%s %s' % (command, tag)
 
         self.run(command, hide_output=hide_output or self.hide_output)
+        self.clear_memo()
 
         if push:
             self.push(ref=tag)
 
-    def delete_tag(self, tags):
+    # deletes tags locally and on the remote, batch_size tags per git tag -d and git push (all at once by default)
+    def delete_tag(self, tags, batch_size=None):
         if not isinstance(tags, list):
             tags = [tags]
 
-        for tag in tags:
-            self.run('git tag -d %s' % tag, check=False)
-            self.push(ref=':refs/tags/%s' % tag)
+        if not tags:
+            return
+
+        batch_size = batch_size or len(tags)
+        for i in range(0, len(tags), batch_size):
+            batch = tags[i:i + batch_size]
+            self.run('git tag -d %s' % ' '.join(batch), check=False)
+            self.push(ref=' '.join(':refs/tags/%s' % tag for tag in batch))
+
+        self.clear_memo()
+
+    # tags and remote branches, from a single for-each-ref
+    def refs(self):
+        output = self.query('git for-each-ref --format="%(refname)" refs/tags refs/remotes', hide_output=True)
+        return [r for r in output.strip().split('\n') if r]
 
     def list_tags(self):
-        result = self.run('git tag', hide_output=True)
-        return result['stdout'].strip().split('\n')
+        return [r[len('refs/tags/'):] for r in self.refs() if r.startswith('refs/tags/')]
+
+    # tracked files and untracked files that are not ignored
+    def list_files(self):
+        result = self.run('git ls-files --cached --others --exclude-standard', hide_output=True)
+        return [f for f in result['stdout'].split('\n') if f]
 
     def list_remote_branches(self):
-        result = self.run('git branch -r', hide_output=True)
-        return result['stdout'].strip().split('\n')
+        return [r[len('refs/remotes/'):] for r in self.refs() if r.startswith('refs/remotes/')]
 
     def sanitize_tag(self, tag):
         for ch in '[ ]'.split():
@@ -74,14 +100,25 @@ class Git():
         return tag
 
     def set_config(self, config=None):
+        values = self.config_values()
         for key, value in config.items():
             if not value:
                 continue
 
-            result = self.run('git config %s' % key)
-            if not result['stdout'].strip():
+            if not values.get(config_key(key)):
                 self.run('git config %s "%s"' % (key, value))
 
+        self.memo.pop('git config --list', None)
+
+    # every git config value, from a single git config --list
+    def config_values(self):
+        values = {}
+        for line in self.query('git config --list', hide_output=True).split('\n'):
+            key, _, value = line.partition('=')
+            if key:
+                values[config_key(key)] = value
+        return values
+
     def commit(self, add='.', message=None, check_commit=False):
         if not isinstance(add, list):
             add = [add]
@@ -89,7 +126,9 @@ class Git():
         for a in add:
             self.run('git add %s' % a)
 
-        return self.run('git commit -m "%s"' % message, check=check_commit)
+        result = self.run('git commit -m "%s"' % message, check=check_commit)
+        self.clear_memo()
+        return result
 
     def push(self, origin='origin', ref=None, local_ref=None, protocol=None, no_verify=False):
         if protocol == None:
@@ -116,14 +155,39 @@ class Git():
         else:
             raise ValueError('Invalid git push protocol: %s' % protocol)
 
-        return self.run(command)
+        result = self.run(command)
+        self.clear_memo()
+        return result
+
+    # the branch, commit and abbreviated commit of HEAD, from a single git log
+    def head(self, min_length=None):
+        command = 'git log -1 --format="%H%n%h%n%D"'
+        if min_length:
+            command = '%s --abbrev=%s' % (command, min_length)
+        command = '%s HEAD' % command
+
+        commit, commit_short, decorations = (self.query(command).strip().split('\n') + ['', ''])[:3]
+
+        # HEAD is decorated with "HEAD -> branch" when a branch is checked out, like rev-parse --abbrev-ref
+        branch = 'HEAD'
+        for decoration in decorations.split(', '):
+            if decoration.startswith('HEAD -> '):
+                branch = decoration[len('HEAD -> '):]
+
+        return {'branch': branch, 'commit': commit, 'commit_short': commit_short}
 
     def current_branch(self, ref='HEAD'):
+        if ref == 'HEAD':
+            return self.head()['branch']
+
         command = 'git rev-parse --abbrev-ref %s' % ref
-        result = self.run(command)
-        return result['stdout'].strip()
+        return self.query(command).strip()
 
     def current_commit(self, min_length=None, verify=False, ref='HEAD'):
+        if ref == 'HEAD' and not verify:
+            head = self.head(min_length=min_length)
+            return head['commit_short'] if min_length else head['commit']
+
         command = 'git rev-parse'
         if min_length:
             command = '%s --short=%s' % (command, min_length)
@@ -131,17 +195,40 @@ class Git():
             command = '%s --verify' % command
         command = '%s %s' % (command, ref)
 
-        result = self.run(command)
-        return result['stdout'].strip()
+        return self.query(command).strip()
 
     def author_for_ref(self, ref=None):
         command = 'git show --quiet --format="%an"'
         if ref:
             command = '%s %s' % (command, ref)
 
-        result = self.run(command)
-        return result['stdout'].strip()
+        return self.query(command).strip()
+
+    # the most recent tag reachable from ref, if any
+    def latest_tag(self, match=None, ref='HEAD'):
+        command = 'git describe --tags --abbrev=0'
+        if match:
+            command = '%s --match "%s"' % (command, match)
+        command = '%s %s' % (command, ref)
 
-    def fetch(self):
+        if command not in self.memo:
+            result = self.run(command, check=False, hide_output=self.hide_output)
+            self.memo[command] = result['stdout'] if result['status'] == 0 else ''
+        return self.memo[command].strip()
+
+    def fetch(self, tags=False):
         command = 'git fetch'
+        if tags:
+            command = '%s --tags' % command
         self.run(command)
+        self.clear_memo()
+
+# git config section and variable names are case-insensitive, subsection names (e.g. the url in
+# url.<url>.insteadOf, or the name in remote.<name>.url) are not
+def config_key(key):
+    section, _, rest = key.partition('.')
+    subsection, _, name = rest.rpartition('.')
+    if not subsection:
+        return key.lower()
+
+    return '%s.%s.%s' % (section.lower(), subsection, name.lower())
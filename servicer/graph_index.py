@@ -0,0 +1,80 @@
+import os
+import json
+import pickle
+import hashlib
+
+from .files import atomic_write
+
+# remembers the direct dependencies of every step of a service, keyed by a digest of the service's
+# depends_on settings and steps, so unchanged services are not walked again to rebuild the dependency graph
+# entries are dropped wholesale when the global graph settings (step order, implicit step dependencies) change
+class GraphIndex():
+    def __init__(self, persist_path=None, settings=None, logger=None):
+        self.persist_path = persist_path
+        self.logger = logger
+        self.settings_digest = digest(settings)
+        # service name -> (digest, {step name: direct depends_on})
+        self.entries = {}
+        self.checked = set()
+        self.changed = False
+
+        if self.persist_path:
+            self.load_persisted()
+
+    # the direct dependencies of a service-step, from the index or from compute(service_name, step_name)
+    def depends_on(self, service_name, step_name, service, compute):
+        # each service's digest is checked once per run
+        if service_name not in self.checked:
+            service_digest = service_graph_digest(service)
+            entry = self.entries.get(service_name)
+            if entry is None or entry[0] != service_digest:
+                self.entries[service_name] = (service_digest, {})
+                self.changed = True
+            self.checked.add(service_name)
+
+        steps = self.entries[service_name][1]
+        if step_name not in steps:
+            steps[step_name] = compute(service_name, step_name)
+            self.changed = True
+
+        return steps[step_name]
+
+    def load_persisted(self):
+        if not os.path.exists(self.persist_path):
+            return
+
+        try:
+            with open(self.persist_path, 'rb') as fp:
+                index = pickle.load(fp)
+        except Exception as e:
+            if self.logger:
+                self.logger.log('ignoring unreadable graph index (%s): %s' % (self.persist_path, e), level='warn')
+            return
+
+        if index.get('settings') == self.settings_digest:
+            self.entries = index['entries']
+
+    # persists the index, dropping services that are no longer configured
+    def save(self, services):
+        if not self.persist_path:
+            return
+
+        entries = {name: entry for name, entry in self.entries.items() if name in services}
+        if not self.changed and len(entries) == len(self.entries):
+            return
+
+        data = pickle.dumps({'settings': self.settings_digest, 'entries': entries}, protocol=pickle.HIGHEST_PROTOCOL)
+        atomic_write(self.persist_path, data, mode='wb')
+
+        self.entries = entries
+        self.changed = False
+
+# a digest of everything in a service's config that its direct dependencies are derived from
+def service_graph_digest(service):
+    return digest([
+        service.get('depends_on'),
+        {step_name: (step or {}).get('depends_on') for step_name, step in service['steps'].items()},
+    ])
+
+def digest(value):
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode('utf-8')).hexdigest()
@@ -0,0 +1,104 @@
+import threading
+from collections.abc import Mapping
+
+# read-only, layered view over several mappings for token interpolation, the first mapping holding a key wins
+# nothing is copied, so later changes to the underlying mappings (e.g. os.environ) are visible
+class ParameterScope(Mapping):
+    def __init__(self, *maps):
+        self.maps = [m for m in maps if m is not None]
+
+    # a new scope whose mappings take precedence over this scope's
+    def push(self, *maps):
+        return ParameterScope(*maps, *self.maps)
+
+    def __getitem__(self, key):
+        for m in self.maps:
+            if key in m:
+                return m[key]
+
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return any(key in m for m in self.maps)
+
+    def __iter__(self):
+        seen = set()
+        for m in self.maps:
+            for key in m:
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+
+    def __len__(self):
+        return len(set().union(*self.maps))
+
+    def __repr__(self):
+        return 'ParameterScope(%s)' % ', '.join(repr(m) for m in self.maps)
+
+    # resolves a path (a sequence of keys) in the first mapping holding its first key
+    def get_path(self, path, ignore_missing_key=False):
+        for m in self.maps:
+            if path[0] in m:
+                if isinstance(m, PathIndex):
+                    return m.get_path(path, ignore_missing_key)
+                return walk_path(m, path, ignore_missing_key)
+
+        if ignore_missing_key:
+            return None
+
+        raise KeyError(path[0])
+
+# a mapping that remembers the values found at the paths looked up in it
+# invalidate() must be called with the path of any subtree that is replaced
+class PathIndex(Mapping):
+    def __init__(self, root):
+        self.root = root
+        self.lock = threading.Lock()
+        self.values = {}
+        # path prefix -> cached paths below it
+        self.paths_under = {}
+
+    def get_path(self, path, ignore_missing_key=False):
+        path = tuple(path)
+        if path in self.values:
+            return self.values[path]
+
+        value = walk_path(self.root, path, ignore_missing_key)
+
+        # misses are not cached, so keys added later are always found
+        if value is not None:
+            with self.lock:
+                self.values[path] = value
+                for i in range(len(path)):
+                    self.paths_under.setdefault(path[:i], set()).add(path)
+
+        return value
+
+    def invalidate(self, path=()):
+        path = tuple(path)
+        with self.lock:
+            for cached in self.paths_under.pop(path, set()):
+                self.values.pop(cached, None)
+
+            for i in range(len(path) + 1):
+                self.values.pop(path[:i], None)
+
+    def __getitem__(self, key):
+        return self.root[key]
+
+    def __contains__(self, key):
+        return key in self.root
+
+    def __iter__(self):
+        return iter(self.root)
+
+    def __len__(self):
+        return len(self.root)
+
+def walk_path(value, path, ignore_missing_key=False):
+    for key in path:
+        if ignore_missing_key and key not in value:
+            return None
+        value = value[key]
+
+    return value
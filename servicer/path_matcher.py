@@ -0,0 +1,144 @@
+import re
+
+# characters that end the literal prefix of a path regex
+REGEX_CHARACTERS = set('.^$*+?{}[]()|\\')
+# quantifiers that make the character before them optional or repeated
+QUANTIFIERS = set('*+?{')
+
+# watch_paths and ignore_paths are regexes when wrapped in slashes, otherwise * matches anything
+# either way they match from the start of a path
+def sanitize_regex(matcher):
+    if matcher.startswith('/') and matcher.endswith('/'):
+        return matcher[1:-1]
+
+    return matcher.replace('*', '.*')
+
+# the characters every path matching the regex starts with
+def literal_prefix(regex):
+    if '|' in regex:
+        return ''
+
+    prefix = ''
+    for c in regex:
+        if c in REGEX_CHARACTERS:
+            if c in QUANTIFIERS:
+                prefix = prefix[:-1]
+            break
+        prefix += c
+
+    return prefix
+
+# matches paths against the watch_paths and ignore_paths of many owners (e.g. services) at once
+# every distinct pattern is compiled once and indexed in a trie by its literal prefix, so a path is only
+# checked against the patterns whose prefix it starts with, and patterns that are nothing more than a prefix
+# (e.g. services/api/*) never run a regex at all, patterns without a literal prefix share one alternation regex
+class PathMatcher():
+    END = ''
+
+    def __init__(self):
+        # pattern id -> (compiled regex, prefix, the regex only requires the prefix)
+        self.patterns = []
+        self.pattern_ids = {}
+        # pattern id -> owners watching / ignoring paths it matches
+        self.watched_by = []
+        self.ignored_by = []
+        # owners that watch every path
+        self.watch_all = []
+        self.owners = []
+        # character trie of pattern prefixes, pattern ids are stored under END
+        self.trie = {}
+        # patterns without a literal prefix that need a regex
+        self.unprefixed = []
+        self.unprefixed_regex = None
+
+    # watch_paths=None watches every path
+    def add(self, owner, watch_paths=None, ignore_paths=None):
+        self.owners.append(owner)
+
+        if watch_paths is None:
+            self.watch_all.append(owner)
+        else:
+            for matcher in watch_paths:
+                self.watched_by[self.pattern_id(matcher)].append(owner)
+
+        for matcher in ignore_paths or []:
+            self.ignored_by[self.pattern_id(matcher)].append(owner)
+
+    def pattern_id(self, matcher):
+        regex = sanitize_regex(matcher)
+        if regex in self.pattern_ids:
+            return self.pattern_ids[regex]
+
+        pattern_id = len(self.patterns)
+        compiled = re.compile(regex)
+        prefix = literal_prefix(regex)
+        prefix_only = regex[len(prefix):] in ['', '.*']
+
+        self.pattern_ids[regex] = pattern_id
+        self.patterns.append((compiled, prefix, prefix_only))
+        self.watched_by.append([])
+        self.ignored_by.append([])
+
+        if prefix:
+            node = self.trie
+            for c in prefix:
+                node = node.setdefault(c, {})
+            node.setdefault(self.END, []).append(pattern_id)
+        else:
+            self.unprefixed.append(pattern_id)
+            self.unprefixed_regex = None
+
+        return pattern_id
+
+    # ids of the patterns matching a path
+    def matching_patterns(self, path):
+        candidates = []
+        node = self.trie
+        for c in path:
+            node = node.get(c)
+            if node is None:
+                break
+            candidates.extend(node.get(self.END, ()))
+
+        matches = []
+        for pattern_id in candidates:
+            compiled, prefix, prefix_only = self.patterns[pattern_id]
+            if (prefix_only and '\n' not in path) or compiled.match(path):
+                matches.append(pattern_id)
+
+        if self.unprefixed and self.unprefixed_match(path):
+            matches.extend(pattern_id for pattern_id in self.unprefixed if self.patterns[pattern_id][0].match(path))
+
+        return matches
+
+    # a single regex ruling out paths that no unprefixed pattern matches, when the patterns can be combined
+    # (group references or inline flags change meaning inside an alternation)
+    def unprefixed_match(self, path):
+        if self.unprefixed_regex is None:
+            self.unprefixed_regex = False
+            if not any(self.patterns[i][0].groups for i in self.unprefixed):
+                try:
+                    self.unprefixed_regex = re.compile('|'.join('(?:%s)' % self.patterns[i][0].pattern for i in self.unprefixed))
+                except re.error:
+                    pass
+
+        return not self.unprefixed_regex or self.unprefixed_regex.match(path)
+
+    # owners watching a path that they do not also ignore
+    def match(self, path):
+        watched = set(self.watch_all)
+        ignored = set()
+        for pattern_id in self.matching_patterns(path):
+            watched.update(self.watched_by[pattern_id])
+            ignored.update(self.ignored_by[pattern_id])
+
+        return watched - ignored
+
+    # owner -> the paths it watches and does not ignore, in one pass over the paths
+    def assign(self, paths):
+        assigned = {owner: [] for owner in self.owners}
+        for path in paths:
+            for owner in self.match(path):
+                assigned[owner].append(path)
+
+        return assigned
@@ -1,9 +1,16 @@
+import os
+import sys
+import signal
 import subprocess
+from collections import deque
 
-def run(command, check=True, shell=True, hide_output=False):
+def run(command, check=True, shell=True, hide_output=False, stream=False, tail_lines=None, tee=None):
     print('executing: %s' % command)
     result = { 'command': command }
 
+    if stream:
+        return run_streaming(command, result, check=check, shell=shell, hide_output=hide_output, tail_lines=tail_lines, tee=tee)
+
     try:
         command_result = subprocess.run(
             command,
@@ -26,3 +33,138 @@ def run(command, check=True, shell=True, hide_output=False):
         raise
 
     return result
+
+# forwards output line by line while the command runs, keeping only the last tail_lines lines in memory
+# the complete output can optionally be appended to a tee file
+def run_streaming(command, result, check=True, shell=True, hide_output=False, tail_lines=None, tee=None):
+    if tail_lines is None:
+        tail_lines = int(os.getenv('SERVICER_OUTPUT_TAIL_LINES', 1000))
+
+    tail = deque(maxlen=tail_lines)
+    tee_file = open(tee, 'ab') if tee else None
+
+    try:
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            shell=shell,
+        )
+
+        with process.stdout:
+            for line in process.stdout:
+                tail.append(line)
+
+                if tee_file:
+                    tee_file.write(line)
+
+                if not hide_output:
+                    sys.stdout.write(line.decode('utf-8', errors='replace'))
+                    sys.stdout.flush()
+
+        returncode = process.wait()
+    finally:
+        if tee_file:
+            tee_file.close()
+
+    output = b''.join(tail)
+    result['command_result'] = subprocess.CompletedProcess(command, returncode, stdout=output)
+    result['stdout'] = output.decode('utf-8', errors='replace')
+    result['status'] = returncode
+
+    if check and returncode != 0:
+        print('failed: %s' % returncode)
+        if hide_output:
+            print(result['stdout'])
+        raise subprocess.CalledProcessError(returncode, command, output=output)
+
+    return result
+
+def stream_output_enabled():
+    return os.getenv('SERVICER_STREAM_OUTPUT', '').lower() in ['1', 'true', 'yes']
+
+# asyncio counterpart of run(), returning the same result dict
+# the command's process is killed if it times out or the awaiting task is cancelled
+async def run_async(command, check=True, shell=True, hide_output=False, timeout=None):
+    # asyncio is slow to import and only needed by concurrent task services
+    import asyncio
+
+    print('executing: %s' % command)
+    result = { 'command': command }
+
+    # start a new process group so the shell and everything it started can be killed together
+    kwargs = { 'stdout': subprocess.PIPE, 'stderr': subprocess.STDOUT, 'start_new_session': True }
+    if shell:
+        process = await asyncio.create_subprocess_shell(command, **kwargs)
+    else:
+        process = await asyncio.create_subprocess_exec(*command, **kwargs)
+
+    try:
+        stdout, _ = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        await kill_process(process)
+        print('timed out after %ss: %s' % (timeout, command))
+        raise subprocess.TimeoutExpired(command, timeout)
+    except asyncio.CancelledError:
+        await kill_process(process)
+        raise
+
+    result['command_result'] = subprocess.CompletedProcess(command, process.returncode, stdout=stdout)
+    result['stdout'] = stdout.decode('utf-8')
+    result['status'] = process.returncode
+
+    if check and process.returncode != 0:
+        print('failed: %s' % process.returncode)
+        print(result['stdout'])
+        raise subprocess.CalledProcessError(process.returncode, command, output=stdout)
+
+    if not hide_output:
+        print(result['stdout'])
+
+    return result
+
+# runs commands with run_async, up to concurrency at a time, cancelling (and killing) the rest if one fails
+async def run_all_async(commands, concurrency=1, **kwargs):
+    import asyncio
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_command(command):
+        async with semaphore:
+            return await run_async(command, **kwargs)
+
+    tasks = [asyncio.ensure_future(run_command(c)) for c in commands]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+async def kill_process(process):
+    if process.returncode is None:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        await process.wait()
+
+# runs a coroutine to completion on a new event loop, safe to call from service-step worker threads
+def run_until_complete(coroutine):
+    import asyncio
+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    except BaseException:
+        # commands run in their own session and never see the terminal's SIGINT, so an interrupted
+        # run cancels its pending tasks, which kills their commands, before the loop is closed
+        tasks = asyncio.all_tasks(loop)
+        if tasks:
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        raise
+    finally:
+        loop.close()
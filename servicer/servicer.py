@@ -1,36 +1,82 @@
 import os
 import sys
 import importlib
-import pkg_resources
+import importlib.util
 import json
 import argparse
 from ruamel import yaml
 import re
 import copy
-import imp
-import random
+import threading
+import time
+import bisect
 from datetime import datetime
 
 from .config_loader import ConfigLoader
 from .dependency_grapher import DependencyGrapher
+from .graph_index import GraphIndex
+from .executor import ParallelExecutor
 from .git import Git
-from .run import run
+from .run import run, stream_output_enabled
+from .step_cache import StepCache, walk_files
+from .timings import TimingStore, format_duration
+from .yaml_cache import LOADERS, yaml_loader
 from .token_interpolator import TokenInterpolator
 from .logger import Logger
+from .parameter_scope import ParameterScope
+from .path_matcher import PathMatcher, sanitize_regex
+from . import IMPORT_STARTED
+
+# when the servicer module and its imports finished loading, reported by --profile_startup
+IMPORTED = time.perf_counter()
+
+# reads the installed version without scanning every installed distribution, as pkg_resources does
+def get_version():
+    try:
+        from importlib.metadata import version
+    except ImportError:
+        import pkg_resources
+        return pkg_resources.get_distribution('servicer').version
+
+    return version('servicer')
+
+# the tags of a sorted list that start with prefix
+def tags_with_prefix(sorted_tags, prefix):
+    tags = []
+    for i in range(bisect.bisect_left(sorted_tags, prefix), len(sorted_tags)):
+        if not sorted_tags[i].startswith(prefix):
+            break
+        tags.append(sorted_tags[i])
+    return tags
 
 class Servicer():
+    # guards adapter module loading and provider initialization across parallel service-steps
+    module_lock = threading.RLock()
+    timing_store = None
+    step_cache = None
+    env_file_loader = None
+    # compiled watch_paths / ignore_paths matchers, see path_matcher()
+    path_matcher_lock = threading.Lock()
+    path_matchers = None
+
     def __init__(self, args=None, init=True):
         if not init:
             return
 
+        self.started = time.perf_counter()
         self.datetime = datetime
 
-        self.version = pkg_resources.get_distribution('servicer').version
+        self.version = get_version()
         self.run = run
 
         if args == None:
             args = vars(self.load_arguments())
 
+        # stdout is kept for the json printed by "servicer affected", everything else is logged to stderr
+        self.output = sys.stdout
+        if args.get('command') == 'affected':
+            sys.stdout = sys.stderr
+
         logger_params = {
             'level': args['log_level']
         }
@@ -52,10 +98,14 @@ class Servicer():
         self.config = self.config_loader.load_config()
         self.active_services = None
 
+        if args.get('command') == 'compile':
+            self.compile_config()
+            sys.exit(0)
+
         self.normalize_ci_environment()
         self.determine_service_environment()
 
-        self.config_loader.interpolate_config(self.config)
+        self.config_interpolator = self.config_loader.interpolate_config(self.config)
 
         self.logger.log('Services Config:', level='debug')
         self.logger.log(json.dumps(self.config, indent=4, sort_keys=True, default=str), level='debug')
@@ -65,29 +115,112 @@ class Servicer():
             self.logger.log(json.dumps(self.config, indent=4, sort_keys=True, default=str))
             sys.exit(0)
 
+        self.load_timings()
+
+        if 'timings' in self.config['args'] and self.config['args']['timings']:
+            self.print_timings()
+            sys.exit(0)
+
         self.git_init()
 
+        if args.get('command') == 'affected':
+            self.print_affected_services()
+            sys.exit(0)
+
+        self.load_step_cache()
+
         self.decide_service_step_order()
 
+        if args.get('profile_startup'):
+            self.log_startup_profile()
+
+    def log_startup_profile(self):
+        self.logger.log('startup: imports %.3fs, initialization %.3fs (use python -X importtime for a per-module breakdown)' % (
+            IMPORTED - IMPORT_STARTED,
+            time.perf_counter() - self.started,
+        ))
+
     def decide_service_step_order(self):
         self.load_steps()
 
         if not self.active_services:
             self.active_services = self.load_service_modules()
 
+        # compiled and indexed dependencies assume the destroy step is not part of the step order
+        compiled_depends_on = None
+        graph_index = None
+        if not ('destroy' in self.config['args'] and self.config['args']['destroy']):
+            compiled_depends_on = self.config_loader.compiled_graph
+
+            if not compiled_depends_on and self.config_loader.graph_index_path:
+                graph_index = GraphIndex(
+                    persist_path=self.config_loader.graph_index_path,
+                    settings=[self.step_order, self.config['graph']['implicit-step-dependencies']],
+                    logger=self.logger,
+                )
+
         self.dependency_grapher = DependencyGrapher(
             self.config,
             self.active_services,
             self.steps,
             self.step_order,
             self.active_steps,
+            depends_on=compiled_depends_on,
+            graph_index=graph_index,
             logger=self.logger,
         )
         self.service_step_order = self.dependency_grapher.order_service_steps(self.active_services)
 
+    # snapshots the merged config before interpolation, along with the direct dependencies of every service-step
+    # dependencies are left out when any depends_on contains tokens, since they can only be known once interpolated
+    def compile_config(self):
+        self.load_steps()
+
+        depends_on = []
+        for service in self.config.get('services', {}).values():
+            depends_on.append(service.get('depends_on'))
+            depends_on.extend(step.get('depends_on') for step in service.get('steps', {}).values())
+
+        graph = None
+        if '${' not in json.dumps(depends_on, default=str):
+            grapher = DependencyGrapher(self.config, [], self.steps, self.step_order, self.active_steps, logger=self.logger)
+
+            graph = {}
+            for service_name, service in self.config.get('services', {}).items():
+                for step_name in service.get('steps', {}):
+                    if step_name in self.steps:
+                        service_step_name = '%s:%s' % (service_name, step_name)
+                        graph[service_step_name] = grapher.service_step_depends_on(service_step_name)
+
+        self.config_loader.write_snapshot(self.config, graph=graph)
+
+    # prints the services changed since the git diff-ref, and every service depending on them, without
+    # loading adapters or authenticating, so CI can skip launching jobs for unaffected services
+    # with skip_build, no services are affected (e.g. the changes were made by servicer itself)
+    def print_affected_services(self, skip_build=False):
+        self.load_steps()
+
+        services = list(self.config.get('services', {}))
+        unchanged = services if skip_build else self.unchanged_services(services)
+        changed_services = [s for s in services if s not in (unchanged or [])]
+
+        dependent_services = self.dependent_services(services, changed_services)
+
+        affected = {
+            'diff_ref': self.config['git'].get('diff-ref') if 'git' in self.config else None,
+            'change_detection': unchanged is not None,
+            'skip_build': skip_build,
+            'changed': changed_services,
+            'affected': [s for s in services if s in changed_services or s in dependent_services],
+        }
+        self.output.write('%s\n' % json.dumps(affected, indent=4))
+        self.output.flush()
+
     def load_arguments(self):
         parser = argparse.ArgumentParser(description='Process deployment options.')
 
+        parser.add_argument('command', nargs='?', choices=['compile', 'affected'], help='compile: write the merged services config and its dependency graph to a snapshot that later runs load instead of parsing config files, affected: print the services changed since the git diff ref and the services depending on them as json')
+
         parser.add_argument('-g', '--generate_ci', action='store_true', help='generate a ci config file, do not run any deploy options')
         parser.add_argument('-s', '--service', help='execute only the provided service')
         parser.add_argument('--ss', '--service_step', help='execute only the provided service-step')
@@ -98,12 +231,22 @@ class Servicer():
         parser.add_argument('-c', '--show_config', action='store_true', help='prints the interpolated config file')
         parser.add_argument('-u', '--no_ignore_unchanged', '--no_cd', action='store_true', help='disables ignoring services through change detection')
         parser.add_argument('--no_tag', action='store_true', help='disables build tagging')
+        parser.add_argument('--no_cache', action='store_true', help='disables skipping unchanged service-steps with cached results')
+        parser.add_argument('--config_loader', '--config-loader', choices=LOADERS, default='auto', help='yaml loader for config files, auto uses the C-based safe loader when available and falls back to the pure-Python safe loader, unsafe allows python-specific yaml tags (default is auto)')
+        parser.add_argument('--compiled', action='store_true', help='load the services config from the snapshot written by servicer compile, when it is up to date')
+        parser.add_argument('--snapshot_path', help='path of the compiled config snapshot, loaded without --compiled when given (default is .servicer/.cache/compiled.pickle)')
+        parser.add_argument('--config_cache', action='store_true', help='keep parsed config files and the dependencies of each service in .servicer/.cache, so unchanged files are not parsed and unchanged services are not graphed again on the next run')
         parser.add_argument('--no_auth', action='store_true', help='disables build authentication, useful if you are already authenticated locally')
         parser.add_argument('-d', '--ignore_dependencies', action='store_true', help='disables automatic dependency execution')
         parser.add_argument('--tag', action='store_true', help='generate a git tag')
         parser.add_argument('-v', '--version', action='store_true', help='display the package version')
         parser.add_argument('-x', '--destroy', action='store_true', help='destroy the current service environment')
         parser.add_argument('--dry', action='store_true', help='skip all service-step actions')
+        parser.add_argument('--parallel', type=int, default=1, help='execute up to N independent service-steps concurrently (default is 1)')
+        parser.add_argument('--timings', action='store_true', help='prints the recorded durations of each service-step')
+        parser.add_argument('--scheduler', choices=['graph', 'layers'], default='graph', help='parallel scheduling strategy, graph starts each service-step as soon as its dependencies finish, layers waits for each topological layer (default is graph)')
+        parser.add_argument('--stream_output', action='store_true', help='print command output while commands run, keeping only the last lines of output in memory')
+        parser.add_argument('--profile_startup', '--profile-startup', action='store_true', help='prints the time spent importing modules and initializing before the first service-step runs')
         parser.add_argument('--log_level', default='info', help='set the desired logging level, options are: [info,debug,warn,error]')
 
         return parser.parse_args()
@@ -113,9 +256,13 @@ class Servicer():
         os.environ['BUILD_DATETIME'] = str(self.datetime.utcnow())
         os.environ['BUILD_DATE'] = self.datetime.now().strftime('%Y-%m-%d')
 
+        if 'stream_output' in args and args['stream_output']:
+            os.environ['SERVICER_STREAM_OUTPUT'] = 'true'
+
         if 'env_file_paths' not in args:
             return
 
+        self.env_file_loader = yaml_loader(args.get('config_loader'))
         for path in args['env_file_paths'].split(':'):
             self.load_env_file(path)
 
@@ -124,7 +271,7 @@ class Servicer():
         if os.path.exists(path):
             self.logger.log('(.env.yaml) found, including these arguments:')
 
-            yaml_dict = yaml.load(open(path), Loader=yaml.Loader)
+            yaml_dict = yaml.load(open(path), Loader=self.env_file_loader or yaml_loader())
             for key, value in yaml_dict.items():
                 os.environ[key] = value
                 self.logger.log(key)
@@ -232,28 +379,31 @@ class Servicer():
         self.git = Git(**git_args)
         self.git.config = self.config['git']
 
-        if 'auto-set-branch' in self.config['git'] and self.config['git']['auto-set-branch']:
-            if 'BRANCH' not in os.environ:
-                os.environ['BRANCH'] = self.git.current_branch()
+        # the branch and both forms of the commit come from a single git query
+        auto_set_branch = 'auto-set-branch' in self.config['git'] and self.config['git']['auto-set-branch'] and 'BRANCH' not in os.environ
+        auto_set_commit = 'auto-set-commit' in self.config['git'] and self.config['git']['auto-set-commit']
+        if auto_set_branch or (auto_set_commit and not ('COMMIT_SHORT' in os.environ and 'COMMIT_LONG' in os.environ)):
+            head = self.git.head(min_length=self.config['git']['commit-min-length'])
+
+            if auto_set_branch:
+                os.environ['BRANCH'] = head['branch']
+
+            if auto_set_commit:
+                if 'COMMIT_SHORT' not in os.environ:
+                    os.environ['COMMIT_SHORT'] = head['commit_short']
+                if 'COMMIT_LONG' not in os.environ:
+                    os.environ['COMMIT_LONG'] = head['commit']
 
-        if 'auto-set-commit' in self.config['git'] and self.config['git']['auto-set-commit']:
-            if 'COMMIT_SHORT' not in os.environ:
-                os.environ['COMMIT_SHORT'] = self.git.current_commit(min_length=self.config['git']['commit-min-length'])
-            if 'COMMIT_LONG' not in os.environ:
-                os.environ['COMMIT_LONG'] = self.git.current_commit()
-            if 'COMMIT' not in os.environ:
-                os.environ['COMMIT'] = os.environ['COMMIT_SHORT']
+        if auto_set_commit and 'COMMIT' not in os.environ:
+            os.environ['COMMIT'] = os.environ['COMMIT_SHORT']
 
         if 'config' in self.config['git']:
-            for key, value in self.config['git']['config'].items():
-                result = self.run('git config %s' % key, check=False)['stdout'].strip()
-                if result == '':
-                    self.run('git config %s "%s"' % (key, value))
+            self.git.set_config(self.config['git']['config'])
 
         if 'fetch-all' in self.config['git'] and self.config['git']['fetch-all']:
-            self.run('git fetch')
+            self.git.fetch()
         elif 'fetch-tags' in self.config['git'] and self.config['git']['fetch-tags']:
-            self.run('git fetch --tags')
+            self.git.fetch(tags=True)
 
         if 'tag' in self.config['args'] and self.config['args']['tag']:
             self.tag_build(check_git=False)
@@ -279,13 +429,10 @@ class Servicer():
                     self.config['git']['diff-ref'] = self.build_tags[-1]
 
             if 'diff-defaults-to-latest-tag' in self.config['git'] and self.config['git']['diff-defaults-to-latest-tag'] and 'diff-ref' not in self.config['git']:
-                result = self.run('git describe --tags --abbrev=0 --match "servicer-*" HEAD', check=False)
-
-                if result['status'] == 0:
-                    latest_tag = result['stdout'].strip()
-                    if latest_tag:
-                        self.logger.log('defaulting to latest servicer git tag')
-                        self.config['git']['diff-ref'] = latest_tag
+                latest_tag = self.git.latest_tag(match='servicer-*')
+                if latest_tag:
+                    self.logger.log('defaulting to latest servicer git tag')
+                    self.config['git']['diff-ref'] = latest_tag
 
             # TODO: remove this feature in next breaking update
             if 'default-branch' in self.config['git'] and self.config['git']['default-branch'] and 'diff-ref' not in self.config['git']:
@@ -301,8 +448,161 @@ class Servicer():
             self.logger.log('Commit authors: %s' % authors)
             if 'servicer' in authors:
                 self.logger.log('Automated servicer changes were detected, skipping this build.')
+                if self.config['args'].get('command') == 'affected':
+                    self.print_affected_services(skip_build=True)
                 sys.exit(0)
 
+    def load_timings(self):
+        if 'timings' not in self.config or not self.config['timings']['enabled'] or 'config_path' not in self.config:
+            return
+
+        path = os.path.join(self.config['config_path'], self.config['timings']['path'])
+        self.timing_store = TimingStore(path, history=self.config['timings']['history'], logger=self.logger)
+        self.timing_store.load()
+
+    def print_timings(self):
+        if not self.timing_store:
+            self.logger.log('service-step timings are not enabled')
+            return
+
+        self.print_title('service-step timings')
+        for line in self.timing_store.report():
+            self.logger.log(line)
+
+    def record_timing(self, service_step_name, duration, status):
+        if not self.timing_store or ('dry' in self.config['args'] and self.config['args']['dry']):
+            return
+
+        self.timing_store.record(service_step_name, duration, status=status, commit=os.getenv('COMMIT'))
+
+    def log_estimated_duration(self, service_steps, parallel=False):
+        if not self.timing_store:
+            return
+
+        estimates = self.timing_store.estimates(service_steps)
+        if not estimates:
+            self.logger.log('no recorded timings to estimate the duration from')
+            return
+
+        if parallel:
+            executor = ParallelExecutor(workers=self.config['args']['parallel'], logger=self.logger)
+            duration = executor.estimate_duration(self.dependency_grapher.dependencies, estimates)
+        else:
+            duration = sum(estimates.values())
+
+        self.logger.log('estimated duration: %s' % format_duration(duration))
+
+        unknown = [ss for ss in service_steps if ss not in estimates]
+        if unknown:
+            self.logger.log('no recorded duration for: %s' % ', '.join(unknown))
+
+    def load_step_cache(self):
+        if 'cache' not in self.config or not self.config['cache']['enabled'] or 'config_path' not in self.config:
+            return
+
+        if 'no_cache' in self.config['args'] and self.config['args']['no_cache']:
+            self.logger.log('skipping service-step cache (no_cache enabled)')
+            return
+
+        backend_name = self.config['cache']['backend']
+        backend_config = copy.deepcopy(self.config['cache'])
+        backend_config['path'] = os.path.join(self.config['config_path'], backend_config['path'])
+
+        self.logger.log('Cache Backend: %s' % backend_name)
+        cache_backend_modules = [
+            {
+                'name': 'cache_backends.%s' % backend_name,
+                'package': 'cache_backends',
+                'file_path': '%s/cache_backends/%s.py' % (self.config['config_path'], backend_name),
+            },
+            {
+                'name': 'servicer.builtin.cache_backends.%s' % backend_name,
+                'package': 'servicer.builtin.cache_backends',
+                'file_path': '%s/builtin/cache_backends/%s.py' % (self.config['module_path'], backend_name),
+            },
+        ]
+        module = self.load_module_from_paths(cache_backend_modules)
+
+        self.step_cache = StepCache(module.CacheBackend(backend_config, logger=self.logger), logger=self.logger)
+        self.project_file_list = None
+
+    def step_cache_key(self, service_step_name, service, service_step):
+        if not self.step_cache or ('dry' in self.config['args'] and self.config['args']['dry']):
+            return None
+
+        step_name = service_step_name.split(':')[1]
+        if step_name not in self.config['cache']['steps']:
+            return None
+
+        # without watch_paths, the files a service-step depends on are unknown
+        if 'git' not in service or 'watch_paths' not in service['git']:
+            return None
+
+        inputs = copy.deepcopy({
+            'version': self.version,
+            'service_step': service_step_name,
+            'config': service_step.get('config'),
+            'commands': service_step.get('commands'),
+            'post_commands': service_step.get('post_commands'),
+        })
+        self.token_interpolator.interpolate_tokens(inputs, self.interpolation_params())
+
+        return self.step_cache.key(inputs, files=self.watched_files(service))
+
+    def watched_files(self, service):
+        path_matcher = self.path_matcher(service['git']['watch_paths'], service['git'].get('ignore_paths'))
+        return [f for f in self.project_files() if path_matcher.match(f)]
+
+    # compiled matchers are shared by services with the same watch_paths and ignore_paths
+    def path_matcher(self, watch_paths=None, ignore_paths=None):
+        key = (tuple(watch_paths) if watch_paths is not None else None, tuple(ignore_paths or []))
+        with self.path_matcher_lock:
+            if self.path_matchers is None:
+                self.path_matchers = {}
+
+            if key not in self.path_matchers:
+                path_matcher = PathMatcher()
+                path_matcher.add(None, watch_paths, ignore_paths)
+                self.path_matchers[key] = path_matcher
+
+            return self.path_matchers[key]
+
+    def project_files(self):
+        if self.project_file_list is None:
+            if 'git' in self.config and self.config['git']['enabled']:
+                self.project_file_list = self.git.list_files()
+            else:
+                self.project_file_list = walk_files()
+
+        return self.project_file_list
+
+    def replay_cached_service_step(self, cache_key, service_step):
+        entry = self.step_cache.get(cache_key)
+        if entry is None:
+            return False
+
+        self.logger.log('skipping, service-step is unchanged since a cached run: %s' % cache_key)
+
+        for key, value in entry.get('environment', {}).items():
+            os.environ[key] = value
+
+        if entry.get('results'):
+            service_step['results'] = entry['results']
+            self.config_interpolator.invalidate(service_step, 'results')
+            self.logger.log('results: ')
+            self.logger.log(json.dumps(entry['results'], indent=4, sort_keys=True, default=str))
+
+        return True
+
+    def store_cached_service_step(self, cache_key, service_step):
+        commands = (service_step.get('commands') or []) + (service_step.get('post_commands') or [])
+        env_vars = [c['env_var'] for c in commands if isinstance(c, dict) and 'env_var' in c]
+
+        self.step_cache.put(cache_key, {
+            'results': service_step.get('results'),
+            'environment': {key: os.environ[key] for key in env_vars if key in os.environ},
+        })
+
     def tag_build(self, check_git=True):
         if check_git:
             if not 'git' in self.config or not self.config['git']['enabled']:
@@ -314,6 +614,9 @@ class Servicer():
             if 'no_tag' in self.config['args'] and self.config['args']['no_tag']:
                 return
 
+        # steps may have created tags and branches since git was initialized
+        self.git.clear_memo()
+
         self.remove_stale_tags()
         servicer_tag = self.servicer_git_tag()
 
@@ -321,10 +624,12 @@ class Servicer():
             self.logger.log('Tagging: %s' % servicer_tag)
             self.git.tag(servicer_tag, push=True)
 
+    # removes servicer tags of branches that no longer exist, and the previous tags of the current branch
     def remove_stale_tags(self):
         self.logger.log('Removing old tags...')
 
-        build_tags = [t for t in self.git.list_tags() if t.startswith('servicer-')]
+        # sorted, so the tags starting with a prefix are found by bisection
+        build_tags = sorted(t for t in self.git.list_tags() if t.startswith('servicer-'))
         self.logger.log('\nexisting servicer tags:', level='debug')
         self.logger.log('\n'.join(build_tags), level='debug')
 
@@ -335,23 +640,22 @@ class Servicer():
 
         valid_tags = set()
         for tp in tag_prefixes:
-            prefix = 'servicer-%s' % tp
-            for bt in build_tags:
-                if bt.startswith(prefix):
-                    valid_tags.add(bt)
+            valid_tags.update(tags_with_prefix(build_tags, 'servicer-%s' % tp))
 
-        tags_to_delete = list(set(build_tags) - valid_tags)
+        tags_to_delete = [bt for bt in build_tags if bt not in valid_tags]
         self.logger.log('\nstale tags for other branches:', level='debug')
         self.logger.log('\n'.join(tags_to_delete), level='debug')
 
-        self.git.delete_tag(tags_to_delete)
-
         tag_prefix = self.git.sanitize_tag(os.environ['BRANCH'])
-        build_tags_for_branch = [bt for bt in build_tags if bt.startswith('servicer-%s' % tag_prefix)]
+        build_tags_for_branch = tags_with_prefix(build_tags, 'servicer-%s' % tag_prefix)
 
         self.logger.log('\nstale tags for this branch: %s' % tag_prefix, level='debug')
         self.logger.log('\n'.join(build_tags_for_branch), level='debug')
-        self.git.delete_tag(build_tags_for_branch)
+
+        # every stale tag is deleted with as few git tag -d and git push commands as the batch size allows
+        tags_to_delete.extend(bt for bt in build_tags_for_branch if bt in valid_tags)
+        if tags_to_delete:
+            self.git.delete_tag(tags_to_delete, batch_size=self.config['git'].get('tag-delete-batch-size'))
 
     def servicer_git_tag(self):
         if 'BRANCH' not in os.environ:
@@ -382,10 +686,7 @@ class Servicer():
 
         self.ignore_unchanged_services(active_services)
 
-        for service_name in active_services:
-            service = self.config['services'][service_name]
-            self.load_service_module(service)
-
+        # adapter modules and providers are loaded by run_service_step, the first time a service-step needs them
         return active_services
 
     def load_service_module(self, service):
@@ -402,12 +703,6 @@ class Servicer():
         if 'provider' in service:
             adapter_path = '%s/%s' % (service['provider'], adapter_path)
 
-            self.try_initialize_provider(service['provider'], service)
-
-        if 'providers' in service:
-            for provider in service['providers']:
-                self.try_initialize_provider(provider, service)
-
         adapter_name = adapter_path.replace('/', '.')
         service_modules = [
             {
@@ -433,16 +728,84 @@ class Servicer():
         else:
             service['module'] = module
 
+    # providers are initialized once per service, before the first of its service-steps runs
+    def initialize_service_providers(self, service):
+        if service.get('providers_initialized'):
+            return
+
+        if 'config' not in service:
+            service['config'] = {}
+
+        if 'provider' in service:
+            self.try_initialize_provider(service['provider'], service)
+
+        if 'providers' in service:
+            for provider in service['providers']:
+                self.try_initialize_provider(provider, service)
+
+        service['providers_initialized'] = True
+
     def ignore_unchanged_services(self, services):
-        if 'no_ignore_unchanged' in self.config['args'] and self.config['args']['no_ignore_unchanged']:
+        if not self.change_detection_enabled():
             return
 
+        # unchanged services depending on a changed service are built as well, so changes are detected in
+        # every service of the dependency graph, including upstream services that are not active
+        if self.config['git'].get('propagate-changes'):
+            grapher = self.service_grapher(services)
+            graph_services = services + sorted(grapher.graph_services - set(services))
+            unchanged_services = self.unchanged_services(graph_services)
+
+            changed_services = [s for s in graph_services if s not in unchanged_services]
+            dependent_services = grapher.dependent_services(changed_services)
+
+            self.logger.log('\nServices Depending on Changed Services:')
+            self.logger.log('\n'.join(s for s in graph_services if s in dependent_services and s in unchanged_services))
+
+            ignored_services = [s for s in services if s in unchanged_services and s not in dependent_services]
+        else:
+            ignored_services = self.unchanged_services(services)
+
+        self.logger.log('\nIgnored Services:')
+        for sn in ignored_services:
+            self.logger.log(sn)
+            services.remove(sn)
+
+        self.logger.log('\nChanged Services:')
+        self.logger.log('\n'.join(services))
+
+    # the services that depend on any of changed_services through the dependency graph of services
+    def dependent_services(self, services, changed_services):
+        return self.service_grapher(services).dependent_services(changed_services)
+
+    # a grapher that has ordered the steps of services and the services they depend on
+    def service_grapher(self, services):
+        compiled_depends_on = None
+        if not ('destroy' in self.config['args'] and self.config['args']['destroy']):
+            compiled_depends_on = self.config_loader.compiled_graph
+
+        grapher = DependencyGrapher(self.config, services, self.steps, self.step_order, self.active_steps, depends_on=compiled_depends_on, logger=self.logger)
+        grapher.order_service_steps(services)
+
+        return grapher
+
+    def change_detection_enabled(self):
+        if 'no_ignore_unchanged' in self.config['args'] and self.config['args']['no_ignore_unchanged']:
+            return False
+
         if not 'git' in self.config or not self.config['git']['enabled'] or not self.config['git']['ignore-unchanged']:
-            return
+            return False
 
         if 'diff-ref' not in self.config['git']:
             self.logger.log('No GIT_DIFF_REF found, aborting change detection.')
-            return
+            return False
+
+        return True
+
+    # the services without changes since the git diff-ref, or None when change detection is disabled
+    def unchanged_services(self, services):
+        if not self.change_detection_enabled():
+            return None
 
         diff_files = self.git.diff(self.config['git']['diff-ref'], name_only=True, merge_base=True)
         self.logger.log('\nChanged Files:')
@@ -453,61 +816,43 @@ class Servicer():
             regexes = [self.sanitize_regex(matcher) for matcher in self.config['git']['ignore_paths']]
             matched_files, diff_files = self.match_regexes(diff_files, regexes)
 
-        ignored_services = []
+        # assign every changed file to the services watching it in one pass
+        path_matcher = PathMatcher()
         for service_name in services:
             service = self.config['services'][service_name]
-            service_changed_files = diff_files
-
             if 'git' in service:
-                if 'watch_paths' in service['git']:
-                    watch_regexes = [self.sanitize_regex(matcher) for matcher in service['git']['watch_paths']]
+                path_matcher.add(service_name, service['git'].get('watch_paths'), service['git'].get('ignore_paths'))
 
-                    self.logger.log('\nService: %s' % service_name, level='debug')
-                    self.logger.log('Matchers:', level='debug')
+        service_changed_files = path_matcher.assign(diff_files)
 
-                    service_changed_files, _ = self.match_regexes(diff_files, watch_regexes)
-
-                if 'ignore_paths' in service['git']:
-                    ignore_regexes = [self.sanitize_regex(matcher) for matcher in service['git']['ignore_paths']]
-                    _, service_changed_files = self.match_regexes(service_changed_files, ignore_regexes)
-
-                if len(service_changed_files) > 0:
-                    self.logger.log('\nChanged Files:', level='debug')
-                    self.logger.log('\n'.join(service_changed_files), level='debug')
-                else:
-                    ignored_services.append(service_name)
-
-        self.logger.log('\nIgnored Services:')
-        for sn in ignored_services:
-            self.logger.log(sn)
-            services.remove(sn)
+        ignored_services = []
+        for service_name in path_matcher.owners:
+            if len(service_changed_files[service_name]) > 0:
+                self.logger.log('\nService: %s' % service_name, level='debug')
+                self.logger.log('Changed Files:', level='debug')
+                self.logger.log('\n'.join(service_changed_files[service_name]), level='debug')
+            else:
+                ignored_services.append(service_name)
 
-        self.logger.log('\nChanged Services:')
-        self.logger.log('\n'.join(services))
+        return ignored_services
 
     def sanitize_regex(self, matcher):
-        if matcher.startswith('/') and matcher.endswith('/'):
-            return matcher[1:-1]
-
-        return matcher.replace('*', '.*')
+        return sanitize_regex(matcher)
 
     # takes a list of strings, and returns a tuple of strings that match and do not match
     def match_regexes(self, strings, regexes):
         if not isinstance(regexes, list):
             regexes = [regexes]
 
+        path_matcher = self.path_matcher(['/%s/' % regex for regex in regexes])
+
         matches = []
         unmatches = []
         for s in strings:
-            for regex in regexes:
-                result = re.match(regex, s)
-
-                self.logger.log('%s ~= %s -> %s' % (regex, s, result), level='debug')
-
-                if result:
-                    matches.append(s)
-                else:
-                    unmatches.append(s)
+            if path_matcher.match(s):
+                matches.append(s)
+            else:
+                unmatches.append(s)
 
         return matches, unmatches
 
@@ -592,11 +937,14 @@ class Servicer():
                     try:
                         module = importlib.import_module(mp['name'])
                     except ModuleNotFoundError:
-                        self.logger.log('falling back to import via imp: %s' % mp['file_path'], level='debug')
+                        self.logger.log('falling back to import from file: %s' % mp['file_path'], level='debug')
 
-                        with open(mp['file_path'], 'rb') as fp:
-                            config_dir = self.config['args']['servicer_config_path'].split('/')[-1]
-                            module = imp.load_module('%s/%s' % (config_dir, mp['name']), fp, mp['file_path'], ('.py', 'rb', imp.PY_SOURCE))
+                        config_dir = self.config['args']['servicer_config_path'].split('/')[-1]
+                        module_name = '%s/%s' % (config_dir, mp['name'])
+                        spec = importlib.util.spec_from_file_location(module_name, mp['file_path'])
+                        module = importlib.util.module_from_spec(spec)
+                        sys.modules[module_name] = module
+                        spec.loader.exec_module(module)
 
                     return module
                 else:
@@ -653,58 +1001,99 @@ class Servicer():
             service_steps = destroy_service_steps
             self.logger.log(json.dumps(service_steps, indent=4))
 
-        for service_step_name in service_steps:
-            ss_pieces = service_step_name.split(':')
-            service_name = ss_pieces[0]
-            step_name = ss_pieces[1]
+        workers = self.config['args'].get('parallel') or 1
+        parallel = workers > 1 and not ('destroy' in self.config['args'] and self.config['args']['destroy'])
 
-            self.print_title('service-step: %s:%s' % (service_name, step_name))
+        if 'dry' in self.config['args'] and self.config['args']['dry']:
+            self.log_estimated_duration(service_steps, parallel=parallel)
 
-            step = self.steps[step_name]
-            service = self.config['services'][service_name]
-            service_step = service['steps'][step_name]
-
-            self.logger.log('step:', level='debug')
-            self.logger.log(json.dumps(step, indent=4, sort_keys=True, default=str), level='debug')
-            self.logger.log(level='debug')
-            self.logger.log('service:', level='debug')
-            self.logger.log(json.dumps(service, indent=4, sort_keys=True, default=str), level='debug')
-            self.logger.log(level='debug')
-
-            if 'config' in step:
-                if 'requires_service_environment' in step['config']:
-                    if step['config']['requires_service_environment'] and self.service_environment == None:
-                        self.logger.log('skipping, no valid service environment found for step: %s' % step_name)
-                        continue
-
-                if 'service_environment' in step['config']:
-                    if not self.glob_regex_match(step['config']['service_environment'], self.service_environment):
-                        self.logger.log('skipping, no valid service environment found for step: %s' % step_name)
-                        continue
-
-            if 'service_environment' in service:
-                if not self.glob_regex_match(service['service_environment'], self.service_environment):
-                    self.logger.log('skipping, no valid service environment found for service: %s' % service_name)
-                    continue
+        try:
+            if parallel:
+                self.logger.log('executing up to %s service-steps in parallel' % workers)
+                executor = ParallelExecutor(workers=workers, logger=self.logger)
 
-            if 'service_environment' in service_step:
-                if not self.glob_regex_match(service_step['service_environment'], self.service_environment):
-                    self.logger.log('skipping, no valid service environment found for service_step: %s:%s' % service_name, step_name)
-                    continue
+                if self.config['args'].get('scheduler') == 'layers':
+                    executor.run_layers(self.service_step_order, self.execute_service_step)
+                else:
+                    dependencies = self.dependency_grapher.dependencies
+                    weights = self.timing_store.estimates(dependencies) if self.timing_store else None
+                    executor.run_graph(dependencies, self.execute_service_step, weights=weights)
+            else:
+                for service_step_name in service_steps:
+                    self.execute_service_step(service_step_name)
+        finally:
+            if self.timing_store and not ('dry' in self.config['args'] and self.config['args']['dry']):
+                self.timing_store.save()
+
+        self.tag_build()
+        self.logger.log('\nBuild Complete.')
+
+    def execute_service_step(self, service_step_name):
+        ss_pieces = service_step_name.split(':')
+        service_name = ss_pieces[0]
+        step_name = ss_pieces[1]
+
+        self.print_title('service-step: %s:%s' % (service_name, step_name))
+
+        step = self.steps[step_name]
+        service = self.config['services'][service_name]
+        service_step = service['steps'][step_name]
+
+        self.logger.log('step:', level='debug')
+        self.logger.log(json.dumps(step, indent=4, sort_keys=True, default=str), level='debug')
+        self.logger.log(level='debug')
+        self.logger.log('service:', level='debug')
+        self.logger.log(json.dumps(service, indent=4, sort_keys=True, default=str), level='debug')
+        self.logger.log(level='debug')
+
+        if 'config' in step:
+            if 'requires_service_environment' in step['config']:
+                if step['config']['requires_service_environment'] and self.service_environment == None:
+                    self.logger.log('skipping, no valid service environment found for step: %s' % step_name)
+                    return
+
+            if 'service_environment' in step['config']:
+                if not self.glob_regex_match(step['config']['service_environment'], self.service_environment):
+                    self.logger.log('skipping, no valid service environment found for step: %s' % step_name)
+                    return
+
+        if 'service_environment' in service:
+            if not self.glob_regex_match(service['service_environment'], self.service_environment):
+                self.logger.log('skipping, no valid service environment found for service: %s' % service_name)
+                return
+
+        if 'service_environment' in service_step:
+            if not self.glob_regex_match(service_step['service_environment'], self.service_environment):
+                self.logger.log('skipping, no valid service environment found for service_step: %s:%s' % (service_name, step_name))
+                return
+
+        cache_key = self.step_cache_key(service_step_name, service, service_step)
+        if cache_key and self.replay_cached_service_step(cache_key, service_step):
+            return
 
+        started = time.time()
+        status = 1
+        try:
             self.run_service_step(service, service_step)
+            status = 0
+        finally:
+            self.record_timing(service_step_name, time.time() - started, status)
 
-            # TODO: rethink and standardize this termination process
-            if 'TERMINATE_BUILD' in os.environ:
-                self.logger.log('build termination requested, stopping with code: %s' % os.environ['TERMINATE_BUILD'])
-                sys.exit(int(os.environ['TERMINATE_BUILD']))
+        if cache_key:
+            self.store_cached_service_step(cache_key, service_step)
 
-        self.tag_build()
-        self.logger.log('\nBuild Complete.')
+        # TODO: rethink and standardize this termination process
+        if 'TERMINATE_BUILD' in os.environ:
+            self.logger.log('build termination requested, stopping with code: %s' % os.environ['TERMINATE_BUILD'])
+            sys.exit(int(os.environ['TERMINATE_BUILD']))
 
     def run_service_step(self, service, service_step):
-        if 'module' not in service:
-            self.load_service_module(service)
+        with self.module_lock:
+            self.initialize_service_providers(service)
+
+            # only service-steps with config use the service's adapter module
+            if 'config' in service_step and 'module' not in service:
+                self.load_service_module(service)
 
         self.run_commands(service_step.get('commands'))
 
@@ -716,8 +1105,7 @@ class Servicer():
                     config['git'] = {}
                 config['git']['module'] = self.git
 
-            interpolation_params = {**self.config, **os.environ}
-            self.token_interpolator.interpolate_tokens(config, interpolation_params)
+            self.config_interpolator.resolve(config, self.interpolation_params())
 
             adapter = service['module'].Service(config, logger=self.logger)
             adapter.full_config = self.config
@@ -729,6 +1117,7 @@ class Servicer():
 
                 if results:
                     service_step['results'] = results
+                    self.config_interpolator.invalidate(service_step, 'results')
                     self.logger.log('results: ')
                     self.logger.log(json.dumps(results, indent=4, sort_keys=True, default=str))
 
@@ -743,7 +1132,7 @@ class Servicer():
 
             if isinstance(c, dict):
                 if 'env_var' in c:
-                    result = self.run_command(c['command'])
+                    result = self.run_command(c['command'], stream=False)
                     os.environ[c['env_var']] = result['stdout'].strip()
 
                 if 'commands' in c:
@@ -767,6 +1156,7 @@ class Servicer():
 
                             options = docker_context.get('options', {})
                             if 'name' not in options:
+                                import random
                                 # options['name'] = ''.join(random.choice(''.lower) for x in range(16))
                                 options['name'] = ''.join(random.choice('0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz') for x in range(16))
 
@@ -803,15 +1193,21 @@ class Servicer():
             else:
                 self.run_command(c)
 
-    def run_command(self, command):
-        interpolation_params = {**self.config, **os.environ}
-        command = self.token_interpolator.replace_tokens(command, interpolation_params)
+    def run_command(self, command, stream=None):
+        command = self.token_interpolator.replace_tokens(command, self.interpolation_params())
 
         if 'dry' in self.config['args'] and self.config['args']['dry']:
             self.logger.log('DRY: executing: %s' % command)
             return
 
-        return self.run(command)
+        if stream is None:
+            stream = stream_output_enabled()
+
+        return self.run(command, stream=stream)
+
+    # environment variables take precedence over config values, config paths are looked up through the interpolator's index
+    def interpolation_params(self):
+        return ParameterScope(os.environ, self.config_interpolator.path_index)
 
     def glob_regex_match(self, match, text):
         if text == None:
@@ -0,0 +1,54 @@
+import os
+import json
+import hashlib
+from datetime import datetime
+
+# keys service-step results by a hash of everything that went into the service-step
+# entries are stored by a cache backend (see servicer/builtin/cache_backends)
+class StepCache():
+    def __init__(self, backend, logger=None):
+        self.backend = backend
+        self.logger = logger
+        self.file_digests = {}
+
+    def key(self, inputs, files=[]):
+        digest = hashlib.sha256()
+        digest.update(json.dumps(inputs, sort_keys=True, default=str).encode('utf-8'))
+
+        for path in sorted(files):
+            digest.update(('\0%s\0%s' % (path, self.file_digest(path))).encode('utf-8'))
+
+        return digest.hexdigest()
+
+    def file_digest(self, path):
+        if path not in self.file_digests:
+            digest = hashlib.sha256()
+            try:
+                with open(path, 'rb') as fp:
+                    for chunk in iter(lambda: fp.read(1024 * 1024), b''):
+                        digest.update(chunk)
+            except FileNotFoundError:
+                # deleted files are part of the change, but have no contents to hash
+                digest.update(b'\0missing')
+
+            self.file_digests[path] = digest.hexdigest()
+
+        return self.file_digests[path]
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def put(self, key, entry):
+        self.backend.put(key, {**entry, 'created_at': datetime.utcnow().isoformat()})
+
+# servicer's own cache (timings, cached results) never feeds a cache key
+CACHE_DIRECTORY = os.path.join('.servicer', '.cache')
+
+def walk_files(root='.'):
+    files = []
+    for directory, directories, names in os.walk(root):
+        relative_directory = os.path.relpath(directory, root)
+        directories[:] = [d for d in directories if d != '.git' and os.path.normpath(os.path.join(relative_directory, d)) != CACHE_DIRECTORY]
+        for name in names:
+            files.append(os.path.relpath(os.path.join(directory, name), root))
+    return files
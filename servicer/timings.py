@@ -0,0 +1,93 @@
+import os
+import json
+import threading
+from datetime import datetime
+
+from .files import atomic_write
+
+# persists the duration, exit status and commit of recent runs of each service-step
+class TimingStore():
+    def __init__(self, path, history=10, logger=None):
+        self.path = path
+        self.history = history
+        self.logger = logger
+        self.lock = threading.Lock()
+        self.service_steps = {}
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path) as fp:
+                self.service_steps = json.load(fp).get('service_steps', {})
+        except ValueError:
+            self.logger.log('ignoring unreadable timings file: %s' % self.path, level='warn')
+
+    # timings are bookkeeping, failing to save them never fails a build
+    def save(self):
+        with self.lock:
+            data = json.dumps({'service_steps': self.service_steps}, indent=2, sort_keys=True)
+
+        try:
+            atomic_write(self.path, data)
+        except OSError as e:
+            self.logger.log('unable to save timings file (%s): %s' % (self.path, e), level='warn')
+
+    def record(self, service_step_name, duration, status=0, commit=None):
+        with self.lock:
+            runs = self.service_steps.setdefault(service_step_name, [])
+            runs.append({
+                'duration': round(duration, 3),
+                'status': status,
+                'commit': commit,
+                'finished_at': datetime.utcnow().isoformat(),
+            })
+            del runs[:-self.history]
+
+    # average duration of the successful runs of a service-step, None if it has never succeeded
+    def estimate(self, service_step_name):
+        durations = [r['duration'] for r in self.service_steps.get(service_step_name, []) if r['status'] == 0]
+        if not durations:
+            return None
+
+        return sum(durations) / len(durations)
+
+    def estimates(self, service_step_names):
+        estimates = {}
+        for name in service_step_names:
+            estimate = self.estimate(name)
+            if estimate is not None:
+                estimates[name] = estimate
+        return estimates
+
+    def report(self):
+        lines = ['%-50s %6s %10s %10s %8s  %s' % ('service-step', 'runs', 'last', 'average', 'status', 'commit')]
+
+        for name, runs in sorted(self.service_steps.items()):
+            if not runs:
+                continue
+
+            last = runs[-1]
+            average = self.estimate(name)
+            lines.append('%-50s %6s %10s %10s %8s  %s' % (
+                name,
+                len(runs),
+                format_duration(last['duration']),
+                format_duration(average) if average is not None else '-',
+                last['status'],
+                last.get('commit') or '-',
+            ))
+
+        return lines
+
+def format_duration(seconds):
+    if seconds < 60:
+        return '%.1fs' % seconds
+
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    if minutes < 60:
+        return '%dm%02ds' % (minutes, seconds)
+
+    hours, minutes = divmod(minutes, 60)
+    return '%dh%02dm%02ds' % (hours, minutes, seconds)
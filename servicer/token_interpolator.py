@@ -1,4 +1,36 @@
 import re
+from functools import lru_cache
+
+from .parameter_scope import ParameterScope, PathIndex, walk_path
+
+TOKEN_PATTERN = re.compile(r'\${.+?}+')
+
+# a string split into literal and ${...} token segments, in order
+class Template():
+    def __init__(self, segments):
+        self.segments = segments
+        self.tokens = tuple(segment for segment, is_token in segments if is_token)
+
+# parses a string once, config strings and commands are interpolated many times over a build
+@lru_cache(maxsize=4096)
+def compile_template(value):
+    segments = []
+    position = 0
+    for match in TOKEN_PATTERN.finditer(value):
+        if match.start() > position:
+            segments.append((value[position:match.start()], False))
+        segments.append((match.group(0), True))
+        position = match.end()
+
+    if position < len(value):
+        segments.append((value[position:], False))
+
+    return Template(tuple(segments))
+
+# the keys of a dotted path, e.g. services.api.steps.build.results.image
+@lru_cache(maxsize=4096)
+def compile_path(value):
+    return tuple(value.split('.'))
 
 class TokenInterpolator():
     def __init__(self, logger=None):
@@ -32,25 +64,28 @@ class TokenInterpolator():
                     self.interpolate_tokens(config[i], params, ignore_missing_key, ignore_default)
 
     def replace_tokens(self, value, params, ignore_missing_key=False, ignore_default=False):
-        escaped_values = list('.^$*+?()[]{}|')
+        template = compile_template(value)
+        if not template.tokens:
+            return value
 
-        for match in re.findall(r'\${.+?}+', value):
-            token = match[2:-1]
+        pieces = []
+        for segment, is_token in template.segments:
+            if not is_token:
+                pieces.append(segment)
+                continue
 
-            replace_value = self.evaluate_token(match, params, ignore_default)
+            replace_value = self.evaluate_token(segment, params, ignore_default)
 
             # allow list/dict replacement, replace entire string value with the list or dict
             if isinstance(replace_value, list) or isinstance(replace_value, dict):
                 return replace_value
 
             if replace_value != None and replace_value != '':
-                for ev in escaped_values:
-                    if ev in token:
-                        token = token.replace(ev, '\%s' % ev)
-                # self.logger.log('replacing token %s -> %s' % (token, replace_value), level='debug')
-                value = re.sub(r'\${%s}' % token, str(replace_value), value)
+                pieces.append(str(replace_value))
+            else:
+                pieces.append(segment)
 
-        return value
+        return ''.join(pieces)
 
     def evaluate_token(self, value, params, ignore_default=False):
         if not (value.startswith('${') and value.endswith('}')):
@@ -76,7 +111,7 @@ class TokenInterpolator():
             return value[1:-1]
 
         result = None
-        path_pieces = value.split('.')
+        path_pieces = compile_path(value)
         if len(path_pieces) > 0:
             path_value = self.dict_get_path(_dict=params, path=path_pieces, ignore_missing_key=True)
             if path_value != None and path_value != '':
@@ -88,12 +123,8 @@ class TokenInterpolator():
         if path == None or len(path) < 1:
             return None
 
-        _path = path.copy()
-        current_path = _path.pop(0)
-        if ignore_missing_key and current_path not in _dict:
-            return None
-
-        if len(_path) < 1:
-            return _dict[current_path]
+        # parameter scopes resolve paths through their own (possibly indexed) mappings
+        if isinstance(_dict, (ParameterScope, PathIndex)):
+            return _dict.get_path(path, ignore_missing_key=ignore_missing_key)
 
-        return self.dict_get_path(_dict=_dict[current_path], path=_path, ignore_missing_key=ignore_missing_key)
+        return walk_path(_dict, path, ignore_missing_key=ignore_missing_key)
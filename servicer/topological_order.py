@@ -1,8 +1,13 @@
-from functools import reduce
+# raised when dependencies cannot be ordered, cycle holds the items of one cycle, starting and ending with the same item
+class CyclicDependencyError(ValueError):
+    def __init__(self, cycle):
+        self.cycle = cycle
+        super().__init__('A cyclic dependency exists: %s' % ' -> '.join(str(item) for item in cycle))
 
-# destructive topological dependency sort
-# expects a dict containing dependency sets
-# http://rosettacode.org/wiki/Topological_sort#Python
+# topological dependency sort into layers of items whose dependencies are all in earlier layers
+# expects a dict containing dependency sets, self dependencies are discarded and
+# items only referenced as dependencies are added to the dict
+# runs in O(V + E) using in-degree counts (Kahn's algorithm), each layer is sorted
 def toposort2(data):
     result = []
 
@@ -13,25 +18,53 @@ def toposort2(data):
         v.discard(k) # Ignore self dependencies
 
     # ensure all referenced items have an entry in the data dict
-    extra_items_in_dependencies = reduce(set.union, data.values()) - set(data.keys())
+    extra_items_in_dependencies = set()
+    for dependencies in data.values():
+        extra_items_in_dependencies.update(d for d in dependencies if d not in data)
     data.update({item: set() for item in extra_items_in_dependencies})
 
-    # perform the topological ordering
-    while True:
-        ordered = set(item for item, dependency in data.items() if not dependency)
-        if not ordered:
-            break
+    # item -> number of its dependencies not yet ordered
+    waiting_on = {item: len(dependencies) for item, dependencies in data.items()}
+    # item -> items depending on it
+    dependents = {item: [] for item in data}
+    for item, dependencies in data.items():
+        for dependency in dependencies:
+            dependents[dependency].append(item)
 
+    # perform the topological ordering
+    ordered = [item for item, count in waiting_on.items() if not count]
+    while ordered:
         # build the next topological layer
-        result.append(sorted(ordered))
+        layer = sorted(ordered)
+        result.append(layer)
 
-        # remove the current layer's dependencies from each item
-        data = {item: (dep - ordered) for item, dep in data.items() if item not in ordered}
+        ordered = []
+        for item in layer:
+            del waiting_on[item]
+            for dependent in dependents[item]:
+                waiting_on[dependent] -= 1
+                if not waiting_on[dependent]:
+                    ordered.append(dependent)
 
-    assert not data, 'A cyclic dependency exists amongst %r' % data
+    if waiting_on:
+        raise CyclicDependencyError(find_cycle(data, waiting_on))
 
     return result
 
+# follows unordered dependencies from the first unordered item until one repeats
+# every unordered item has at least one unordered dependency, so this always ends in a cycle
+def find_cycle(data, unordered):
+    item = min(unordered)
+    path = []
+    position = {}
+
+    while item not in position:
+        position[item] = len(path)
+        path.append(item)
+        item = min(d for d in data[item] if d in unordered)
+
+    return path[position[item]:] + [item]
+
 if __name__ == '__main__':
     # sample execution
     data = {
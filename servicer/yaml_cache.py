@@ -0,0 +1,90 @@
+import os
+import pickle
+from ruamel import yaml
+
+from .files import atomic_write
+
+try:
+    from ruamel.yaml.cyaml import CSafeLoader
+except ImportError:
+    CSafeLoader = None
+
+# yaml loaders that config files can be parsed with
+# auto: the C-based safe loader when ruamel.yaml's C extension is installed, otherwise the pure-Python safe loader
+# c: the C-based safe loader
+# python: the pure-Python safe loader
+# unsafe: the pure-Python full loader, for configs relying on python-specific yaml tags
+LOADERS = ['auto', 'c', 'python', 'unsafe']
+
+def yaml_loader(name='auto'):
+    if name in [None, 'auto']:
+        return CSafeLoader or yaml.SafeLoader
+
+    if name == 'c':
+        if not CSafeLoader:
+            raise ValueError('the c yaml loader requires the ruamel.yaml C extension (ruamel.yaml.clib)')
+        return CSafeLoader
+
+    if name == 'python':
+        return yaml.SafeLoader
+
+    if name == 'unsafe':
+        return yaml.Loader
+
+    raise ValueError('unknown yaml loader: %s (options are: %s)' % (name, ', '.join(LOADERS)))
+
+# parses each yaml file once, keyed by path, modification time and size
+# parsed trees are kept pickled, so every load returns an independent copy that can be merged and interpolated freely
+# the cache can optionally be persisted to disk, letting warm starts skip yaml parsing entirely
+class YamlCache():
+    def __init__(self, persist_path=None, loader=None, logger=None):
+        self.persist_path = persist_path
+        self.loader = yaml_loader(loader)
+        self.logger = logger
+        # real path -> (mtime, size, loader name, pickled tree)
+        self.entries = {}
+        self.used = set()
+        self.changed = False
+
+        if self.persist_path:
+            self.load_persisted()
+
+    def load(self, path):
+        real_path = os.path.realpath(path)
+        stat = os.stat(real_path)
+        entry = self.entries.get(real_path)
+
+        if entry is None or entry[:3] != (stat.st_mtime_ns, stat.st_size, self.loader.__name__):
+            with open(real_path) as fp:
+                data = yaml.load(fp, Loader=self.loader)
+
+            entry = (stat.st_mtime_ns, stat.st_size, self.loader.__name__, pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+            self.entries[real_path] = entry
+            self.changed = True
+
+        self.used.add(real_path)
+        return pickle.loads(entry[3])
+
+    def load_persisted(self):
+        if not os.path.exists(self.persist_path):
+            return
+
+        try:
+            with open(self.persist_path, 'rb') as fp:
+                self.entries = pickle.load(fp)
+        except Exception as e:
+            self.entries = {}
+            if self.logger:
+                self.logger.log('ignoring unreadable config cache (%s): %s' % (self.persist_path, e), level='warn')
+
+    # persists the entries used by this run, dropping files that are no longer loaded
+    def save(self):
+        if not self.persist_path:
+            return
+
+        if not self.changed and set(self.entries) == self.used:
+            return
+
+        entries = {path: entry for path, entry in self.entries.items() if path in self.used}
+
+        atomic_write(self.persist_path, pickle.dumps(entries, protocol=pickle.HIGHEST_PROTOCOL), mode='wb')
@@ -0,0 +1,103 @@
+from unittest import TestCase, mock
+import os
+import json
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from servicer.builtin.cache_backends import local, http
+
+class LocalCacheBackendTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'cache')
+        self.backend = local.CacheBackend({'path': self.path, 'max_entries': 2}, logger=mock.Mock())
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_missing_entry(self):
+        self.assertEqual(self.backend.get('abc'), None)
+
+    def test_round_trip(self):
+        self.backend.put('abc', {'results': {'version': '1.2.3'}})
+        self.assertEqual(self.backend.get('abc'), {'results': {'version': '1.2.3'}})
+
+    def test_evicts_least_recently_used_entries(self):
+        self.backend.put('one', {})
+        self.backend.put('two', {})
+        os.utime(self.backend.entry_path('one'), (1, 1))
+        os.utime(self.backend.entry_path('two'), (2, 2))
+
+        # reading an entry marks it as recently used
+        self.backend.get('one')
+        self.backend.put('three', {})
+
+        self.assertEqual(sorted(os.listdir(self.path)), ['.gitignore', 'one.json', 'three.json'])
+
+# a minimal stand-in for a remote cache server, storing PUT bodies in memory
+class CacheRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = self.server.entries.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_PUT(self):
+        self.server.headers.append(dict(self.headers))
+        self.server.entries[self.path] = self.rfile.read(int(self.headers['Content-Length']))
+        self.send_response(201)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+class HttpCacheBackendTest(TestCase):
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), CacheRequestHandler)
+        self.server.entries = {}
+        self.server.headers = []
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={'poll_interval': 0.05})
+        self.thread.start()
+
+        self.url = 'http://127.0.0.1:%s/cache/' % self.server.server_port
+        self.logger = mock.Mock()
+        self.backend = http.CacheBackend({'url': self.url, 'headers': {'Authorization': 'Bearer token'}}, logger=self.logger)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def test_missing_entry(self):
+        self.assertEqual(self.backend.get('abc'), None)
+
+    def test_round_trip(self):
+        self.backend.put('abc', {'results': {'version': '1.2.3'}})
+
+        self.assertEqual(json.loads(self.server.entries['/cache/ac/abc'].decode('utf-8')), {'results': {'version': '1.2.3'}})
+        self.assertEqual(self.server.headers[0]['Authorization'], 'Bearer token')
+        self.assertEqual(self.backend.get('abc'), {'results': {'version': '1.2.3'}})
+
+    def test_shares_entries_between_backends(self):
+        self.backend.put('abc', {'results': None})
+
+        other_backend = http.CacheBackend({'url': self.url}, logger=mock.Mock())
+        self.assertEqual(other_backend.get('abc'), {'results': None})
+
+    def test_unreachable_cache_is_a_miss(self):
+        self.backend.url = 'http://127.0.0.1:1'
+
+        self.assertEqual(self.backend.get('abc'), None)
+        self.backend.put('abc', {})
+        self.assertEqual(self.logger.log.call_count, 2)
+
+    def test_requires_a_url(self):
+        with self.assertRaisesRegex(ValueError, 'cache.url'):
+            http.CacheBackend({'url': None}, logger=mock.Mock())
@@ -0,0 +1,123 @@
+from unittest import TestCase, mock
+
+from servicer.config_interpolator import ConfigInterpolator, template_references
+
+class ConfigInterpolatorTest(TestCase):
+    def setUp(self):
+        self.config = {
+            'project': 'fish',
+            'services': {
+                'api': {
+                    'steps': {
+                        'build': {
+                            'config': {
+                                'image': '${project}-api:${TAG}',
+                                'args': ['--name', '${NAME:"tuna"}'],
+                            },
+                        },
+                    },
+                },
+                'web': {
+                    'steps': {
+                        'deploy': {
+                            'config': {
+                                'image': '${services.api.steps.build.config.image}',
+                                'digest': '${services.api.steps.build.results.digest:"none"}',
+                                'label': 'digest ${services.web.steps.deploy.config.digest}',
+                            },
+                        },
+                    },
+                },
+            },
+        }
+        self.config_interpolator = ConfigInterpolator(self.config, logger=mock.Mock())
+
+    def params(self, **environment):
+        return {**self.config, **environment}
+
+    def test_renders_once_and_keeps_unresolved_tokens(self):
+        self.config_interpolator.interpolate({'TAG': 'v1'}, ignore_missing_key=True, ignore_default=True)
+
+        build_config = self.config['services']['api']['steps']['build']['config']
+        self.assertEqual(build_config['image'], '${project}-api:v1')
+        self.assertEqual(build_config['args'], ['--name', '${NAME:"tuna"}'])
+        self.assertTrue(('services', 'api', 'steps', 'build', 'config', 'image') in self.config_interpolator.pending)
+
+    def test_interpolates_keys(self):
+        self.config['services']['${SERVICE}'] = {'steps': {}}
+
+        self.config_interpolator.interpolate({'SERVICE': 'worker'}, ignore_missing_key=True, ignore_default=True)
+
+        self.assertTrue('worker' in self.config['services'])
+        self.assertTrue('${SERVICE}' not in self.config['services'])
+
+    def test_resolves_referenced_templates_first(self):
+        self.config_interpolator.interpolate({}, ignore_missing_key=True, ignore_default=True)
+
+        deploy_config = self.config['services']['web']['steps']['deploy']['config']
+        self.config_interpolator.resolve(deploy_config, self.params(TAG='v2'))
+
+        self.assertEqual(deploy_config, {
+            'image': 'fish-api:v2',
+            'digest': 'none',
+            'label': 'digest none',
+        })
+        self.assertEqual(self.config['services']['api']['steps']['build']['config']['image'], 'fish-api:v2')
+
+    def test_only_renders_pending_templates(self):
+        self.config_interpolator.interpolate({}, ignore_missing_key=True, ignore_default=True)
+        build_config = self.config['services']['api']['steps']['build']['config']
+        self.config_interpolator.resolve(build_config, self.params(TAG='v2'))
+
+        self.config_interpolator.token_interpolator = mock.Mock()
+        self.config_interpolator.resolve(build_config, self.params(TAG='v3'))
+
+        self.config_interpolator.token_interpolator.replace_tokens.assert_not_called()
+        self.assertEqual(build_config['image'], 'fish-api:v2')
+
+    def test_renders_dependents_of_new_results_again(self):
+        self.config_interpolator.interpolate({}, ignore_missing_key=True, ignore_default=True)
+        deploy_config = self.config['services']['web']['steps']['deploy']['config']
+        self.config_interpolator.resolve(deploy_config, self.params(TAG='v2'))
+
+        build_step = self.config['services']['api']['steps']['build']
+        build_step['results'] = {'digest': 'sha256:abc'}
+        self.config_interpolator.invalidate(build_step, 'results')
+
+        self.assertTrue(('services', 'web', 'steps', 'deploy', 'config', 'digest') in self.config_interpolator.pending)
+        self.assertTrue(('services', 'web', 'steps', 'deploy', 'config', 'label') in self.config_interpolator.pending)
+        self.assertTrue(('services', 'web', 'steps', 'deploy', 'config', 'image') not in self.config_interpolator.pending)
+
+        self.config_interpolator.resolve(deploy_config, self.params(TAG='v2'))
+
+        self.assertEqual(deploy_config['digest'], 'sha256:abc')
+        self.assertEqual(deploy_config['label'], 'digest sha256:abc')
+
+    def test_interpolates_containers_outside_of_the_tree(self):
+        self.config_interpolator.interpolate({}, ignore_missing_key=True, ignore_default=True)
+        config = {'image': '${project}'}
+
+        self.config_interpolator.resolve(config, self.params())
+
+        self.assertEqual(config, {'image': 'fish'})
+
+    def test_handles_cyclic_references(self):
+        config = {'a': '${b}', 'b': '${a}'}
+        config_interpolator = ConfigInterpolator(config, logger=mock.Mock())
+        config_interpolator.interpolate({}, ignore_missing_key=True, ignore_default=True)
+
+        config_interpolator.resolve(config, config)
+
+        self.assertEqual(config['a'], config['b'])
+        self.assertEqual(config_interpolator.pending, set([('a',), ('b',)]))
+
+class TemplateReferencesTest(TestCase):
+    def test_finds_referenced_paths(self):
+        self.assertEqual(template_references('${services.api.name}-${TAG:BRANCH}'), set([
+            ('services', 'api', 'name'),
+            ('TAG',),
+            ('BRANCH',),
+        ]))
+
+    def test_ignores_literals(self):
+        self.assertEqual(template_references('${TAG:"latest"} ${"foo"}'), set([('TAG',)]))
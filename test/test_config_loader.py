@@ -1,4 +1,6 @@
 from unittest import TestCase, mock
+import os
+import tempfile
 
 from servicer.config_loader import ConfigLoader
 
@@ -95,3 +97,105 @@ class MergeConfigTest(ConfigLoaderTest):
                 { 'brazil': 'not rio de janeiro' },
             ],
         })
+
+class SnapshotTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.config_path = self.directory.name
+        with open(os.path.join(self.config_path, 'services.yaml'), 'w') as fp:
+            fp.write('services:\n  api:\n    steps:\n      build:\n        config:\n          image: ${PROJECT}-api\n')
+
+        self.args = {'servicer_config_path': self.config_path, 'services_file': 'services.yaml', 'compiled': True}
+        self.logger = mock.Mock()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def compile(self):
+        config_loader = ConfigLoader(args={**self.args, 'command': 'compile'}, logger=self.logger)
+        config = config_loader.load_config()
+        config_loader.write_snapshot(config, graph={'api:build': []})
+        return config
+
+    def test_loads_a_compiled_snapshot(self):
+        compiled = self.compile()
+
+        config_loader = ConfigLoader(args=self.args, logger=self.logger)
+        config_loader.load_extended_config = mock.Mock()
+        config = config_loader.load_config()
+
+        config_loader.load_extended_config.assert_not_called()
+        self.assertEqual(config['services'], compiled['services'])
+        self.assertEqual(config['config_path'], self.config_path)
+        self.assertEqual(config['services']['api']['steps']['build']['config']['image'], '${PROJECT}-api')
+        self.assertEqual(config['args'], self.args)
+        self.assertEqual(config_loader.compiled_graph, {'api:build': []})
+
+    def test_ignores_an_out_of_date_snapshot(self):
+        self.compile()
+        with open(os.path.join(self.config_path, 'services.yaml'), 'a') as fp:
+            fp.write('          tag: latest\n')
+
+        config_loader = ConfigLoader(args=self.args, logger=self.logger)
+        config = config_loader.load_config()
+
+        self.assertEqual(config['services']['api']['steps']['build']['config']['tag'], 'latest')
+        self.assertEqual(config_loader.compiled_graph, None)
+
+    def test_only_loads_a_snapshot_when_asked_to(self):
+        self.compile()
+
+        config_loader = ConfigLoader(args={**self.args, 'compiled': False}, logger=self.logger)
+        config_loader.load_snapshot = mock.Mock()
+        config_loader.load_config()
+
+        config_loader.load_snapshot.assert_not_called()
+        self.assertTrue(ConfigLoader(args={**self.args, 'compiled': False, 'snapshot_path': config_loader.snapshot_path}).use_snapshot)
+
+    def test_ignores_a_snapshot_of_another_services_file(self):
+        self.compile()
+        with open(os.path.join(self.config_path, 'other.yaml'), 'w') as fp:
+            fp.write('services:\n  web:\n    steps:\n      build: {}\n')
+
+        config_loader = ConfigLoader(args={**self.args, 'services_file': 'other.yaml'}, logger=self.logger)
+        config = config_loader.load_config()
+
+        self.assertEqual(list(config['services']), ['web'])
+        self.assertEqual(config_loader.compiled_graph, None)
+
+    def test_ignores_a_snapshot_compiled_with_another_config_loader(self):
+        self.compile()
+
+        config_loader = ConfigLoader(args={**self.args, 'config_loader': 'unsafe'}, logger=self.logger)
+
+        self.assertEqual(config_loader.load_snapshot(), None)
+
+    def test_checks_the_header_before_unpickling(self):
+        self.compile()
+        with open(os.path.join(self.config_path, 'services.yaml'), 'a') as fp:
+            fp.write('          tag: latest\n')
+
+        config_loader = ConfigLoader(args=self.args, logger=self.logger)
+        with mock.patch('servicer.config_loader.pickle.load') as load:
+            self.assertEqual(config_loader.load_snapshot(), None)
+
+        load.assert_not_called()
+
+    def test_compiling_ignores_the_existing_snapshot(self):
+        self.compile()
+
+        config_loader = ConfigLoader(args={**self.args, 'command': 'compile'}, logger=self.logger)
+        config_loader.load_snapshot = mock.Mock()
+        config_loader.load_config()
+
+        config_loader.load_snapshot.assert_not_called()
+
+    def test_ignores_an_unreadable_snapshot(self):
+        os.makedirs(os.path.join(self.config_path, '.cache'))
+        with open(os.path.join(self.config_path, '.cache', 'compiled.pickle'), 'w') as fp:
+            fp.write('not a pickle')
+
+        config_loader = ConfigLoader(args=self.args, logger=self.logger)
+
+        self.assertEqual(config_loader.load_snapshot(), None)
+        self.assertEqual(self.logger.log.call_args[1], {'level': 'warn'})
@@ -61,17 +61,18 @@ class OrderServiceStepsTest(DependencyGrapherTest):
         result = self.dependency_grapher.order_service_steps(self.dependency_grapher.config['services'].keys())
 
         self.assertEqual(self.dependency_grapher.add_dependencies.mock_calls, [
-            mock.call({}, 'service_1:build', True),
-            mock.call({}, 'service_1:test', True),
-            mock.call({}, 'service_2:build', True),
-            mock.call({}, 'service_2:test', True),
-            mock.call({}, 'service_2:deploy', True),
+            mock.call({}, ('service_1', 'build'), True),
+            mock.call({}, ('service_1', 'test'), True),
+            mock.call({}, ('service_2', 'build'), True),
+            mock.call({}, ('service_2', 'test'), True),
+            mock.call({}, ('service_2', 'deploy'), True),
         ])
         self.dependency_grapher.toposort2.assert_called_with({})
         self.assertEqual(result, [
             ['service_1:build', 'service_2:build'],
             ['service_1:test', 'service_2:test'],
         ])
+        self.assertEqual(self.dependency_grapher.dependencies, {})
 
     def test_returns_an_empty_service_step_order(self):
         self.dependency_grapher.toposort2 = mock.Mock(return_value=[])
@@ -82,8 +83,8 @@ class OrderServiceStepsTest(DependencyGrapherTest):
         self.assertEqual(result, [])
 
     def test_removes_orphaned_dependencies(self):
-        def mock_add_dependencies(dependencies, service_step_name, follow_dependencies=True):
-            dependencies['service_1:test'] = set(['service_1:build'])
+        def mock_add_dependencies(dependencies, service_step, follow_dependencies=True):
+            dependencies[('service_1', 'test')] = set([('service_1', 'build')])
 
         self.dependency_grapher.add_dependencies = mock.Mock(side_effect=mock_add_dependencies)
         self.dependency_grapher.config['args']['ignore_dependencies'] = True
@@ -91,11 +92,11 @@ class OrderServiceStepsTest(DependencyGrapherTest):
         result = self.dependency_grapher.order_service_steps(self.dependency_grapher.config['services'].keys())
 
         self.assertEqual(self.dependency_grapher.add_dependencies.mock_calls, [
-            mock.call({'service_1:test': set()}, 'service_1:build', False),
-            mock.call({'service_1:test': set()}, 'service_1:test', False),
-            mock.call({'service_1:test': set()}, 'service_2:build', False),
-            mock.call({'service_1:test': set()}, 'service_2:test', False),
-            mock.call({'service_1:test': set()}, 'service_2:deploy', False),
+            mock.call({('service_1', 'test'): set()}, ('service_1', 'build'), False),
+            mock.call({('service_1', 'test'): set()}, ('service_1', 'test'), False),
+            mock.call({('service_1', 'test'): set()}, ('service_2', 'build'), False),
+            mock.call({('service_1', 'test'): set()}, ('service_2', 'test'), False),
+            mock.call({('service_1', 'test'): set()}, ('service_2', 'deploy'), False),
         ])
         self.dependency_grapher.toposort2.assert_called_with({'service_1:test': set()})
         self.assertEqual(result, [
@@ -103,6 +104,47 @@ class OrderServiceStepsTest(DependencyGrapherTest):
             ['service_1:test', 'service_2:test'],
         ])
 
+    def test_saves_the_graph_index(self):
+        self.dependency_grapher.graph_index = mock.Mock()
+
+        self.dependency_grapher.order_service_steps(['service_1'])
+
+        self.dependency_grapher.graph_index.save.assert_called_with(self.dependency_grapher.config['services'])
+
+    def test_returns_service_step_names(self):
+        grapher = DependencyGrapher(
+            config=self.dependency_grapher.config,
+            active_services=['service_1', 'service_2'],
+            steps=self.dependency_grapher.steps,
+            step_order=['build', 'test', 'deploy'],
+            active_steps=['build', 'test', 'deploy'],
+            depends_on={'service_1:build': ['service_2:build']},
+            logger=self.logger,
+        )
+
+        result = grapher.order_service_steps(['service_1', 'service_2'])
+
+        self.assertEqual(result, [
+            ['service_2:build'],
+            ['service_1:build', 'service_2:test'],
+            ['service_1:test', 'service_2:deploy'],
+        ])
+        self.assertEqual(grapher.dependencies['service_1:build'], set(['service_2:build']))
+
+class DependentServicesTest(DependencyGrapherTest):
+    def test_finds_transitive_dependents(self):
+        self.dependency_grapher.dependencies = {
+            'api:build': set(),
+            'api:test': set(['api:build']),
+            'web:build': set(['api:test']),
+            'worker:build': set(['web:build']),
+            'docs:build': set(),
+        }
+
+        self.assertEqual(self.dependency_grapher.dependent_services(['api']), set(['web', 'worker']))
+        self.assertEqual(self.dependency_grapher.dependent_services(['web', 'worker']), set())
+        self.assertEqual(self.dependency_grapher.dependent_services([]), set())
+
 class ServiceStepDependsOnTest(DependencyGrapherTest):
     def setUp(self):
         super().setUp()
@@ -144,6 +186,14 @@ class ServiceStepDependsOnTest(DependencyGrapherTest):
 
         self.assertEqual(result, ['service_1:build'])
 
+    def test_depends_on_the_previous_step_the_service_has(self):
+        self.dependency_grapher.config['services']['service_4'] = {'steps': {'deploy': {}, 'build': {}}}
+
+        result = self.dependency_grapher.service_step_depends_on('service_4:deploy')
+
+        self.assertEqual(result, ['service_4:build'])
+        self.assertEqual(self.dependency_grapher.service_step_depends_on('service_4:build'), [])
+
     def test_depends_on_with_no_implicit_dependencies(self):
         self.dependency_grapher.config['graph']['implicit-step-dependencies'] = False
 
@@ -163,6 +213,29 @@ class ServiceStepDependsOnTest(DependencyGrapherTest):
 
         self.assertEqual(result, ['service_2:build'])
 
+    def test_uses_compiled_dependencies(self):
+        self.dependency_grapher.compiled_depends_on = {('service_1', 'test'): ['service_2:build']}
+
+        result = self.dependency_grapher.service_step_depends_on('service_1:test')
+
+        self.dependency_grapher.get_depends_on.assert_not_called()
+        self.assertEqual(result, ['service_2:build'])
+
+    def test_uses_the_graph_index(self):
+        self.dependency_grapher.graph_index = mock.Mock()
+        self.dependency_grapher.graph_index.depends_on.return_value = ['service_2']
+
+        result = self.dependency_grapher.service_step_depends_on('service_1:build')
+
+        self.dependency_grapher.graph_index.depends_on.assert_called_with(
+            'service_1',
+            'build',
+            self.dependency_grapher.config['services']['service_1'],
+            self.dependency_grapher.direct_depends_on,
+        )
+        self.dependency_grapher.get_depends_on.assert_not_called()
+        self.assertEqual(result, ['service_2:build'])
+
 class GetDependsOnTest(DependencyGrapherTest):
     def setUp(self):
         super().setUp()
@@ -183,7 +256,7 @@ class AddDependenciesTest(DependencyGrapherTest):
     def setUp(self):
         super().setUp()
 
-        self.dependency_grapher.service_step_depends_on = mock.Mock(return_value=[])
+        self.dependency_grapher.step_depends_on = mock.Mock(return_value=[])
         self.dependency_grapher.add_dependency = mock.Mock()
 
         self.dependency_grapher.config['services'] = {
@@ -209,80 +282,80 @@ class AddDependenciesTest(DependencyGrapherTest):
         self.dependencies = {}
 
     def test_skips_if_an_entry_already_exists(self):
-        self.dependencies = {'service_1:build': set(['strawberry', 'mango', 'banana'])}
+        self.dependencies = {('service_1', 'build'): set(['strawberry', 'mango', 'banana'])}
 
-        result = self.dependency_grapher.add_dependencies(self.dependencies, 'service_1:build')
+        result = self.dependency_grapher.add_dependencies(self.dependencies, ('service_1', 'build'))
 
-        self.dependency_grapher.service_step_depends_on.assert_not_called()
+        self.dependency_grapher.step_depends_on.assert_not_called()
         self.dependency_grapher.add_dependency.assert_not_called()
         self.assertEqual(self.dependencies, {
-            'service_1:build': set(['strawberry', 'mango', 'banana']),
+            ('service_1', 'build'): set(['strawberry', 'mango', 'banana']),
         })
 
     def test_adds_an_empty_set_with_no_dependencies(self):
-        result = self.dependency_grapher.add_dependencies(self.dependencies, 'service_1:build')
+        result = self.dependency_grapher.add_dependencies(self.dependencies, ('service_1', 'build'))
 
-        self.assertEqual(self.dependency_grapher.service_step_depends_on.mock_calls, [
-            mock.call('service_1:build'),
+        self.assertEqual(self.dependency_grapher.step_depends_on.mock_calls, [
+            mock.call('service_1', 'build'),
         ])
         self.dependency_grapher.add_dependency.assert_not_called()
         self.assertEqual(self.dependencies, {
-            'service_1:build': set(),
+            ('service_1', 'build'): set(),
         })
 
     def test_adds_a_service_step_with_dependencies(self):
-        self.dependency_grapher.service_step_depends_on.return_value = [
+        self.dependency_grapher.step_depends_on.return_value = [
             'service_2:build',
             'service_3:build',
         ]
 
-        result = self.dependency_grapher.add_dependencies(self.dependencies, 'service_1:build')
+        result = self.dependency_grapher.add_dependencies(self.dependencies, ('service_1', 'build'))
 
         self.assertEqual(self.dependency_grapher.add_dependency.mock_calls, [
-            mock.call({'service_1:build': set()}, 'service_1:build', 'service_2', 'build', True),
-            mock.call({'service_1:build': set()}, 'service_1:build', 'service_3', 'build', True),
+            mock.call({('service_1', 'build'): set()}, ('service_1', 'build'), 'service_2', 'build', True),
+            mock.call({('service_1', 'build'): set()}, ('service_1', 'build'), 'service_3', 'build', True),
         ])
 
     def test_adds_a_soft_service_wildcard_dependency(self):
-        self.dependency_grapher.service_step_depends_on.return_value = [
+        self.dependency_grapher.step_depends_on.return_value = [
             '*:build',
         ]
 
-        result = self.dependency_grapher.add_dependencies(self.dependencies, 'service_1:build')
+        result = self.dependency_grapher.add_dependencies(self.dependencies, ('service_1', 'build'))
 
         self.assertEqual(self.dependency_grapher.add_dependency.mock_calls, [
-            mock.call({'service_1:build': set()}, 'service_1:build', '*', 'build', False),
+            mock.call({('service_1', 'build'): set()}, ('service_1', 'build'), '*', 'build', False),
         ])
 
     def test_adds_a_hard_service_wildcard_dependency(self):
-        self.dependency_grapher.service_step_depends_on.return_value = [
+        self.dependency_grapher.step_depends_on.return_value = [
             '*:build!',
         ]
 
-        result = self.dependency_grapher.add_dependencies(self.dependencies, 'service_1:build')
+        result = self.dependency_grapher.add_dependencies(self.dependencies, ('service_1', 'build'))
 
         self.assertEqual(self.dependency_grapher.add_dependency.mock_calls, [
-            mock.call({'service_1:build': set()}, 'service_1:build', '*', 'build!', False),
+            mock.call({('service_1', 'build'): set()}, ('service_1', 'build'), '*', 'build!', False),
         ])
 
     def test_throws_an_error_for_an_invalid_service_dependency(self):
-        self.dependency_grapher.service_step_depends_on.return_value = [
+        self.dependency_grapher.step_depends_on.return_value = [
             'service_9000:build',
         ]
 
         with self.assertRaises(ValueError) as context:
-            result = self.dependency_grapher.add_dependencies(self.dependencies, 'service_1:build')
+            result = self.dependency_grapher.add_dependencies(self.dependencies, ('service_1', 'build'))
 
         self.dependency_grapher.add_dependency.assert_not_called()
         self.assertTrue('Invalid service dependency specified: service_9000:build, "service_9000" must be included in services: [service_1,service_2,service_3,service_4]' in str(context.exception))
 
     def test_throws_an_error_for_an_invalid_step_dependency(self):
-        self.dependency_grapher.service_step_depends_on.return_value = [
+        self.dependency_grapher.step_depends_on.return_value = [
             'service_2:party',
         ]
 
         with self.assertRaises(ValueError) as context:
-            result = self.dependency_grapher.add_dependencies(self.dependencies, 'service_1:build')
+            result = self.dependency_grapher.add_dependencies(self.dependencies, ('service_1', 'build'))
 
         self.dependency_grapher.add_dependency.assert_not_called()
         self.assertTrue('Invalid step dependency specified: service_2:party, "party" must be included in steps: [build,test,deploy]' in str(context.exception))
@@ -294,20 +367,59 @@ class AddDependencyTest(DependencyGrapherTest):
         self.dependency_grapher.add_dependencies = mock.Mock()
 
         self.dependency_grapher.active_services = ['service_1', 'service_2']
-        self.dependencies = {'service_1:build': set()}
+        self.dependencies = {('service_1', 'build'): set()}
 
     def test_adds_a_dependency_without_following(self):
-        result = self.dependency_grapher.add_dependency(self.dependencies, 'service_1:build', 'service_2', 'build', False)
+        result = self.dependency_grapher.add_dependency(self.dependencies, ('service_1', 'build'), 'service_2', 'build', False)
 
         self.dependency_grapher.add_dependencies.assert_not_called()
         self.assertEqual(self.dependencies, {
-            'service_1:build': set(['service_2:build']),
+            ('service_1', 'build'): set([('service_2', 'build')]),
         })
 
     def test_adds_a_dependency_with_following(self):
-        result = self.dependency_grapher.add_dependency(self.dependencies, 'service_1:build', 'service_2', 'build', True)
+        result = self.dependency_grapher.add_dependency(self.dependencies, ('service_1', 'build'), 'service_2', 'build', True)
 
-        self.dependency_grapher.add_dependencies.assert_called_with({'service_1:build': {'service_2:build'}}, 'service_2:build', True)
+        self.dependency_grapher.add_dependencies.assert_called_with({('service_1', 'build'): {('service_2', 'build')}}, ('service_2', 'build'), True)
         self.assertEqual(self.dependencies, {
-            'service_1:build': set(['service_2:build']),
+            ('service_1', 'build'): set([('service_2', 'build')]),
         })
+
+class AddWildcardDependenciesTest(DependencyGrapherTest):
+    def setUp(self):
+        super().setUp()
+
+        self.dependency_grapher.config['services']['service_3'] = {
+            'name': 'service_3',
+            'steps': {'build': {}, 'test': {}},
+        }
+        self.dependency_grapher.step_depends_on = mock.Mock(return_value=[])
+
+    def test_expands_a_soft_wildcard_to_services_in_the_graph(self):
+        dependencies = {
+            ('service_1', 'test'): set(),
+            ('service_2', 'deploy'): set([('*', 'test')]),
+        }
+
+        self.dependency_grapher.add_wildcard_dependencies(dependencies)
+
+        self.assertEqual(dependencies[('service_2', 'deploy')], set([('service_1', 'test'), ('service_2', 'test')]))
+        self.assertTrue(('service_3', 'test') not in dependencies)
+
+    def test_expands_a_hard_wildcard_to_every_service(self):
+        dependencies = {
+            ('service_2', 'deploy'): set([('*', 'test!')]),
+        }
+
+        self.dependency_grapher.add_wildcard_dependencies(dependencies)
+
+        self.assertEqual(dependencies[('service_2', 'deploy')], set([('service_1', 'test'), ('service_2', 'test'), ('service_3', 'test')]))
+        self.assertEqual(self.dependency_grapher.graph_services, set(['service_1', 'service_2', 'service_3']))
+
+    def test_indexes_services_by_step_once(self):
+        self.assertEqual(self.dependency_grapher.services_with_step('deploy'), ['service_2'])
+
+        self.dependency_grapher.config['services']['service_1']['steps']['deploy'] = {}
+
+        self.assertEqual(self.dependency_grapher.services_with_step('deploy'), ['service_2'])
+        self.assertEqual(self.dependency_grapher.services_with_step('party'), [])
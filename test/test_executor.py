@@ -0,0 +1,197 @@
+from unittest import TestCase, mock
+import io
+import sys
+import threading
+
+from servicer.executor import OutputBuffer, ParallelExecutor
+
+class OutputBufferTest(TestCase):
+    def setUp(self):
+        self.stream = io.StringIO()
+        self.output = OutputBuffer(self.stream)
+
+    def test_writes_through_when_not_capturing(self):
+        self.output.write('hello\n')
+        self.assertEqual(self.stream.getvalue(), 'hello\n')
+
+    def test_holds_captured_output_until_released(self):
+        self.output.capture()
+        self.output.write('hello\n')
+        self.assertEqual(self.stream.getvalue(), '')
+
+        self.output.release()
+        self.assertEqual(self.stream.getvalue(), 'hello\n')
+
+class ParallelExecutorTest(TestCase):
+    def setUp(self):
+        self.executor = ParallelExecutor(workers=4, logger=mock.Mock())
+
+    def test_runs_every_item_in_every_layer(self):
+        ran = []
+        lock = threading.Lock()
+
+        def fn(item):
+            with lock:
+                ran.append(item)
+
+        self.executor.run_layers([['a:build', 'b:build'], ['a:test']], fn)
+
+        self.assertEqual(sorted(ran[:2]), ['a:build', 'b:build'])
+        self.assertEqual(ran[2:], ['a:test'])
+
+    def test_handles_empty_layers(self):
+        fn = mock.Mock()
+        self.executor.run_layers([[]], fn)
+        fn.assert_not_called()
+
+    def test_fails_fast_on_the_first_error(self):
+        ran = []
+
+        def fn(item):
+            ran.append(item)
+            if item == 'a:build':
+                raise ValueError('build failed')
+
+        with self.assertRaises(ValueError) as context:
+            self.executor.run_layers([['a:build'], ['a:test']], fn)
+
+        self.assertTrue('build failed' in str(context.exception))
+        self.assertEqual(ran, ['a:build'])
+
+    def test_propagates_system_exit(self):
+        def fn(item):
+            sys.exit(3)
+
+        with self.assertRaises(SystemExit) as context:
+            self.executor.run_layers([['a:build']], fn)
+
+        self.assertEqual(context.exception.code, 3)
+
+    def test_does_not_interleave_output(self):
+        barrier = threading.Barrier(2)
+
+        def fn(item):
+            print('%s start' % item)
+            barrier.wait(timeout=5)
+            print('%s end' % item)
+
+        stdout = sys.stdout
+        sys.stdout = io.StringIO()
+        try:
+            self.executor.run_layers([['a', 'b']], fn)
+            lines = sys.stdout.getvalue().strip().split('\n')
+        finally:
+            sys.stdout = stdout
+
+        self.assertEqual(sorted(lines), ['a end', 'a start', 'b end', 'b start'])
+        for i in range(0, 4, 2):
+            self.assertEqual(lines[i].split()[0], lines[i + 1].split()[0])
+
+class RunGraphTest(TestCase):
+    def setUp(self):
+        self.executor = ParallelExecutor(workers=1, logger=mock.Mock())
+        self.ran = []
+        self.fn = lambda item: self.ran.append(item)
+
+    def test_handles_an_empty_graph(self):
+        self.executor.run_graph({}, self.fn)
+        self.assertEqual(self.ran, [])
+
+    def test_runs_dependencies_first(self):
+        self.executor.run_graph({
+            'a:test': set(['a:build']),
+            'a:build': set(),
+            'b:build': set(['a:build']),
+        }, self.fn)
+
+        self.assertEqual(self.ran[0], 'a:build')
+        self.assertEqual(sorted(self.ran[1:]), ['a:test', 'b:build'])
+
+    def test_runs_referenced_items_without_entries(self):
+        self.executor.run_graph({'a:test': set(['a:build'])}, self.fn)
+        self.assertEqual(self.ran, ['a:build', 'a:test'])
+
+    def test_prioritises_the_longest_remaining_path(self):
+        self.executor.run_graph({
+            'a:build': set(),
+            'b:build': set(),
+            'b:test': set(['b:build']),
+            'b:deploy': set(['b:test']),
+        }, self.fn)
+
+        self.assertEqual(self.ran, ['b:build', 'b:test', 'a:build', 'b:deploy'])
+
+    def test_prioritises_by_weight(self):
+        self.executor.run_graph({
+            'a:build': set(),
+            'b:build': set(),
+            'b:test': set(['b:build']),
+        }, self.fn, weights={'a:build': 10})
+
+        self.assertEqual(self.ran, ['a:build', 'b:build', 'b:test'])
+
+    def test_does_not_wait_for_unrelated_items(self):
+        self.executor.workers = 2
+        slow_started = threading.Event()
+        release_slow = threading.Event()
+
+        def fn(item):
+            if item == 'slow:build':
+                slow_started.set()
+                release_slow.wait(timeout=5)
+            else:
+                slow_started.wait(timeout=5)
+            self.ran.append(item)
+            if item == 'fast:test':
+                release_slow.set()
+
+        self.executor.run_graph({
+            'slow:build': set(),
+            'fast:build': set(),
+            'fast:test': set(['fast:build']),
+        }, fn)
+
+        self.assertEqual(self.ran, ['fast:build', 'fast:test', 'slow:build'])
+
+    def test_fails_fast_on_the_first_error(self):
+        def fn(item):
+            self.ran.append(item)
+            raise ValueError('%s failed' % item)
+
+        with self.assertRaises(ValueError):
+            self.executor.run_graph({
+                'a:build': set(),
+                'a:test': set(['a:build']),
+            }, fn)
+
+        self.assertEqual(self.ran, ['a:build'])
+
+    def test_detects_cycles(self):
+        with self.assertRaises(ValueError) as context:
+            self.executor.run_graph({
+                'a:build': set(['b:build']),
+                'b:build': set(['a:build']),
+            }, self.fn)
+
+        self.assertTrue('cyclic' in str(context.exception))
+
+class EstimateDurationTest(TestCase):
+    def setUp(self):
+        self.dependencies = {
+            'a:build': set(),
+            'b:build': set(),
+            'b:test': set(['b:build']),
+        }
+        self.weights = {'a:build': 10, 'b:build': 5, 'b:test': 5}
+
+    def test_estimates_a_sequential_run(self):
+        executor = ParallelExecutor(workers=1)
+        self.assertEqual(executor.estimate_duration(self.dependencies, self.weights), 20)
+
+    def test_estimates_a_parallel_run(self):
+        executor = ParallelExecutor(workers=2)
+        self.assertEqual(executor.estimate_duration(self.dependencies, self.weights), 10)
+
+    def test_treats_unknown_durations_as_zero(self):
+        executor = ParallelExecutor(workers=2)
+        self.assertEqual(executor.estimate_duration(self.dependencies, {'b:test': 3}), 3)
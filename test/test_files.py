@@ -0,0 +1,73 @@
+from unittest import TestCase, mock
+import os
+import tempfile
+
+from servicer.files import atomic_write, make_ignored_directory
+
+class AtomicWriteTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, '.cache', 'timings.json')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read(self):
+        with open(self.path) as fp:
+            return fp.read()
+
+    def test_creates_the_directory_and_file(self):
+        atomic_write(self.path, '{}')
+
+        self.assertEqual(self.read(), '{}')
+        self.assertEqual(sorted(os.listdir(os.path.dirname(self.path))), ['.gitignore', 'timings.json'])
+
+    def test_writes_binary_data(self):
+        atomic_write(self.path, b'\x80', mode='wb')
+
+        with open(self.path, 'rb') as fp:
+            self.assertEqual(fp.read(), b'\x80')
+
+    def test_keeps_the_old_contents_when_the_write_fails(self):
+        atomic_write(self.path, 'old')
+
+        with mock.patch('servicer.files.os.replace', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                atomic_write(self.path, 'new')
+
+        self.assertEqual(self.read(), 'old')
+        self.assertEqual(sorted(os.listdir(os.path.dirname(self.path))), ['.gitignore', 'timings.json'])
+
+    def test_writers_use_separate_temporary_files(self):
+        temp_paths = []
+        replace = os.replace
+
+        def record_replace(source, destination):
+            temp_paths.append(source)
+            replace(source, destination)
+
+        with mock.patch('servicer.files.os.replace', side_effect=record_replace):
+            atomic_write(self.path, 'one')
+            atomic_write(self.path, 'two')
+
+        self.assertNotEqual(temp_paths[0], temp_paths[1])
+        self.assertEqual(self.read(), 'two')
+
+class MakeIgnoredDirectoryTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_ignores_the_outermost_created_directory(self):
+        make_ignored_directory(os.path.join(self.directory.name, '.cache', 'steps'))
+
+        with open(os.path.join(self.directory.name, '.cache', '.gitignore')) as fp:
+            self.assertEqual(fp.read(), '*\n')
+        self.assertEqual(os.listdir(os.path.join(self.directory.name, '.cache', 'steps')), [])
+
+    def test_leaves_existing_directories_alone(self):
+        make_ignored_directory(self.directory.name)
+
+        self.assertEqual(os.listdir(self.directory.name), [])
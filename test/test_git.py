@@ -0,0 +1,123 @@
+from unittest import TestCase, mock
+
+from servicer.git import Git
+
+class GitTest(TestCase):
+    def setUp(self):
+        self.outputs = {}
+        self.git = Git(logger=mock.Mock())
+        self.git.config = {}
+        self.git.run = mock.Mock(side_effect=lambda command, **kwargs: {'stdout': self.outputs.get(command, ''), 'status': 0})
+
+    def commands(self):
+        return [c[1][0] for c in self.git.run.mock_calls]
+
+class AuthorsForChangesAheadOfRefTest(GitTest):
+    def test_lists_authors_with_a_single_git_log(self):
+        self.outputs['git log --right-only --cherry-pick --no-merges --format=%an main...HEAD'] = 'servicer\nfish\nservicer\n'
+
+        result = self.git.authors_for_changes_ahead_of_ref('main')
+
+        self.assertEqual(result, ['fish', 'servicer'])
+        self.assertEqual(len(self.commands()), 1)
+
+class QueryMemoTest(GitTest):
+    def test_reuses_query_results(self):
+        self.git.list_tags()
+        self.git.list_remote_branches()
+        self.git.list_tags()
+
+        self.assertEqual(self.commands(), ['git for-each-ref --format="%(refname)" refs/tags refs/remotes'])
+
+    def test_clears_results_after_changing_refs(self):
+        self.git.list_tags()
+        self.git.tag('servicer-main-1')
+        self.git.list_tags()
+
+        self.assertEqual(self.commands(), [
+            'git for-each-ref --format="%(refname)" refs/tags refs/remotes',
+            'git tag servicer-main-1',
+            'git for-each-ref --format="%(refname)" refs/tags refs/remotes',
+        ])
+
+class RefsTest(GitTest):
+    def setUp(self):
+        super().setUp()
+        self.outputs['git for-each-ref --format="%(refname)" refs/tags refs/remotes'] = '\n'.join([
+            'refs/remotes/origin/HEAD',
+            'refs/remotes/origin/feature/fish',
+            'refs/remotes/origin/main',
+            'refs/tags/servicer-main-2020-01-01-1',
+            'refs/tags/v1.0.0',
+        ])
+
+    def test_lists_tags(self):
+        self.assertEqual(self.git.list_tags(), ['servicer-main-2020-01-01-1', 'v1.0.0'])
+
+    def test_lists_remote_branches(self):
+        self.assertEqual(self.git.list_remote_branches(), ['origin/HEAD', 'origin/feature/fish', 'origin/main'])
+
+class HeadTest(GitTest):
+    def test_reads_the_branch_and_commits_at_once(self):
+        self.outputs['git log -1 --format="%H%n%h%n%D" --abbrev=10 HEAD'] = 'a1b2c3d4e5f6\na1b2c3d4e5\nHEAD -> feature/fish, origin/feature/fish\n'
+
+        self.assertEqual(self.git.head(min_length=10), {
+            'branch': 'feature/fish',
+            'commit': 'a1b2c3d4e5f6',
+            'commit_short': 'a1b2c3d4e5',
+        })
+
+    def test_reads_a_detached_head(self):
+        self.outputs['git log -1 --format="%H%n%h%n%D" HEAD'] = 'a1b2c3d4e5f6\na1b2c3d\nHEAD, tag: v1.0.0\n'
+
+        self.assertEqual(self.git.current_branch(), 'HEAD')
+        self.assertEqual(self.git.current_commit(), 'a1b2c3d4e5f6')
+        self.assertEqual(len(self.commands()), 1)
+
+class SetConfigTest(GitTest):
+    def test_sets_missing_values_only(self):
+        self.outputs['git config --list'] = 'core.bare=false\nuser.name=fish\n'
+
+        self.git.set_config({'user.name': 'servicer', 'user.email': 'servicer@aol.com'})
+
+        self.assertEqual(self.commands(), [
+            'git config --list',
+            'git config user.email "servicer@aol.com"',
+        ])
+
+    def test_keeps_the_case_of_subsections(self):
+        self.outputs['git config --list'] = 'url.https://github.com/Org/.insteadof=git@github.com:Org/\n'
+
+        self.git.set_config({
+            'url.https://github.com/Org/.insteadOf': 'git@github.com:Org/',
+            'url.https://github.com/org/.insteadOf': 'git@github.com:org/',
+        })
+
+        self.assertEqual(self.commands(), [
+            'git config --list',
+            'git config url.https://github.com/org/.insteadOf "git@github.com:org/"',
+        ])
+
+class DeleteTagTest(GitTest):
+    def test_deletes_tags_in_batches(self):
+        self.git.delete_tag(['a', 'b', 'c'], batch_size=2)
+
+        self.assertEqual(self.commands(), [
+            'git tag -d a b',
+            'git push origin :refs/tags/a :refs/tags/b',
+            'git tag -d c',
+            'git push origin :refs/tags/c',
+        ])
+
+    def test_deletes_all_tags_at_once_by_default(self):
+        self.git.delete_tag(['a', 'b', 'c'])
+
+        self.assertEqual(self.commands(), [
+            'git tag -d a b c',
+            'git push origin :refs/tags/a :refs/tags/b :refs/tags/c',
+        ])
+
+    def test_does_nothing_without_tags(self):
+        self.git.delete_tag([])
+
+        self.assertEqual(self.commands(), [])
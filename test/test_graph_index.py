@@ -0,0 +1,71 @@
+from unittest import TestCase, mock
+import os
+import tempfile
+
+from servicer.graph_index import GraphIndex
+
+class GraphIndexTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.persist_path = os.path.join(self.directory.name, '.cache', 'graph.pickle')
+        self.services = {
+            'api': {'depends_on': 'db', 'steps': {'build': {}, 'deploy': {'depends_on': ['web:build']}}},
+            'web': {'steps': {'build': {}}},
+        }
+        self.compute = mock.Mock(side_effect=lambda service_name, step_name: ['%s-%s' % (service_name, step_name)])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def depends_on(self, graph_index, service_name, step_name):
+        return graph_index.depends_on(service_name, step_name, self.services[service_name], self.compute)
+
+    def saved_index(self, settings=['build', 'deploy']):
+        graph_index = GraphIndex(persist_path=self.persist_path, settings=settings)
+        self.depends_on(graph_index, 'api', 'deploy')
+        self.depends_on(graph_index, 'web', 'build')
+        graph_index.save(self.services)
+        self.compute.reset_mock()
+
+    def test_computes_each_service_step_once(self):
+        graph_index = GraphIndex()
+
+        self.assertEqual(self.depends_on(graph_index, 'api', 'deploy'), ['api-deploy'])
+        self.assertEqual(self.depends_on(graph_index, 'api', 'deploy'), ['api-deploy'])
+
+        self.assertEqual(self.compute.call_count, 1)
+
+    def test_reuses_persisted_dependencies_of_unchanged_services(self):
+        self.saved_index()
+
+        graph_index = GraphIndex(persist_path=self.persist_path, settings=['build', 'deploy'])
+
+        self.assertEqual(self.depends_on(graph_index, 'api', 'deploy'), ['api-deploy'])
+        self.assertEqual(self.depends_on(graph_index, 'web', 'build'), ['web-build'])
+        self.compute.assert_not_called()
+
+    def test_recomputes_only_changed_services(self):
+        self.saved_index()
+        self.services['api']['steps']['deploy']['depends_on'] = ['web:build', 'db:build']
+
+        graph_index = GraphIndex(persist_path=self.persist_path, settings=['build', 'deploy'])
+        self.depends_on(graph_index, 'api', 'deploy')
+        self.depends_on(graph_index, 'web', 'build')
+
+        self.assertEqual(self.compute.mock_calls, [mock.call('api', 'deploy')])
+
+    def test_discards_the_index_when_settings_change(self):
+        self.saved_index()
+
+        graph_index = GraphIndex(persist_path=self.persist_path, settings=['build', 'test', 'deploy'])
+
+        self.assertEqual(graph_index.entries, {})
+
+    def test_drops_removed_services(self):
+        self.saved_index()
+        del self.services['web']
+
+        graph_index = GraphIndex(persist_path=self.persist_path, settings=['build', 'deploy'])
+        graph_index.save(self.services)
+
+        self.assertEqual(list(GraphIndex(persist_path=self.persist_path, settings=['build', 'deploy']).entries), ['api'])
@@ -0,0 +1,93 @@
+from unittest import TestCase
+
+from servicer.parameter_scope import ParameterScope, PathIndex
+from servicer.token_interpolator import TokenInterpolator
+
+class ParameterScopeTest(TestCase):
+    def setUp(self):
+        self.environment = {'BRANCH': 'main', 'PROJECT': 'env-project'}
+        self.config = {'PROJECT': 'config-project', 'services': {'api': {'name': 'api'}}}
+        self.scope = ParameterScope(self.environment, self.config)
+
+    def test_first_mapping_wins(self):
+        self.assertEqual(self.scope['PROJECT'], 'env-project')
+        self.assertEqual(self.scope['services'], {'api': {'name': 'api'}})
+
+    def test_raises_for_missing_keys(self):
+        self.assertFalse('missing' in self.scope)
+        self.assertEqual(self.scope.get('missing'), None)
+        with self.assertRaises(KeyError):
+            self.scope['missing']
+
+    def test_sees_changes_to_underlying_mappings(self):
+        self.environment['VERSION'] = '1.2.3'
+        self.assertEqual(self.scope['VERSION'], '1.2.3')
+
+    def test_iterates_unique_keys(self):
+        self.assertEqual(list(self.scope), ['BRANCH', 'PROJECT', 'services'])
+        self.assertEqual(len(self.scope), 3)
+        self.assertEqual(dict(self.scope), {**self.config, **self.environment})
+
+    def test_pushes_a_scope_without_changing_the_parent(self):
+        child = self.scope.push({'BRANCH': 'feature'})
+
+        self.assertEqual(child['BRANCH'], 'feature')
+        self.assertEqual(child['PROJECT'], 'env-project')
+        self.assertEqual(self.scope['BRANCH'], 'main')
+
+    def test_is_read_only(self):
+        with self.assertRaises(TypeError):
+            self.scope['BRANCH'] = 'feature'
+
+    def test_ignores_none(self):
+        self.assertEqual(dict(ParameterScope(None, {'a': 1})), {'a': 1})
+
+    def test_resolves_tokens(self):
+        token_interpolator = TokenInterpolator()
+
+        result = token_interpolator.replace_tokens('${services.api.name}@${BRANCH}:${PROJECT}', self.scope)
+
+        self.assertEqual(result, 'api@main:env-project')
+
+    def test_resolves_paths_in_the_first_mapping_holding_the_first_key(self):
+        self.assertEqual(self.scope.get_path(('services', 'api', 'name')), 'api')
+        self.assertEqual(self.scope.get_path(('services', 'web'), ignore_missing_key=True), None)
+        with self.assertRaises(KeyError):
+            self.scope.get_path(('missing', 'key'))
+
+class PathIndexTest(TestCase):
+    def setUp(self):
+        self.config = {'services': {'api': {'steps': {'build': {'results': {'image': 'api:1'}}}}}}
+        self.index = PathIndex(self.config)
+
+    def test_caches_found_values(self):
+        path = ('services', 'api', 'steps', 'build', 'results', 'image')
+        self.assertEqual(self.index.get_path(path), 'api:1')
+
+        self.config['services'] = {}
+        self.assertEqual(self.index.get_path(path), 'api:1')
+
+    def test_does_not_cache_misses(self):
+        path = ('services', 'web')
+        self.assertEqual(self.index.get_path(path, ignore_missing_key=True), None)
+
+        self.config['services']['web'] = {'name': 'web'}
+        self.assertEqual(self.index.get_path(path), {'name': 'web'})
+
+    def test_invalidates_paths_below_and_above_a_changed_subtree(self):
+        image = ('services', 'api', 'steps', 'build', 'results', 'image')
+        steps = ('services', 'api', 'steps')
+        self.index.get_path(image)
+        self.index.get_path(steps)
+        self.index.get_path(('services',))
+
+        self.config['services']['api']['steps']['build']['results'] = {'image': 'api:2'}
+        self.index.invalidate(('services', 'api', 'steps', 'build', 'results'))
+
+        self.assertEqual(self.index.values, {})
+        self.assertEqual(self.index.get_path(image), 'api:2')
+
+    def test_behaves_like_its_root(self):
+        self.assertEqual(self.index, self.config)
+        self.assertTrue('services' in self.index)
+        self.assertEqual(ParameterScope({'BRANCH': 'main'}, self.index).get_path(('services', 'api', 'steps', 'build', 'results', 'image')), 'api:1')
@@ -0,0 +1,57 @@
+from unittest import TestCase
+
+from servicer.path_matcher import PathMatcher, literal_prefix, sanitize_regex
+
+class PathMatcherTest(TestCase):
+    def setUp(self):
+        self.path_matcher = PathMatcher()
+        self.path_matcher.add('api', ['services/api/*', 'lib/*'], ['*.md'])
+        self.path_matcher.add('web', ['services/web/*', 'lib/*'])
+        self.path_matcher.add('docs', ['/.*\\.md$/'])
+        self.path_matcher.add('everything')
+
+    def test_matches_owners_watching_a_path(self):
+        self.assertEqual(self.path_matcher.match('services/api/main.py'), set(['api', 'everything']))
+        self.assertEqual(self.path_matcher.match('lib/util.py'), set(['api', 'web', 'everything']))
+        self.assertEqual(self.path_matcher.match('other/file.py'), set(['everything']))
+
+    def test_applies_ignore_paths(self):
+        self.assertEqual(self.path_matcher.match('services/api/README.md'), set(['docs', 'everything']))
+
+    def test_assigns_paths_to_owners(self):
+        result = self.path_matcher.assign(['services/api/main.py', 'services/web/README.md', 'other/file.py'])
+
+        self.assertEqual(result, {
+            'api': ['services/api/main.py'],
+            'web': ['services/web/README.md'],
+            'docs': ['services/web/README.md'],
+            'everything': ['services/api/main.py', 'services/web/README.md', 'other/file.py'],
+        })
+
+    def test_compiles_shared_patterns_once(self):
+        self.assertEqual(len(self.path_matcher.patterns), 5)
+
+    def test_checks_the_rest_of_a_pattern_after_its_prefix(self):
+        path_matcher = PathMatcher()
+        path_matcher.add('api', ['services/api/*.py', 'config?.yaml'])
+
+        self.assertEqual(path_matcher.match('services/api/main.py'), set(['api']))
+        self.assertEqual(path_matcher.match('services/api/main.js'), set())
+        self.assertEqual(path_matcher.match('confi.yaml'), set(['api']))
+
+    def test_matches_unprefixed_patterns_with_groups(self):
+        path_matcher = PathMatcher()
+        path_matcher.add('api', ['/(\\w+)/\\1.py/', '/.*\\.py$/'])
+        path_matcher.add('web', ['/(?i)web/'])
+
+        self.assertEqual(path_matcher.match('api/api.py'), set(['api']))
+        self.assertEqual(path_matcher.match('api/web.js'), set())
+        self.assertEqual(path_matcher.match('WEB/index.js'), set(['web']))
+
+class LiteralPrefixTest(TestCase):
+    def test_finds_literal_prefixes(self):
+        self.assertEqual(literal_prefix(sanitize_regex('services/api/*')), 'services/api/')
+        self.assertEqual(literal_prefix('services/api/main.py'), 'services/api/main')
+        self.assertEqual(literal_prefix('services/apis?/'), 'services/api')
+        self.assertEqual(literal_prefix('api|web'), '')
+        self.assertEqual(literal_prefix('^api'), '')
@@ -0,0 +1,162 @@
+from unittest import TestCase, mock
+import os
+import sys
+import time
+import asyncio
+import subprocess
+import tempfile
+
+from servicer.run import run, run_async, run_all_async, run_until_complete, stream_output_enabled
+
+class RunTest(TestCase):
+    def test_captures_output(self):
+        result = run('printf "one\\ntwo\\n"', hide_output=True)
+
+        self.assertEqual(result['stdout'], 'one\ntwo\n')
+        self.assertEqual(result['status'], 0)
+
+    def test_raises_for_failed_commands(self):
+        with self.assertRaises(subprocess.CalledProcessError):
+            run('exit 3', hide_output=True)
+
+    def test_returns_status_for_unchecked_commands(self):
+        result = run('exit 3', check=False, hide_output=True)
+        self.assertEqual(result['status'], 3)
+
+class RunStreamingTest(TestCase):
+    def test_streams_output(self):
+        with mock.patch('sys.stdout') as mock_stdout:
+            result = run('printf "one\\ntwo\\n"', stream=True)
+
+        mock_stdout.write.assert_any_call('one\n')
+        mock_stdout.write.assert_any_call('two\n')
+        self.assertEqual(result['stdout'], 'one\ntwo\n')
+        self.assertEqual(result['status'], 0)
+        self.assertEqual(result['command_result'].returncode, 0)
+
+    def test_keeps_a_bounded_tail(self):
+        result = run('seq 1 100', stream=True, hide_output=True, tail_lines=3)
+        self.assertEqual(result['stdout'], '98\n99\n100\n')
+
+    def test_tees_the_complete_output(self):
+        with tempfile.TemporaryDirectory() as directory:
+            tee_path = os.path.join(directory, 'output.log')
+            result = run('seq 1 100', stream=True, hide_output=True, tail_lines=1, tee=tee_path)
+
+            with open(tee_path) as fp:
+                self.assertEqual(fp.read().split(), [str(i) for i in range(1, 101)])
+
+        self.assertEqual(result['stdout'], '100\n')
+
+    def test_raises_for_failed_commands(self):
+        with self.assertRaises(subprocess.CalledProcessError) as context:
+            run('echo broken; exit 3', stream=True, hide_output=True)
+
+        self.assertEqual(context.exception.returncode, 3)
+        self.assertEqual(context.exception.output, b'broken\n')
+
+    def test_returns_status_for_unchecked_commands(self):
+        result = run('exit 3', stream=True, check=False, hide_output=True)
+        self.assertEqual(result['status'], 3)
+
+class StreamOutputEnabledTest(TestCase):
+    def test_disabled_by_default(self):
+        with mock.patch.dict('os.environ', {}, clear=True):
+            self.assertFalse(stream_output_enabled())
+
+    def test_enabled_by_environment(self):
+        with mock.patch.dict('os.environ', {'SERVICER_STREAM_OUTPUT': 'true'}):
+            self.assertTrue(stream_output_enabled())
+
+class RunAsyncTest(TestCase):
+    def test_captures_output(self):
+        result = run_until_complete(run_async('printf "one\\ntwo\\n"', hide_output=True))
+
+        self.assertEqual(result['command'], 'printf "one\\ntwo\\n"')
+        self.assertEqual(result['stdout'], 'one\ntwo\n')
+        self.assertEqual(result['status'], 0)
+        self.assertEqual(result['command_result'].returncode, 0)
+
+    def test_runs_without_a_shell(self):
+        result = run_until_complete(run_async(['echo', 'one'], shell=False, hide_output=True))
+        self.assertEqual(result['stdout'], 'one\n')
+
+    def test_raises_for_failed_commands(self):
+        with self.assertRaises(subprocess.CalledProcessError) as context:
+            run_until_complete(run_async('echo broken; exit 3', hide_output=True))
+
+        self.assertEqual(context.exception.returncode, 3)
+        self.assertEqual(context.exception.output, b'broken\n')
+
+    def test_returns_status_for_unchecked_commands(self):
+        result = run_until_complete(run_async('exit 3', check=False, hide_output=True))
+        self.assertEqual(result['status'], 3)
+
+    def test_times_out(self):
+        started = time.time()
+
+        with self.assertRaises(subprocess.TimeoutExpired):
+            run_until_complete(run_async('sleep 10', hide_output=True, timeout=0.2))
+
+        self.assertTrue(time.time() - started < 5)
+
+    def test_runs_commands_concurrently(self):
+        # each command prints the time it started and finished at
+        marker = '%s -c "import time; print(time.time())"' % sys.executable
+        command = '%s; sleep 0.5; %s' % (marker, marker)
+
+        async def run_both():
+            return await asyncio.gather(
+                run_async(command, hide_output=True),
+                run_async(command, hide_output=True),
+            )
+
+        results = run_until_complete(run_both())
+
+        (start_one, end_one), (start_two, end_two) = [[float(t) for t in r['stdout'].split()] for r in results]
+        self.assertTrue(start_one < end_two)
+        self.assertTrue(start_two < end_one)
+
+    def test_kills_cancelled_commands(self):
+        async def cancel():
+            task = asyncio.ensure_future(run_async('sleep 10', hide_output=True))
+            await asyncio.sleep(0.2)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            return task
+
+        started = time.time()
+        task = run_until_complete(cancel())
+
+        self.assertTrue(task.cancelled())
+        self.assertTrue(time.time() - started < 5)
+
+    def test_kills_commands_of_an_interrupted_run(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        pid_path = os.path.join(directory.name, 'pid')
+
+        async def interrupt():
+            asyncio.ensure_future(run_async('echo $$ > %s; sleep 30' % pid_path, hide_output=True))
+            while not os.path.exists(pid_path) or not open(pid_path).read():
+                await asyncio.sleep(0.05)
+            raise KeyboardInterrupt()
+
+        with self.assertRaises(KeyboardInterrupt):
+            run_until_complete(interrupt())
+
+        with self.assertRaises(ProcessLookupError):
+            os.kill(int(open(pid_path).read()), 0)
+
+    def test_runs_all_commands(self):
+        results = run_until_complete(run_all_async(['echo one', 'echo two'], concurrency=2, hide_output=True))
+
+        self.assertEqual([r['stdout'] for r in results], ['one\n', 'two\n'])
+
+    def test_cancels_the_other_commands_when_one_fails(self):
+        started = time.time()
+
+        with self.assertRaises(subprocess.CalledProcessError):
+            run_until_complete(run_all_async(['sleep 10', 'exit 3'], concurrency=2, hide_output=True))
+
+        self.assertTrue(time.time() - started < 5)
@@ -1,8 +1,11 @@
 from unittest import TestCase, mock
 import os
+import json
 from datetime import datetime
 
-from servicer.servicer import Servicer
+from servicer.parameter_scope import PathIndex
+from servicer.git import Git
+from servicer.servicer import Servicer, get_version, tags_with_prefix
 
 class ServicerTest(TestCase):
     def setUp(self):
@@ -12,6 +15,8 @@ class ServicerTest(TestCase):
         self.servicer.logger = mock.Mock()
         self.servicer.token_interpolator = mock.Mock()
         self.servicer.token_interpolator.interpolate_tokens = mock.Mock()
+        self.servicer.config_interpolator = mock.Mock()
+        type(self.servicer.config_interpolator).path_index = mock.PropertyMock(side_effect=lambda: PathIndex(self.servicer.config))
         self.servicer.dependency_grapher = mock.Mock()
 
     def AutoMock(self, **attributes):
@@ -24,6 +29,13 @@ class ServicerClassTest(ServicerTest):
     def test_initialized(self):
         pass
 
+class GetVersionTest(TestCase):
+    def test_reads_the_installed_version(self):
+        with mock.patch('importlib.metadata.version', return_value='1.2.3') as version:
+            self.assertEqual(get_version(), '1.2.3')
+
+        version.assert_called_with('servicer')
+
 class LoadEnvironmentTest(ServicerTest):
     def setUp(self):
         super().setUp()
@@ -43,6 +55,12 @@ class LoadEnvironmentTest(ServicerTest):
         self.assertEqual(os.environ['BUILD_DATETIME'], '1970-01-01 00:00:00')
         self.assertEqual(os.environ['BUILD_DATE'], '1970-01-01')
 
+    def test_stream_output_enabled(self):
+        os.environ['PWD'] = 'project_path'
+        self.args['stream_output'] = True
+        result = self.servicer.load_environment(self.args)
+        self.assertEqual(os.environ['SERVICER_STREAM_OUTPUT'], 'true')
+
     def test_no_env_file_paths(self):
         result = self.servicer.load_environment(self.args)
         self.servicer.load_env_file.assert_not_called()
@@ -205,7 +223,7 @@ class RunServiceStepTest(ServicerTest):
             mock.call(None),
             mock.call(None),
         ])
-        self.servicer.token_interpolator.interpolate_tokens.assert_not_called()
+        self.servicer.config_interpolator.resolve.assert_not_called()
 
     def test_runs_a_service_step_with_config_and_no_module(self):
         self.service.pop('module')
@@ -219,7 +237,7 @@ class RunServiceStepTest(ServicerTest):
             mock.call(None),
             mock.call(None),
         ])
-        self.servicer.token_interpolator.interpolate_tokens.assert_called_with({}, self.servicer.config)
+        self.servicer.config_interpolator.resolve.assert_called_with({}, self.servicer.config)
         self.assertEqual(self.service['steps']['build']['results'], 'service-step results')
 
     def test_runs_a_service_step_with_module_and_no_config(self):
@@ -231,7 +249,7 @@ class RunServiceStepTest(ServicerTest):
             mock.call(None),
             mock.call(None),
         ])
-        self.servicer.token_interpolator.interpolate_tokens.assert_not_called()
+        self.servicer.config_interpolator.resolve.assert_not_called()
 
     def test_runs_a_service_step_with_module_and_config(self):
         os.environ = {}
@@ -241,10 +259,11 @@ class RunServiceStepTest(ServicerTest):
             mock.call(None),
             mock.call(None),
         ])
-        self.servicer.token_interpolator.interpolate_tokens.assert_called_with({}, self.servicer.config)
+        self.servicer.config_interpolator.resolve.assert_called_with({}, self.servicer.config)
 
         self.assertTrue('git' not in self.service['steps']['build']['config'])
         self.assertEqual(self.service['steps']['build']['results'], 'service-step results')
+        self.servicer.config_interpolator.invalidate.assert_called_with(self.service['steps']['build'], 'results')
 
     def test_runs_a_service_step_with_git_integration(self):
         self.servicer.config['git'] = {'enabled': True}
@@ -257,7 +276,7 @@ class RunServiceStepTest(ServicerTest):
             mock.call(None),
             mock.call(None),
         ])
-        self.servicer.token_interpolator.interpolate_tokens.assert_called_with({'git': {'module': {}}}, self.servicer.config)
+        self.servicer.config_interpolator.resolve.assert_called_with({'git': {'module': {}}}, self.servicer.config)
 
         self.assertEqual(self.service['steps']['build']['config']['git'], {'module': {}})
         self.assertEqual(self.service['steps']['build']['results'], 'service-step results')
@@ -279,6 +298,491 @@ class RunServiceStepTest(ServicerTest):
             mock.call(['cowsay moo', 'yes | lolcat']),
         ])
 
+    def test_does_not_load_a_module_for_a_service_step_without_config(self):
+        self.service.pop('module')
+        self.service['steps']['build'].pop('config')
+        self.service['steps']['build']['commands'] = ['make']
+
+        self.servicer.run_service_step(self.service, self.service['steps']['build'])
+
+        self.servicer.load_service_module.assert_not_called()
+        self.servicer.run_commands.assert_any_call(['make'])
+
+    def test_initializes_providers_once_per_service(self):
+        self.servicer.try_initialize_provider = mock.Mock()
+        self.service['provider'] = 'gcloud'
+        self.service['providers'] = ['sonarqube']
+        self.service['steps']['test'] = {}
+        os.environ = {}
+
+        self.servicer.run_service_step(self.service, self.service['steps']['build'])
+        self.servicer.run_service_step(self.service, self.service['steps']['test'])
+
+        self.assertEqual(self.servicer.try_initialize_provider.mock_calls, [
+            mock.call('gcloud', self.service),
+            mock.call('sonarqube', self.service),
+        ])
+
+class RunServiceStepsTest(ServicerTest):
+    def setUp(self):
+        super().setUp()
+
+        self.servicer.config = {
+            'args': {},
+            'services': {},
+        }
+        self.servicer.service_step_order = [
+            ['service_1:build', 'service_2:build'],
+            ['service_1:test'],
+        ]
+        self.servicer.execute_service_step = mock.Mock()
+        self.servicer.tag_build = mock.Mock()
+
+    def test_runs_service_steps_in_order(self):
+        self.servicer.run_service_steps()
+
+        self.assertEqual(self.servicer.execute_service_step.mock_calls, [
+            mock.call('service_1:build'),
+            mock.call('service_2:build'),
+            mock.call('service_1:test'),
+        ])
+        self.servicer.tag_build.assert_called_with()
+
+    def test_runs_service_steps_in_parallel(self):
+        self.servicer.config['args']['parallel'] = 2
+        self.servicer.dependency_grapher.dependencies = {
+            'service_1:build': set(),
+            'service_2:build': set(),
+            'service_1:test': set(['service_1:build']),
+        }
+
+        with mock.patch('servicer.servicer.ParallelExecutor') as mock_executor:
+            self.servicer.run_service_steps()
+
+            mock_executor.assert_called_with(workers=2, logger=self.servicer.logger)
+            mock_executor.return_value.run_graph.assert_called_with(
+                self.servicer.dependency_grapher.dependencies,
+                self.servicer.execute_service_step,
+                weights=None,
+            )
+
+        self.servicer.execute_service_step.assert_not_called()
+
+    def test_runs_service_step_layers_in_parallel(self):
+        self.servicer.config['args']['parallel'] = 2
+        self.servicer.config['args']['scheduler'] = 'layers'
+
+        with mock.patch('servicer.servicer.ParallelExecutor') as mock_executor:
+            self.servicer.run_service_steps()
+
+            mock_executor.assert_called_with(workers=2, logger=self.servicer.logger)
+            mock_executor.return_value.run_layers.assert_called_with(
+                self.servicer.service_step_order,
+                self.servicer.execute_service_step,
+            )
+
+        self.servicer.execute_service_step.assert_not_called()
+
+    def test_schedules_with_recorded_timings(self):
+        self.servicer.config['args']['parallel'] = 2
+        self.servicer.dependency_grapher.dependencies = {'service_1:build': set()}
+        self.servicer.timing_store = mock.Mock()
+        self.servicer.timing_store.estimates.return_value = {'service_1:build': 30}
+
+        with mock.patch('servicer.servicer.ParallelExecutor') as mock_executor:
+            self.servicer.run_service_steps()
+
+            mock_executor.return_value.run_graph.assert_called_with(
+                self.servicer.dependency_grapher.dependencies,
+                self.servicer.execute_service_step,
+                weights={'service_1:build': 30},
+            )
+
+        self.servicer.timing_store.save.assert_called_with()
+
+    def test_saves_timings_when_a_service_step_fails(self):
+        self.servicer.timing_store = mock.Mock()
+        self.servicer.execute_service_step.side_effect = ValueError('build failed')
+
+        with self.assertRaises(ValueError):
+            self.servicer.run_service_steps()
+
+        self.servicer.timing_store.save.assert_called_with()
+        self.servicer.tag_build.assert_not_called()
+
+    def test_logs_an_estimated_duration_for_dry_runs(self):
+        self.servicer.config['args']['dry'] = True
+        self.servicer.timing_store = mock.Mock()
+        self.servicer.timing_store.estimates.return_value = {'service_1:build': 30, 'service_2:build': 45}
+
+        self.servicer.run_service_steps()
+
+        self.servicer.logger.log.assert_any_call('estimated duration: 1m15s')
+        self.servicer.logger.log.assert_any_call('no recorded duration for: service_1:test')
+        self.servicer.timing_store.save.assert_not_called()
+
+    def test_skips_the_estimate_without_recorded_timings(self):
+        self.servicer.config['args']['dry'] = True
+        self.servicer.timing_store = mock.Mock()
+        self.servicer.timing_store.estimates.return_value = {}
+
+        self.servicer.run_service_steps()
+
+        self.servicer.logger.log.assert_any_call('no recorded timings to estimate the duration from')
+        self.assertNotIn(mock.call('estimated duration: 0.0s'), self.servicer.logger.log.mock_calls)
+
+class ExecuteServiceStepTest(ServicerTest):
+    def setUp(self):
+        super().setUp()
+
+        self.servicer.config = {
+            'args': {},
+            'services': {
+                'service_1': {'steps': {'build': {}}},
+            },
+        }
+        self.servicer.steps = {'build': {}}
+        self.servicer.service_environment = None
+        self.servicer.run_service_step = mock.Mock()
+        self.servicer.timing_store = mock.Mock()
+        os.environ = {'COMMIT': 'abc123'}
+
+    def test_records_a_successful_service_step(self):
+        self.servicer.execute_service_step('service_1:build')
+
+        self.servicer.run_service_step.assert_called_with(
+            self.servicer.config['services']['service_1'],
+            self.servicer.config['services']['service_1']['steps']['build'],
+        )
+        self.servicer.timing_store.record.assert_called_with('service_1:build', mock.ANY, status=0, commit='abc123')
+
+    def test_records_a_failed_service_step(self):
+        self.servicer.run_service_step.side_effect = ValueError('build failed')
+
+        with self.assertRaises(ValueError):
+            self.servicer.execute_service_step('service_1:build')
+
+        self.servicer.timing_store.record.assert_called_with('service_1:build', mock.ANY, status=1, commit='abc123')
+
+    def test_does_not_record_dry_runs(self):
+        self.servicer.config['args']['dry'] = True
+
+        self.servicer.execute_service_step('service_1:build')
+
+        self.servicer.timing_store.record.assert_not_called()
+
+    def test_skips_service_steps_outside_their_service_environment(self):
+        self.servicer.config['services']['service_1']['service_environment'] = 'production'
+
+        self.servicer.execute_service_step('service_1:build')
+
+        self.servicer.run_service_step.assert_not_called()
+        self.servicer.timing_store.record.assert_not_called()
+
+class StepCacheTest(ServicerTest):
+    def setUp(self):
+        super().setUp()
+
+        self.servicer.version = '1.0.0'
+        self.servicer.config = {
+            'args': {},
+            'cache': {'steps': ['build']},
+            'services': {
+                'service_1': {
+                    'git': {'watch_paths': ['service_1/*'], 'ignore_paths': ['*.md']},
+                    'steps': {
+                        'build': {
+                            'commands': [{'command': 'cat VERSION', 'env_var': 'VERSION'}],
+                        },
+                        'deploy': {},
+                    },
+                },
+            },
+        }
+        self.servicer.steps = {'build': {}, 'deploy': {}}
+        self.servicer.service_environment = None
+        self.servicer.step_cache = mock.Mock()
+        self.servicer.step_cache.key.return_value = 'abc'
+        self.servicer.step_cache.get.return_value = None
+        self.servicer.project_file_list = ['service_1/main.py', 'service_1/README.md', 'service_2/main.py']
+        self.servicer.run_service_step = mock.Mock()
+        self.service = self.servicer.config['services']['service_1']
+        os.environ = {}
+
+    def test_hashes_watched_files(self):
+        result = self.servicer.step_cache_key('service_1:build', self.service, self.service['steps']['build'])
+
+        self.assertEqual(result, 'abc')
+        self.servicer.step_cache.key.assert_called_with({
+            'version': '1.0.0',
+            'service_step': 'service_1:build',
+            'config': None,
+            'commands': [{'command': 'cat VERSION', 'env_var': 'VERSION'}],
+            'post_commands': None,
+        }, files=['service_1/main.py'])
+
+    def test_does_not_cache_other_steps(self):
+        result = self.servicer.step_cache_key('service_1:deploy', self.service, self.service['steps']['deploy'])
+        self.assertEqual(result, None)
+
+    def test_does_not_cache_services_without_watch_paths(self):
+        self.service.pop('git')
+        result = self.servicer.step_cache_key('service_1:build', self.service, self.service['steps']['build'])
+        self.assertEqual(result, None)
+
+    def test_does_not_cache_dry_runs(self):
+        self.servicer.config['args']['dry'] = True
+        result = self.servicer.step_cache_key('service_1:build', self.service, self.service['steps']['build'])
+        self.assertEqual(result, None)
+
+    def test_stores_results_after_a_cache_miss(self):
+        def run_service_step(service, service_step):
+            service_step['results'] = {'version': '1.2.3'}
+            os.environ['VERSION'] = '1.2.3'
+
+        self.servicer.run_service_step.side_effect = run_service_step
+
+        self.servicer.execute_service_step('service_1:build')
+
+        self.servicer.step_cache.put.assert_called_with('abc', {
+            'results': {'version': '1.2.3'},
+            'environment': {'VERSION': '1.2.3'},
+        })
+
+    def test_replays_results_after_a_cache_hit(self):
+        self.servicer.step_cache.get.return_value = {
+            'results': {'version': '1.2.3'},
+            'environment': {'VERSION': '1.2.3'},
+        }
+
+        self.servicer.execute_service_step('service_1:build')
+
+        self.servicer.run_service_step.assert_not_called()
+        self.servicer.step_cache.put.assert_not_called()
+        self.assertEqual(self.service['steps']['build']['results'], {'version': '1.2.3'})
+        self.assertEqual(os.environ['VERSION'], '1.2.3')
+
+class CompileConfigTest(ServicerTest):
+    def setUp(self):
+        super().setUp()
+
+        self.servicer.config_loader = mock.Mock()
+        self.servicer.config = {
+            'args': {},
+            'graph': {'implicit-step-dependencies': True},
+            'steps': [{'name': 'build'}, {'name': 'test'}],
+            'services': {
+                'api': {'steps': {'build': {}, 'test': {}}},
+                'web': {'depends_on': 'api', 'steps': {'build': {}}},
+            },
+        }
+
+    def test_compiles_the_direct_dependencies_of_each_service_step(self):
+        self.servicer.compile_config()
+
+        self.servicer.config_loader.write_snapshot.assert_called_with(self.servicer.config, graph={
+            'api:build': [],
+            'api:test': ['api:build'],
+            'web:build': ['api:build'],
+        })
+
+    def test_leaves_out_dependencies_containing_tokens(self):
+        self.servicer.config['services']['web']['steps']['build']['depends_on'] = '${UPSTREAM}:build'
+
+        self.servicer.compile_config()
+
+        self.servicer.config_loader.write_snapshot.assert_called_with(self.servicer.config, graph=None)
+
+class RemoveStaleTagsTest(ServicerTest):
+    def setUp(self):
+        super().setUp()
+
+        self.servicer.config = {'git': {'tag-delete-batch-size': 100}}
+        self.servicer.git = mock.Mock()
+        self.servicer.git.sanitize_tag.side_effect = lambda tag: tag
+        self.servicer.git.list_tags.return_value = [
+            'servicer-main-2020-01-02-2',
+            'servicer-main-2020-01-01-1',
+            'servicer-gone-2020-01-01-1',
+            'servicer-feature-2020-01-01-1',
+            'v1.0.0',
+        ]
+        self.servicer.git.list_remote_branches.return_value = ['origin/HEAD', 'origin/main', 'origin/feature']
+        os.environ = {'BRANCH': 'main'}
+
+    def test_deletes_stale_tags_at_once(self):
+        self.servicer.remove_stale_tags()
+
+        self.servicer.git.delete_tag.assert_called_once_with([
+            'servicer-gone-2020-01-01-1',
+            'servicer-main-2020-01-01-1',
+            'servicer-main-2020-01-02-2',
+        ], batch_size=100)
+
+    def test_deletes_nothing_without_stale_tags(self):
+        self.servicer.git.list_tags.return_value = ['servicer-feature-2020-01-01-1']
+
+        self.servicer.remove_stale_tags()
+
+        self.servicer.git.delete_tag.assert_not_called()
+
+    def test_tagging_a_build_sees_refs_created_during_the_build(self):
+        self.servicer.git = Git(logger=mock.Mock())
+        self.servicer.git.run = mock.Mock(return_value={'stdout': '', 'status': 0})
+        self.servicer.servicer_git_tag = mock.Mock(return_value=None)
+        refs_command = 'git for-each-ref --format="%(refname)" refs/tags refs/remotes'
+
+        # queried while initializing git, before steps create tags
+        self.servicer.git.list_tags()
+        self.servicer.tag_build(check_git=False)
+
+        self.assertEqual([c[1][0] for c in self.servicer.git.run.mock_calls].count(refs_command), 2)
+
+class TagsWithPrefixTest(TestCase):
+    def test_finds_tags_starting_with_a_prefix(self):
+        tags = sorted(['servicer-main-1', 'servicer-main-2', 'servicer-mainline-1', 'servicer-feature-1'])
+
+        self.assertEqual(tags_with_prefix(tags, 'servicer-main-'), ['servicer-main-1', 'servicer-main-2'])
+        self.assertEqual(tags_with_prefix(tags, 'servicer-main'), ['servicer-main-1', 'servicer-main-2', 'servicer-mainline-1'])
+        self.assertEqual(tags_with_prefix(tags, 'servicer-zzz'), [])
+
+class IgnoreUnchangedServicesTest(ServicerTest):
+    def setUp(self):
+        super().setUp()
+
+        self.servicer.config = {
+            'args': {},
+            'git': {'enabled': True, 'ignore-unchanged': True, 'diff-ref': 'main', 'ignore_paths': ['*.txt']},
+            'services': {
+                'service_1': {'git': {'watch_paths': ['service_1/*'], 'ignore_paths': ['*.md']}},
+                'service_2': {'git': {'watch_paths': ['service_2/*', 'lib/*']}},
+                'service_3': {'git': {}},
+                'service_4': {},
+            },
+        }
+        self.servicer.git = mock.Mock()
+        self.services = ['service_1', 'service_2', 'service_3', 'service_4']
+
+    def test_ignores_services_without_changed_files(self):
+        self.servicer.git.diff.return_value = ['service_1/README.md', 'lib/util.py']
+
+        self.servicer.ignore_unchanged_services(self.services)
+
+        self.assertEqual(self.services, ['service_2', 'service_3', 'service_4'])
+
+    def test_applies_top_level_ignore_paths(self):
+        self.servicer.git.diff.return_value = ['service_2/notes.txt']
+
+        self.servicer.ignore_unchanged_services(self.services)
+
+        self.assertEqual(self.services, ['service_4'])
+
+class PropagateChangesTest(ServicerTest):
+    def setUp(self):
+        super().setUp()
+
+        self.servicer.config_loader = mock.Mock(compiled_graph=None)
+        self.servicer.config = {
+            'args': {'ignore_dependencies': False},
+            'git': {'enabled': True, 'ignore-unchanged': True, 'diff-ref': 'main', 'propagate-changes': True},
+            'graph': {'implicit-step-dependencies': True},
+            'services': {
+                'api': {'git': {'watch_paths': ['api/*']}, 'steps': {'build': {}, 'deploy': {}}},
+                'web': {'git': {'watch_paths': ['web/*']}, 'steps': {'build': {}, 'deploy': {'depends_on': 'api'}}},
+                'worker': {'git': {'watch_paths': ['worker/*']}, 'depends_on': 'web', 'steps': {'build': {}}},
+                'docs': {'git': {'watch_paths': ['docs/*']}, 'steps': {'build': {}}},
+            },
+        }
+        self.servicer.steps = {'build': {}, 'deploy': {}}
+        self.servicer.step_order = ['build', 'deploy']
+        self.servicer.active_steps = ['build', 'deploy']
+        self.servicer.git = mock.Mock()
+        self.servicer.git.diff.return_value = ['api/main.py']
+        self.services = ['api', 'web', 'worker', 'docs']
+
+    def test_keeps_services_depending_on_changed_services(self):
+        self.servicer.ignore_unchanged_services(self.services)
+
+        self.assertEqual(self.services, ['api', 'web', 'worker'])
+
+    def test_detects_changes_in_inactive_upstream_services(self):
+        services = ['web', 'docs']
+
+        self.servicer.ignore_unchanged_services(services)
+
+        self.assertEqual(services, ['web'])
+        self.assertEqual(self.servicer.git.diff.call_count, 1)
+
+    def test_ignores_services_whose_upstream_services_are_unchanged(self):
+        self.servicer.git.diff.return_value = ['docs/index.md']
+        services = ['worker']
+
+        self.servicer.ignore_unchanged_services(services)
+
+        self.assertEqual(services, [])
+
+    def test_is_opt_in(self):
+        self.servicer.config['git']['propagate-changes'] = False
+
+        self.servicer.ignore_unchanged_services(self.services)
+
+        self.assertEqual(self.services, ['api'])
+
+class PrintAffectedServicesTest(ServicerTest):
+    def setUp(self):
+        super().setUp()
+
+        self.servicer.config_loader = mock.Mock(compiled_graph=None)
+        self.servicer.config = {
+            'args': {'ignore_dependencies': False},
+            'git': {'enabled': True, 'ignore-unchanged': True, 'diff-ref': 'main'},
+            'graph': {'implicit-step-dependencies': True},
+            'steps': [{'name': 'build'}, {'name': 'deploy'}],
+            'services': {
+                'api': {'git': {'watch_paths': ['api/*']}, 'steps': {'build': {}, 'deploy': {}}},
+                'web': {'git': {'watch_paths': ['web/*']}, 'steps': {'build': {}, 'deploy': {'depends_on': 'api'}}},
+                'worker': {'git': {'watch_paths': ['worker/*']}, 'depends_on': 'web', 'steps': {'build': {}}},
+                'docs': {'git': {'watch_paths': ['docs/*']}, 'steps': {'build': {}}},
+            },
+        }
+        self.servicer.git = mock.Mock()
+        self.servicer.output = mock.Mock()
+
+    def printed(self):
+        return json.loads(self.servicer.output.write.call_args[0][0])
+
+    def test_prints_changed_services_and_their_dependents(self):
+        self.servicer.git.diff.return_value = ['api/main.py']
+
+        self.servicer.print_affected_services()
+
+        self.assertEqual(self.printed(), {
+            'diff_ref': 'main',
+            'change_detection': True,
+            'skip_build': False,
+            'changed': ['api'],
+            'affected': ['api', 'web', 'worker'],
+        })
+
+    def test_every_service_is_affected_without_change_detection(self):
+        self.servicer.config['args']['no_ignore_unchanged'] = True
+
+        self.servicer.print_affected_services()
+
+        self.assertEqual(self.printed()['affected'], ['api', 'web', 'worker', 'docs'])
+        self.servicer.git.diff.assert_not_called()
+
+    def test_no_service_is_affected_when_the_build_is_skipped(self):
+        self.servicer.print_affected_services(skip_build=True)
+
+        self.assertEqual(self.printed()['affected'], [])
+
+class MatchRegexesTest(ServicerTest):
+    def test_splits_matches_and_unmatches_once_per_string(self):
+        result = self.servicer.match_regexes(['a/1', 'b/2', 'c/3'], ['a/.*', 'b/.*'])
+
+        self.assertEqual(result, (['a/1', 'b/2'], ['c/3']))
+
 class BlobRegexMatchTest(ServicerTest):
     def test_matches_same_words(self):
         result = self.servicer.glob_regex_match('pen', 'pen')
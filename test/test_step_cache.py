@@ -0,0 +1,83 @@
+from unittest import TestCase, mock
+import os
+import tempfile
+
+from servicer.step_cache import StepCache, walk_files
+
+class StepCacheTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.backend = mock.Mock()
+        self.step_cache = StepCache(self.backend, logger=mock.Mock())
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_file(self, name, contents):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as fp:
+            fp.write(contents)
+        return path
+
+class KeyTest(StepCacheTest):
+    def test_same_inputs_produce_the_same_key(self):
+        a = self.step_cache.key({'commands': ['make'], 'config': {'a': 1, 'b': 2}})
+        b = self.step_cache.key({'config': {'b': 2, 'a': 1}, 'commands': ['make']})
+        self.assertEqual(a, b)
+
+    def test_different_inputs_produce_different_keys(self):
+        a = self.step_cache.key({'commands': ['make']})
+        b = self.step_cache.key({'commands': ['make test']})
+        self.assertNotEqual(a, b)
+
+    def test_file_contents_change_the_key(self):
+        path = self.write_file('main.py', 'print(1)')
+        a = self.step_cache.key({}, files=[path])
+
+        self.write_file('main.py', 'print(2)')
+        self.step_cache.file_digests = {}
+        b = self.step_cache.key({}, files=[path])
+
+        self.assertNotEqual(a, b)
+
+    def test_file_order_does_not_change_the_key(self):
+        one = self.write_file('one.py', '1')
+        two = self.write_file('two.py', '2')
+
+        self.assertEqual(self.step_cache.key({}, files=[one, two]), self.step_cache.key({}, files=[two, one]))
+
+    def test_missing_files_are_hashed(self):
+        key = self.step_cache.key({}, files=[os.path.join(self.directory.name, 'deleted.py')])
+        self.assertEqual(len(key), 64)
+
+class GetPutTest(StepCacheTest):
+    def test_reads_from_the_backend(self):
+        self.backend.get.return_value = {'results': None}
+
+        self.assertEqual(self.step_cache.get('abc'), {'results': None})
+        self.backend.get.assert_called_with('abc')
+
+    def test_writes_to_the_backend(self):
+        self.step_cache.put('abc', {'results': {'version': '1.2.3'}})
+
+        self.backend.put.assert_called_with('abc', {
+            'results': {'version': '1.2.3'},
+            'created_at': mock.ANY,
+        })
+
+class WalkFilesTest(StepCacheTest):
+    def test_lists_files_outside_git_directories(self):
+        os.makedirs(os.path.join(self.directory.name, '.git'))
+        os.makedirs(os.path.join(self.directory.name, 'src'))
+        self.write_file('.git/HEAD', 'ref')
+        self.write_file('src/main.py', '')
+        self.write_file('README.md', '')
+
+        self.assertEqual(sorted(walk_files(self.directory.name)), ['README.md', os.path.join('src', 'main.py')])
+
+    def test_skips_the_servicer_cache(self):
+        os.makedirs(os.path.join(self.directory.name, '.servicer', '.cache'))
+        self.write_file('.servicer/.cache/timings.json', '{}')
+        self.write_file('.servicer/services.yaml', '')
+
+        self.assertEqual(walk_files(self.directory.name), [os.path.join('.servicer', 'services.yaml')])
@@ -0,0 +1,100 @@
+from unittest import TestCase, mock
+import os
+import json
+import tempfile
+
+from servicer.timings import TimingStore, format_duration
+
+class TimingStoreTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, '.servicer', '.cache', 'timings.json')
+        self.timing_store = TimingStore(self.path, history=3, logger=mock.Mock())
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+class LoadTest(TimingStoreTest):
+    def test_missing_file(self):
+        self.timing_store.load()
+        self.assertEqual(self.timing_store.service_steps, {})
+
+    def test_unreadable_file(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'w') as fp:
+            fp.write('{not json')
+
+        self.timing_store.load()
+
+        self.assertEqual(self.timing_store.service_steps, {})
+        self.timing_store.logger.log.assert_called_with('ignoring unreadable timings file: %s' % self.path, level='warn')
+
+    def test_round_trip(self):
+        self.timing_store.record('service_1:build', 12.5, status=0, commit='abc123')
+        self.timing_store.save()
+
+        timing_store = TimingStore(self.path, logger=mock.Mock())
+        timing_store.load()
+
+        runs = timing_store.service_steps['service_1:build']
+        self.assertEqual(len(runs), 1)
+        self.assertEqual(runs[0]['duration'], 12.5)
+        self.assertEqual(runs[0]['status'], 0)
+        self.assertEqual(runs[0]['commit'], 'abc123')
+
+        with open(self.path) as fp:
+            self.assertTrue('service_steps' in json.load(fp))
+
+    def test_failing_to_save_is_logged(self):
+        with mock.patch('servicer.timings.atomic_write', side_effect=OSError('read-only file system')):
+            self.timing_store.save()
+
+        self.timing_store.logger.log.assert_called_with('unable to save timings file (%s): read-only file system' % self.path, level='warn')
+
+class RecordTest(TimingStoreTest):
+    def test_keeps_limited_history(self):
+        for duration in [1, 2, 3, 4, 5]:
+            self.timing_store.record('service_1:build', duration)
+
+        durations = [r['duration'] for r in self.timing_store.service_steps['service_1:build']]
+        self.assertEqual(durations, [3, 4, 5])
+
+class EstimateTest(TimingStoreTest):
+    def test_no_history(self):
+        self.assertEqual(self.timing_store.estimate('service_1:build'), None)
+
+    def test_averages_successful_runs(self):
+        self.timing_store.record('service_1:build', 10, status=0)
+        self.timing_store.record('service_1:build', 1, status=1)
+        self.timing_store.record('service_1:build', 20, status=0)
+
+        self.assertEqual(self.timing_store.estimate('service_1:build'), 15)
+
+    def test_estimates_skip_unknown_service_steps(self):
+        self.timing_store.record('service_1:build', 10)
+
+        result = self.timing_store.estimates(['service_1:build', 'service_2:build'])
+
+        self.assertEqual(result, {'service_1:build': 10})
+
+class ReportTest(TimingStoreTest):
+    def test_reports_each_service_step(self):
+        self.timing_store.record('service_2:build', 90, status=1, commit='abc123')
+        self.timing_store.record('service_1:build', 10)
+
+        lines = self.timing_store.report()
+
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[1].startswith('service_1:build'))
+        self.assertTrue(lines[2].startswith('service_2:build'))
+        self.assertTrue('abc123' in lines[2])
+
+class FormatDurationTest(TestCase):
+    def test_seconds(self):
+        self.assertEqual(format_duration(5.25), '5.2s')
+
+    def test_minutes(self):
+        self.assertEqual(format_duration(125), '2m05s')
+
+    def test_hours(self):
+        self.assertEqual(format_duration(3725), '1h02m05s')
@@ -1,6 +1,7 @@
 from unittest import TestCase, mock
 
-from servicer.token_interpolator import TokenInterpolator
+from servicer.parameter_scope import ParameterScope, PathIndex
+from servicer.token_interpolator import TokenInterpolator, compile_template, compile_path
 
 class TokenInterpolatorTest(TestCase):
     def setUp(self):
@@ -220,6 +221,48 @@ class ReplaceTokensTest(TokenInterpolatorTest):
         ])
         self.assertEqual(result, ['red', 'blue'])
 
+    def test_keeps_surrounding_text(self):
+        self.token_interpolator.evaluate_token.side_effect = [
+            'red',
+            None,
+        ]
+
+        result = self.token_interpolator.replace_tokens('a ${ONE} b ${TWO} c', {})
+
+        self.assertEqual(result, 'a red b ${TWO} c')
+
+    def test_does_not_treat_values_as_patterns(self):
+        self.token_interpolator.evaluate_token.return_value = 'C:\\new\\$1'
+
+        result = self.token_interpolator.replace_tokens('${ONE.TWO[0]}', {})
+
+        self.assertEqual(result, 'C:\\new\\$1')
+
+class CompileTemplateTest(TestCase):
+    def test_splits_literals_and_tokens(self):
+        template = compile_template('docker build ${IMAGE}:${TAG:"latest"} .')
+
+        self.assertEqual(template.segments, (
+            ('docker build ', False),
+            ('${IMAGE}', True),
+            (':', False),
+            ('${TAG:"latest"}', True),
+            (' .', False),
+        ))
+        self.assertEqual(template.tokens, ('${IMAGE}', '${TAG:"latest"}'))
+
+    def test_handles_strings_without_tokens(self):
+        self.assertEqual(compile_template('foo').tokens, ())
+        self.assertEqual(compile_template('').segments, ())
+
+    def test_caches_compiled_templates(self):
+        self.assertIs(compile_template('${ONE} ${TWO}'), compile_template('${ONE} ${TWO}'))
+
+class CompilePathTest(TestCase):
+    def test_splits_and_caches_dotted_paths(self):
+        self.assertEqual(compile_path('services.api.steps'), ('services', 'api', 'steps'))
+        self.assertIs(compile_path('services.api.steps'), compile_path('services.api.steps'))
+
 class EvaluateTokenTest(TokenInterpolatorTest):
     def setUp(self):
         super().setUp()
@@ -298,7 +341,7 @@ class EvaluateValueTest(TokenInterpolatorTest):
         result = self.token_interpolator.evaluate_value('tacos', {})
 
         self.token_interpolator.dict_get_path.assert_called_with(
-            path=['tacos'],
+            path=('tacos',),
             _dict={},
             ignore_missing_key=True,
         )
@@ -322,7 +365,7 @@ class EvaluateValueTest(TokenInterpolatorTest):
         result = self.token_interpolator.evaluate_value('crunchy.supreme.doritos', params)
 
         self.token_interpolator.dict_get_path.assert_called_with(
-            path=['crunchy', 'supreme', 'doritos'],
+            path=('crunchy', 'supreme', 'doritos'),
             _dict=params,
             ignore_missing_key=True,
         )
@@ -332,7 +375,7 @@ class EvaluateValueTest(TokenInterpolatorTest):
         result = self.token_interpolator.evaluate_value('crunchy.supreme.doritos', {})
 
         self.token_interpolator.dict_get_path.assert_called_with(
-            path=['crunchy', 'supreme', 'doritos'],
+            path=('crunchy', 'supreme', 'doritos'),
             _dict={},
             ignore_missing_key=True,
         )
@@ -383,8 +426,6 @@ class DictGetPathTest(TokenInterpolatorTest):
 
         self.assertEqual(self.token_interpolator.dict_get_path.mock_calls, [
             mock.call(path=['terrifying', 'beautiful', 'powerful'], _dict=_dict),
-            mock.call(path=['beautiful', 'powerful'], _dict=_dict['terrifying'], ignore_missing_key=False),
-            mock.call(path=['powerful'], _dict=_dict['terrifying']['beautiful'], ignore_missing_key=False),
         ])
         self.assertEqual(result, 'grey prince zote')
 
@@ -415,6 +456,15 @@ class DictGetPathTest(TokenInterpolatorTest):
 
         self.assertEqual(self.token_interpolator.dict_get_path.mock_calls, [
             mock.call(path=['terrifying', 'awful', 'powerful'], _dict=_dict, ignore_missing_key=True),
-            mock.call(path=['awful', 'powerful'], _dict=_dict['terrifying'], ignore_missing_key=True),
         ])
         self.assertEqual(result, None)
+
+    def test_resolves_through_parameter_scopes(self):
+        config = PathIndex({'terrifying': {'beautiful': 'grey prince zote'}})
+        params = ParameterScope({'terrifying': 'env'}, config, {'nailsmith': {'nail': 'pure'}})
+
+        self.assertEqual(self.token_interpolator.dict_get_path(path=('terrifying',), _dict=params), 'env')
+        self.assertEqual(self.token_interpolator.dict_get_path(path=('nailsmith', 'nail'), _dict=params), 'pure')
+        self.assertEqual(self.token_interpolator.dict_get_path(path=('beautiful',), _dict=params, ignore_missing_key=True), None)
+        self.assertEqual(self.token_interpolator.dict_get_path(path=('terrifying', 'beautiful'), _dict=ParameterScope(config)), 'grey prince zote')
+        self.assertEqual(config.values, {('terrifying', 'beautiful'): 'grey prince zote'})
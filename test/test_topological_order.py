@@ -0,0 +1,44 @@
+from unittest import TestCase
+
+from servicer.topological_order import toposort2, CyclicDependencyError
+
+class Toposort2Test(TestCase):
+    def test_orders_dependencies_into_sorted_layers(self):
+        data = {
+            'api:deploy': set(['api:test', 'db:deploy']),
+            'api:test': set(['api:build']),
+            'api:build': set(),
+            'web:build': set(),
+            'db:deploy': set(),
+        }
+
+        self.assertEqual(toposort2(data), [
+            ['api:build', 'db:deploy', 'web:build'],
+            ['api:test'],
+            ['api:deploy'],
+        ])
+
+    def test_returns_an_empty_order(self):
+        self.assertEqual(toposort2({}), [])
+
+    def test_ignores_self_dependencies_and_adds_missing_items(self):
+        data = {'a': set(['a', 'b'])}
+
+        self.assertEqual(toposort2(data), [['b'], ['a']])
+        self.assertEqual(data, {'a': set(['b']), 'b': set()})
+
+    def test_reports_the_cycle(self):
+        data = {
+            'a': set(['b']),
+            'b': set(['c']),
+            'c': set(['a']),
+            'd': set(['a']),
+            'e': set(),
+        }
+
+        with self.assertRaises(CyclicDependencyError) as context:
+            toposort2(data)
+
+        self.assertEqual(context.exception.cycle, ['a', 'b', 'c', 'a'])
+        self.assertTrue('a -> b -> c -> a' in str(context.exception))
+        self.assertTrue(isinstance(context.exception, ValueError))
@@ -0,0 +1,100 @@
+from unittest import TestCase, mock
+import os
+import tempfile
+
+from ruamel import yaml
+
+from servicer.yaml_cache import YamlCache, yaml_loader
+
+class YamlCacheTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'docker_image.yaml')
+        self.persist_path = os.path.join(self.directory.name, '.cache', 'config.pickle')
+        self.write('service_type: docker_image\nsteps:\n  build: {}\n')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, data, mtime=None):
+        with open(self.path, 'w') as fp:
+            fp.write(data)
+        if mtime:
+            os.utime(self.path, (mtime, mtime))
+
+    def test_parses_each_file_once(self):
+        yaml_cache = YamlCache()
+
+        with mock.patch('servicer.yaml_cache.yaml.load', side_effect=lambda fp, Loader: {'parsed': fp.read()}) as load:
+            first = yaml_cache.load(self.path)
+            second = yaml_cache.load(self.path)
+
+        self.assertEqual(load.call_count, 1)
+        self.assertEqual(first, second)
+
+    def test_returns_independent_copies(self):
+        yaml_cache = YamlCache()
+
+        first = yaml_cache.load(self.path)
+        first['steps']['build']['image'] = 'mutated'
+
+        self.assertEqual(yaml_cache.load(self.path), {'service_type': 'docker_image', 'steps': {'build': {}}})
+
+    def test_parses_changed_files_again(self):
+        yaml_cache = YamlCache()
+        yaml_cache.load(self.path)
+
+        self.write('service_type: gcloud/docker_image\n', mtime=1000)
+
+        self.assertEqual(yaml_cache.load(self.path), {'service_type': 'gcloud/docker_image'})
+
+    def test_persists_parsed_files(self):
+        yaml_cache = YamlCache(persist_path=self.persist_path)
+        yaml_cache.load(self.path)
+        yaml_cache.save()
+
+        with mock.patch('servicer.yaml_cache.yaml.load') as load:
+            result = YamlCache(persist_path=self.persist_path).load(self.path)
+
+        load.assert_not_called()
+        self.assertEqual(result, {'service_type': 'docker_image', 'steps': {'build': {}}})
+
+    def test_ignores_an_unreadable_persisted_cache(self):
+        os.makedirs(os.path.dirname(self.persist_path))
+        with open(self.persist_path, 'w') as fp:
+            fp.write('not a pickle')
+        logger = mock.Mock()
+
+        yaml_cache = YamlCache(persist_path=self.persist_path, logger=logger)
+
+        self.assertEqual(yaml_cache.entries, {})
+        self.assertEqual(logger.log.call_args[1], {'level': 'warn'})
+        self.assertEqual(yaml_cache.load(self.path)['service_type'], 'docker_image')
+
+    def test_parses_with_the_chosen_loader(self):
+        self.write('tag: !!python/name:os.getcwd\n')
+
+        with self.assertRaises(yaml.constructor.ConstructorError):
+            YamlCache(loader='python').load(self.path)
+
+        self.assertEqual(YamlCache(loader='unsafe').load(self.path), {'tag': os.getcwd})
+
+class YamlLoaderTest(TestCase):
+    def test_prefers_the_c_loader(self):
+        with mock.patch('servicer.yaml_cache.CSafeLoader', 'c loader'):
+            self.assertEqual(yaml_loader(), 'c loader')
+            self.assertEqual(yaml_loader('c'), 'c loader')
+
+    def test_falls_back_to_the_python_safe_loader(self):
+        with mock.patch('servicer.yaml_cache.CSafeLoader', None):
+            self.assertEqual(yaml_loader('auto'), yaml.SafeLoader)
+
+            with self.assertRaises(ValueError):
+                yaml_loader('c')
+
+    def test_selects_loaders_by_name(self):
+        self.assertEqual(yaml_loader('python'), yaml.SafeLoader)
+        self.assertEqual(yaml_loader('unsafe'), yaml.Loader)
+
+        with self.assertRaises(ValueError):
+            yaml_loader('fast')